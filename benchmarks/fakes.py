@@ -0,0 +1,62 @@
+"""
+Local fake of the Azure Key Vault secret client for the benchmarks
+
+Each call sleeps for the given latency to simulate the round trip to the
+vault, so the benchmarks measure the effect of the request count and the
+concurrency without a network connection.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import time
+from config.external.azure import KeyVault
+
+class SecretProperties():
+    """ Secret properties """
+    def __init__(self, name: str):
+        """ Constructor """
+        self.name = name
+        self.enabled = True
+        self.version = None
+        self.updated_on = 'initial'
+
+class KeyVaultSecret():
+    """ Secret with a value """
+    def __init__(self, name: str, value: str):
+        """ Constructor """
+        self.name = name
+        self.value = value
+
+class FakeSecretClient():
+    """ Secret client with the secrets in memory """
+    def __init__(self, secrets: list, latency: float = 0):
+        """ Constructor """
+        self.secrets = dict(secrets)
+        self.latency = latency
+        self.calls = 0
+
+    def list_properties_of_secrets(self) -> list:
+        """ List the secret properties """
+        self.calls += 1
+        time.sleep(self.latency)
+        return [SecretProperties(name) for name in self.secrets]
+
+    def get_secret(self, name: str) -> KeyVaultSecret:
+        """ Get a secret """
+        self.calls += 1
+        time.sleep(self.latency)
+        return KeyVaultSecret(name, self.secrets[name])
+
+class FakeKeyVault(KeyVault):
+    """ Key Vault with the fake secret client """
+    client = None
+
+    def get_client(self) -> FakeSecretClient:
+        """ Get client """
+        return self.client
+
+def key_vault_secrets(secrets: list) -> list:
+    """ Convert the secret names to the Key Vault naming, e.g. "prefix---db--password" """
+    return [
+        (name.replace('@', KeyVault.SEPARATOR).replace('.', KeyVault.DOT), secret)
+        for name, secret in secrets
+    ]
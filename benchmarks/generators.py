@@ -0,0 +1,85 @@
+"""
+Synthetic configuration trees and secrets for the benchmarks
+
+The generators are deterministic, i.e. the same arguments give the same data
+on every run.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import json
+import random
+import yaml
+
+def wide_tree(leaves: int, fanout: int = 100) -> dict:
+    """ Get a tree of sections with the given number of leaves in total """
+    sections = max(1, leaves // fanout)
+    return {
+        f'section-{i}': {
+            f'key-{j}': value(i * fanout + j)
+            for j in range(fanout)
+        }
+        for i in range(sections)
+    }
+
+def deep_tree(depth: int, fanout: int = 4) -> dict:
+    """ Get a tree of the given depth where each node has fanout children """
+    if depth <= 1:
+        return {f'leaf-{i}': value(i) for i in range(fanout)}
+
+    return {f'node-{i}': deep_tree(depth - 1, fanout) for i in range(fanout)}
+
+def deep_key(depth: int) -> str:
+    """ Get the key path of the first leaf of a deep tree """
+    return '.'.join(['node-0'] * (depth - 1) + ['leaf-0'])
+
+def value(i: int) -> 'mixed':
+    """ Get a leaf value of a varying type """
+    kind = i % 4
+
+    if kind == 0:
+        return i
+
+    if kind == 1:
+        return f'value-{i}'
+
+    if kind == 2:
+        return i % 3 == 0
+
+    return [f'host-{i}', f'host-{i + 1}']
+
+def overlay(tree: dict, ratio: float = 0.1, seed: int = 1) -> dict:
+    """ Get an overlay that changes the given ratio of the sections of a wide tree """
+    random_state = random.Random(seed)
+    sections = sorted(tree)
+    changed = random_state.sample(sections, max(1, int(len(sections) * ratio)))
+    return {section: {'key-0': -1, 'added': True} for section in changed}
+
+def secrets(count: int, prefix: str = None) -> list:
+    """ Get (name, value) tuples of plain, JSON and YAML secrets """
+    values = []
+
+    for i in range(count):
+        name = f'section-{i}.secret'
+
+        if prefix and i % 2:
+            name = f'{prefix}@{name}'
+
+        kind = i % 3
+
+        if kind == 0:
+            secret = f'password-{i:08x}'
+        elif kind == 1:
+            secret = json.dumps({'username': f'user-{i}', 'password': f'password-{i}'})
+        else:
+            secret = yaml.safe_dump({'hosts': [f'host-{i}', f'host-{i + 1}']})
+
+        values.append((name, secret))
+
+    return values
+
+def write_yaml(tree: dict, file_path: str) -> str:
+    """ Write the tree to a YAML file """
+    with open(file_path, 'w', encoding='utf-8') as yaml_file:
+        yaml.safe_dump(tree, yaml_file)
+
+    return file_path
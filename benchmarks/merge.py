@@ -0,0 +1,72 @@
+"""
+Benchmark list merging
+
+Merges lists of growing size and reports the time per merged item, which stays
+flat when the list union scales linearly. Merging a small overlay to growing
+trees reports the cost of the overlay, which is proportional to the overlay plus
+the width of the copied nodes on the modified paths. The root is copied at full
+width, so the time per root key stays flat when the unchanged subtrees are
+shared, and merging in place stays flat regardless of the size::
+
+    python3 -m benchmarks.merge
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import sys
+import timeit
+from config.merge import merge
+
+SIZES = (1000, 10000, 100000)
+
+def merge_lists(size: int, repeat: int = 3) -> float:
+    """ Get the best time of merging two overlapping lists of the given size """
+    dict_1 = {'list': [f'host-{i}' for i in range(size)]}
+    dict_2 = {'list': [f'host-{i}' for i in range(size // 2, size + size // 2)]}
+    return min(timeit.repeat(lambda: merge(dict_1, dict_2), number=1, repeat=repeat))
+
+def merge_overlay(size: int, in_place: bool = False, repeat: int = 3) -> float:
+    """ Get the best time of merging a small overlay to a tree of the given size """
+    base = {f'section-{i}': {'key': i, 'nested': {'value': i}} for i in range(size)}
+    overlay = {'section-0': {'nested': {'value': -1}}}
+    return min(timeit.repeat(
+        lambda: merge(base, overlay, in_place=in_place),
+        number=1,
+        repeat=repeat
+    ))
+
+def main() -> int:
+    """ Run the benchmark """
+    per_item = []
+    per_key = []
+    in_place_times = []
+
+    for size in SIZES:
+        elapsed = merge_lists(size)
+        per_item.append(elapsed / size)
+        print(f'{size:>8} items {elapsed * 1000:10.3f} ms {elapsed / size * 1e9:8.1f} ns/item')
+
+    for size in SIZES:
+        elapsed = merge_overlay(size)
+        in_place = merge_overlay(size, in_place=True)
+        per_key.append(elapsed / size)
+        in_place_times.append(in_place)
+        print(
+            f'{size:>8} nodes {elapsed * 1000:10.3f} ms {elapsed / size * 1e9:8.1f} ns/key '
+            f'{in_place * 1000:10.3f} ms in place'
+        )
+
+    # Allow generous noise, a quadratic union or copying the shared subtrees
+    # grows by the size ratio (x100)
+    growths = {
+        'time per item': per_item[-1] / per_item[0],
+        'overlay time per root key': per_key[-1] / per_key[0],
+        'overlay time in place': in_place_times[-1] / in_place_times[0]
+    }
+
+    for name, growth in growths.items():
+        print(f'growth of {name}: {growth:.2f}x')
+
+    return 0 if all(growth < 10 for growth in growths.values()) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Benchmark suite for the configuration hot paths and the provider loading
+
+Runs the benchmarks on synthetic data offline, AWS SecretsManager with moto
+and Azure Key Vault with a local fake client with a simulated latency. Import
+time is measured by importing the configuration in a new interpreter::
+
+    # Run all benchmarks and save the results as the baseline
+    python3 -m benchmarks.suite --save baseline.json
+
+    # Compare to the baseline, exits with 1 if a benchmark is slower than the
+    # baseline by more than the threshold
+    python3 -m benchmarks.suite --compare baseline.json --threshold 1.5
+
+    # Smaller data sets and fewer repeats, e.g. for the CI
+    python3 -m benchmarks.suite --quick --filter get
+
+Times are reported per call as the best and the median of the repeats. The
+baseline should be saved on the same machine with the same options.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import warnings
+from config import Config
+from config.merge import merge
+from config.snapshot import Snapshot
+from benchmarks import generators
+from benchmarks.fakes import FakeKeyVault, FakeSecretClient, key_vault_secrets
+
+SIZES = {
+    'default': {
+        'leaves': 100000,
+        'depth': 8,
+        'yaml_leaves': 20000,
+        'secrets': 200,
+        'latency': 0.005,
+        'repeat': 5
+    },
+    'quick': {
+        'leaves': 10000,
+        'depth': 6,
+        'yaml_leaves': 2000,
+        'secrets': 50,
+        'latency': 0.001,
+        'repeat': 3
+    }
+}
+
+# Registered benchmarks as (name, number of calls per repeat, generator function)
+BENCHMARKS = []
+
+def benchmark(name: str, number: int = 1) -> 'callable':
+    """ Register a benchmark, the generator sets up, yields the timed function and tears down """
+    def register(func: 'callable') -> 'callable':
+        BENCHMARKS.append((name, number, func))
+        return func
+
+    return register
+
+@benchmark('import')
+def import_config(_sizes: dict):
+    """ Import the configuration in a new interpreter, including the interpreter startup """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    yield lambda: subprocess.run([sys.executable, '-c', 'import config'], cwd=root, check=True)
+
+@benchmark('get.memoized', number=100000)
+def get_memoized(sizes: dict):
+    """ Get a key of a large tree from the current snapshot """
+    config = Config()
+    config.set(None, generators.wide_tree(sizes['leaves']))
+    config.get('section-1.key-1')
+    yield lambda: config.get('section-1.key-1')
+
+@benchmark('get.resolve', number=10000)
+def get_resolve(sizes: dict):
+    """ Resolve a deep key of a large tree without the memoized value """
+    tree = generators.deep_tree(sizes['depth'])
+    key = generators.deep_key(sizes['depth'])
+    yield lambda: Snapshot(tree).get(key)
+
+@benchmark('get_config_key', number=10000)
+def get_config_key(sizes: dict):
+    """ Get a deep key of a large tree with the static lookup """
+    tree = generators.deep_tree(sizes['depth'])
+    key = generators.deep_key(sizes['depth'])
+    yield lambda: Config.get_config_key(key, configuration=tree)
+
+@benchmark('set', number=1000)
+def set_key(sizes: dict):
+    """ Set a key of a large tree """
+    config = Config()
+    config.set(None, generators.wide_tree(sizes['leaves']))
+    yield lambda: config.set('section-1.key-1', 1)
+
+@benchmark('set.in_place', number=1000)
+def set_key_in_place(sizes: dict):
+    """ Set a key of a large tree merged in place """
+    config = Config(in_place_merge=True)
+    config.set(None, generators.wide_tree(sizes['leaves']))
+    yield lambda: config.set('section-1.key-1', 1)
+
+@benchmark('set_many', number=100)
+def set_many(sizes: dict):
+    """ Set as many keys of a large tree at once as there are secrets """
+    config = Config()
+    config.set(None, generators.wide_tree(sizes['leaves']))
+    values = [(f'section-{i}.secret', i) for i in range(sizes['secrets'])]
+    yield lambda: config.set_many(values)
+
+@benchmark('merge.overlay', number=10)
+def merge_overlay(sizes: dict):
+    """ Merge an overlay that changes a tenth of the sections of a large tree """
+    tree = generators.wide_tree(sizes['leaves'])
+    changes = generators.overlay(tree)
+    yield lambda: merge(tree, changes)
+
+@benchmark('merge.deep')
+def merge_deep(sizes: dict):
+    """ Merge two deep trees with the same keys """
+    tree_1 = generators.deep_tree(sizes['depth'])
+    tree_2 = generators.deep_tree(sizes['depth'])
+    yield lambda: merge(tree_1, tree_2)
+
+@benchmark('load_configuration')
+def load_configuration(sizes: dict):
+    """ Load a large YAML file """
+    with tempfile.TemporaryDirectory() as path:
+        file_path = generators.write_yaml(
+            generators.wide_tree(sizes['yaml_leaves']),
+            os.path.join(path, 'config.yml')
+        )
+        yield lambda: Config().load_configuration(file_path)
+
+@benchmark('load_configuration.cached')
+def load_configuration_cached(sizes: dict):
+    """ Load a large YAML file with the parsed file cache """
+    with tempfile.TemporaryDirectory() as path:
+        file_path = generators.write_yaml(
+            generators.wide_tree(sizes['yaml_leaves']),
+            os.path.join(path, 'config.yml')
+        )
+        cache_path = os.path.join(path, 'cache')
+        Config().load_configuration(file_path, cache_path=cache_path)
+        yield lambda: Config().load_configuration(file_path, cache_path=cache_path)
+
+@benchmark('secretsmanager.load')
+def secretsmanager_load(sizes: dict):
+    """ Load secrets from AWS SecretsManager mocked with moto """
+    # moto and boto3 are imported only when the benchmark is run
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', category=DeprecationWarning)
+        from moto import mock_secretsmanager # pylint: disable=import-outside-toplevel
+        from config.external.aws import SecretsManager, boto3 # pylint: disable=import-outside-toplevel
+
+    with mock_secretsmanager():
+        boto3.session_reset()
+        client = boto3.client('secretsmanager')
+
+        for name, secret in generators.secrets(sizes['secrets']):
+            client.create_secret(Name=name, SecretString=secret)
+
+        def load():
+            config = Config()
+            SecretsManager(config).load()
+
+        yield load
+
+    boto3.session_reset()
+
+@benchmark('keyvault.load')
+def keyvault_load(sizes: dict):
+    """ Load secrets from the fake Azure Key Vault with latency """
+    secrets = key_vault_secrets(generators.secrets(sizes['secrets']))
+
+    def load():
+        config = Config()
+        interface = FakeKeyVault(config)
+        interface.client = FakeSecretClient(secrets, latency=sizes['latency'])
+        interface.load()
+
+    yield load
+
+def run(name: str, number: int, func: 'callable', sizes: dict) -> dict:
+    """ Run the benchmark, returns the times per call """
+    generator = func(sizes)
+
+    try:
+        timed = next(generator)
+        times = timeit.repeat(timed, number=number, repeat=sizes['repeat'])
+    finally:
+        generator.close()
+
+    times = [elapsed / number for elapsed in times]
+
+    return {
+        'best': min(times),
+        'median': statistics.median(times),
+        'number': number,
+        'repeat': sizes['repeat'],
+        'name': name
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """ Get the names of the benchmarks that are slower than the baseline by the threshold """
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        ratio = result['best'] / baseline[name]['best']
+        marker = ''
+
+        if ratio > threshold:
+            regressions.append(name)
+            marker = ' REGRESSION'
+
+        print(f'{name:<28} {ratio:6.2f}x baseline{marker}')
+
+    return regressions
+
+def main(args: list = None) -> int:
+    """ Run the benchmarks """
+    parser = argparse.ArgumentParser(description='Benchmark the configuration')
+    parser.add_argument('--quick', action='store_true', help='use smaller data sets')
+    parser.add_argument('--filter', default='', help='run the benchmarks with the name part')
+    parser.add_argument('--save', help='save the results to the JSON file')
+    parser.add_argument('--compare', help='compare the results to the JSON file')
+    parser.add_argument('--threshold', type=float, default=1.5,
+        help='slowdown compared to the baseline that is a regression')
+    options = parser.parse_args(args)
+
+    sizes = SIZES['quick' if options.quick else 'default']
+    results = {}
+
+    for name, number, func in BENCHMARKS:
+        if options.filter not in name:
+            continue
+
+        result = run(name, number, func, sizes)
+        results[name] = result
+        best, median = result['best'] * 1e6, result['median'] * 1e6
+        print(f'{name:<28} {best:14.3f} us {median:14.3f} us median')
+
+    if options.save:
+        with open(options.save, 'w', encoding='utf-8') as results_file:
+            json.dump({
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'sizes': sizes,
+                'results': results
+            }, results_file, indent=2)
+
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+
+        if baseline.get('sizes') != sizes:
+            print('Warning: the baseline was run with different sizes')
+
+        if compare(results, baseline['results'], options.threshold):
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -56,6 +56,12 @@ disable AWS SecretsManager when running the application::
 
     AWS_SECRETSMANAGER_ENABLED=false python3 application.py
 
+Environment is probed on every lookup unless an environment index is used. The
+index is scanned once and refreshed with `config.refresh_environment()` or
+automatically on `os.environ` mutations::
+
+    config.use_environment_index(auto_refresh=True)
+
 AWS SecretsManager
 ------------------
 
@@ -94,30 +100,182 @@ try to typecast the value in the beforementioned orner.
 
 @author Arttu Manninen <arttu@kaktus.cc>
 """
+import itertools
 import os
 import re
 import sys
-import yaml
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from config.loader import load_yaml
 from config.merge import merge
-from config.external.aws import SecretsManager
-from config.external.azure import KeyVault
-
-class Config():
+from config.layers import Layers, MISSING, REPLACE, assign, update
+from config.environment import EnvironmentIndex, cast_value
+from config.frozen import freeze
+from config.instrumentation import Instrumentation, InstrumentedSnapshot
+from config.schema import BoundValue, Field
+from config.shared import SharedSegment
+from config.snapshot import Snapshot, compile_key_path, resolve
+from config.reloader import Reloader
+
+# The external interfaces are imported on demand after this module has been
+# replaced with the configuration instance, which is not a package
+import config.external # pylint: disable=unused-import
+from config.external.registry import registry
+
+# The configuration is the facade of the package, its state and methods are
+# kept on the singleton module object
+class Config(): # pylint: disable=too-many-instance-attributes,too-many-public-methods
     """ Configuration manager """
     Config = None
-    def __init__(self):
+    DEFAULT_LAYER = 'default'
+
+    def __init__(self, in_place_merge: bool = False, layered: bool = False):
         # Load the project configuration immediately
         self._config = {}
         self._secrets = {}
 
+        # Layered store keeps each source as a separate layer instead of
+        # merging them to the configuration tree
+        self._layers = Layers() if layered else None
+        self._layer = Config.DEFAULT_LAYER
+
+        # Layers of the values set outside of a named layer
+        self._set_layers = []
+
+        # Merge the loaded configuration in place instead of copying the
+        # modified paths
+        self.in_place_merge = in_place_merge
+
+        # Prebuilt environment override index, None reads os.environ directly
+        self._environment = None
+
+        # Schema of the typed values
+        self._schema = None
+
+        # Load timings and lookup counters, None when not instrumented
+        self.instrumentation = None
+
+        # Readers use the published snapshot, writers are serialized
+        self._lock = threading.RLock()
+        self._snapshot = Snapshot()
+
+        # External interfaces by the name, kept for refreshing the secrets
+        self._interfaces = {}
+
+        # Signatures of the loaded configuration files by the file path
+        self._files = {}
+
+        # Shared configuration segment, whether this process publishes it and
+        # the snapshot published last
+        self._shared = None
+        self._shared_publisher = False
+        self._shared_snapshot = None
+
+        # Updates collected as (layer, key path, value) within a batch
+        self._batch = None
+
+        # Subscriptions as [key, compiled key path, callback, last value]
+        self._subscriptions = []
+        self._reloader = None
+
     def set(self, config_key_path: 'Union(str, list)' = '', value: 'mixed' = None) -> 'self':
         """ Set configuration key """
+        with self._lock:
+            if self._batch is not None:
+                return self._defer([(config_key_path, value)])
+
+            return self._set(config_key_path, value)
+
+    def set_many(self, values: 'Union(dict, list)', atomic: bool = True) -> 'self':
+        """ Set the configuration keys of the mapping or the (key, value) tuples at once """
+        if isinstance(values, dict):
+            values = values.items()
+
+        with self._lock:
+            if self._batch is not None:
+                return self._defer(values)
+
+            return self._set_many([
+                (self._write_layer(), Config.compile_key_path(key)[0], value)
+                for key, value in values
+            ], atomic=atomic)
+
+    @contextmanager
+    def batch(self, atomic: bool = True) -> 'self':
+        """ Collect the values set within the context and apply them at once on exit """
+        with self._lock:
+            if self._batch is not None:
+                yield self
+                return
+
+            self._batch = []
+
+            try:
+                yield self
+                updates = self._batch
+            finally:
+                self._batch = None
+
+            self._set_many(updates, atomic=atomic)
+
+    def _defer(self, values: list) -> 'self':
+        """ Collect the values to the current batch, requires the write lock """
+        self._batch.extend(
+            (self._write_layer(), Config.compile_key_path(key)[0], value)
+            for key, value in values
+        )
+        return self
+
+    def _set_many(self, updates: list, atomic: bool = True) -> 'self':
+        """ Apply the (layer, key path, value) updates with one validated publish
+
+        The key path REPLACE replaces the layer with the updates that follow
+        it. Requires the write lock.
+        """
+        if not updates:
+            return self
+
+        if self._layers is None:
+            # Readers see the modifications in place before the invalidation,
+            # which cannot be reverted when the schema rejects them
+            in_place = self.in_place_merge and not atomic and self._schema is None
+            tree = update(
+                self._config,
+                [(keys, value) for _layer, keys, value in updates],
+                in_place=in_place
+            )
+            return self._commit(tree, None, self._schema)
+
+        layers = self._layers.copy()
+
+        for name, layer_updates in itertools.groupby(updates, key=lambda item: item[0]):
+            tree = layers.layer(name) or {}
+            values = []
+
+            for _layer, keys, value in layer_updates:
+                if keys is REPLACE:
+                    tree = {}
+                    values = []
+                else:
+                    values.append((keys, value))
+
+            layers.set_layer(name, update(tree, values))
+
+        return self._commit(self._config, layers, self._schema)
+
+    def _set(self, config_key_path: 'Union(str, list)' = '', value: 'mixed' = None) -> 'self':
+        """ Set configuration key, requires the write lock """
         separator = '.'
 
         if not config_key_path:
             assert isinstance(value, dict)
-            self._config = merge(self._config, value)
-            return self
+
+            if self._layers is not None:
+                return self._set_layer(merge(self._get_layer(), value))
+
+            in_place = self.in_place_merge and self._schema is None
+            return self._commit(merge(self._config, value, in_place=in_place), None, self._schema)
 
         if isinstance(config_key_path, str):
             config_key_path = config_key_path.split(separator)
@@ -127,6 +285,21 @@ class Config():
 
         assert isinstance(config_key_path, list)
 
+        if self._layers is not None:
+            return self._set_layer(assign(self._get_layer(), tuple(config_key_path), value))
+
+        if not self.in_place_merge or self._schema is not None:
+            # Copy the modified path and swap the configuration tree at once
+            keys = tuple(config_key_path)
+            index = self._snapshot.key_index(build=False)
+            tree = assign(self._config, keys, value)
+            return self._commit(
+                tree,
+                None,
+                self._schema,
+                index.assign(tree, keys) if index is not None else None
+            )
+
         cfg = self._config
         last_key = config_key_path.pop()
 
@@ -134,75 +307,527 @@ class Config():
             cfg = cfg.setdefault(key, {})
 
         cfg[last_key] = value
+        self.invalidate()
         return self
 
-    def get(self, key: 'Union(str, list)' = '', **kwargs) -> 'mixed':
+    def get(self, key: 'Union(str, list)' = '', default: 'mixed' = None, \
+        env_var: str = None) -> 'mixed':
         """ Get configuration key """
-        return self.get_config_key(
-            key,
-            configuration=self._config,
-            **kwargs
-        )
+        return self._snapshot.get(key, default=default, env_var=env_var)
+
+    def snapshot(self) -> Snapshot:
+        """ Get the current immutable view of the configuration """
+        return self._snapshot
+
+    def keys(self, prefix: 'Union(str, list)' = '') -> list:
+        """ Get the dotted key paths of the configuration values under the prefix """
+        return self._snapshot.keys(prefix)
+
+    def items(self, prefix: 'Union(str, list)' = '') -> list:
+        """ Get the (dotted key path, value) tuples under the prefix, without the overrides """
+        return self._snapshot.items(prefix)
+
+    def invalidate(self) -> 'self':
+        """ Publish a new snapshot of the configuration, invalidating the resolved values """
+        return self._publish()
+
+    def _publish(self, index: 'KeyIndex' = None) -> 'self':
+        """ Publish a new snapshot with the key index updated to the configuration """
+        with self._lock:
+            return self._publish_snapshot(
+                self._build_snapshot(self._config, self._layers, self._schema, index)
+            )
+
+    def _build_snapshot(self, tree: dict, layers: Layers, schema: 'Schema', \
+        index: 'KeyIndex' = None) -> Snapshot:
+        """ Build a snapshot of the configuration """
+        snapshot = {
+            'tree': tree,
+            'layers': layers.copy() if layers is not None else None,
+            'environment': self._environment,
+            'index': index,
+            'schema': schema
+        }
+
+        if self.instrumentation is None:
+            return Snapshot(**snapshot)
+
+        return InstrumentedSnapshot(self.instrumentation, **snapshot)
+
+    def _publish_snapshot(self, snapshot: Snapshot) -> 'self':
+        """ Publish the snapshot, requires the write lock """
+        self._snapshot = snapshot
+
+        if self._subscriptions:
+            self._notify()
+
+        return self
+
+    def _commit(self, tree: dict, layers: Layers, schema: 'Schema', \
+        index: 'KeyIndex' = None) -> 'self':
+        """ Validate the configuration and publish it, raises SchemaError without publishing """
+        with self._lock:
+            snapshot = self._build_snapshot(tree, layers, schema, index)
+
+            if schema is not None:
+                schema.validate(snapshot)
+
+            self._config = tree
+            self._layers = layers
+            self._schema = schema
+            return self._publish_snapshot(snapshot)
+
+    def freeze(self) -> 'self':
+        """ Convert the configuration to the compact read-only representation """
+        with self._lock:
+            # Frozen nodes cannot be modified in place, writes copy the modified path
+            self.in_place_merge = False
+            strings = {}
+
+            if self._layers is not None:
+                for name in self._layers.names():
+                    self._layers.set_layer(name, freeze(self._layers.layer(name), strings))
+            else:
+                self._config = freeze(self._config, strings)
+
+            return self.invalidate()
+
+    def share(self, path: str) -> 'self':
+        """ Publish the configuration to the worker processes through the file """
+        with self._lock:
+            self._shared = SharedSegment(path)
+            self._shared_publisher = True
+            self._shared_snapshot = None
+            return self.sync_shared()
+
+    def attach(self, path: str) -> 'self':
+        """ Use the configuration published by the parent process through the file """
+        with self._lock:
+            self._shared = SharedSegment(path)
+            self._shared_publisher = False
+            return self._attach_shared()
+
+    def sync_shared(self) -> 'self':
+        """ Publish the configuration or attach to the new published version """
+        with self._lock:
+            if self._shared is None:
+                return self
+
+            if self._shared_publisher:
+                # A new generation is published only when the configuration has changed
+                if self._snapshot is not self._shared_snapshot:
+                    tree = self._snapshot.resolve(())
+                    self._shared.publish(tree if tree is not MISSING else {})
+                    self._shared_snapshot = self._snapshot
+
+                return self
+
+            if self._shared.changed():
+                return self._attach_shared()
+
+            return self
+
+    def _attach_shared(self) -> 'self':
+        """ Replace the configuration with the attached version, requires the write lock """
+        root = self._shared.attach()
+
+        if self._layers is not None:
+            self._layers.set_layer(self._shared.path, root)
+        else:
+            self._config = root
+
+        # Decoded nodes cannot be modified in place, writes copy the modified path
+        self.in_place_merge = False
+        return self.invalidate().validate()
+
+    def use_instrumentation(self, instrumentation: Instrumentation = None, \
+        enabled: bool = True) -> 'self':
+        """ Record the load timings and the lookup counters """
+        if not enabled:
+            self.instrumentation = None
+        else:
+            self.instrumentation = instrumentation or self.instrumentation or Instrumentation()
+
+        return self.invalidate()
+
+    def stats(self, top: int = 10) -> dict:
+        """ Get the recorded load timings, lookup counters and the most read keys """
+        if self.instrumentation is None:
+            return {}
+
+        return self.instrumentation.stats(top)
+
+    @contextmanager
+    def _measure(self, source: str) -> 'Measurement':
+        """ Measure loading the source within the context when instrumented """
+        if self.instrumentation is None:
+            yield None
+            return
+
+        with self.instrumentation.measure(source) as measurement:
+            yield measurement
+
+    def use_schema(self, schema: 'Schema') -> 'self':
+        """ Convert the values with the schema, raises SchemaError for the invalid values """
+        with self._lock:
+            return self._commit(self._config, self._layers, schema)
+
+    def validate(self) -> 'self':
+        """ Convert and validate the values with the schema """
+        if self._schema is not None:
+            self._schema.validate(self._snapshot)
+
+        return self
+
+    def get_typed(self, key: str) -> 'mixed':
+        """ Get the value converted with the schema """
+        return self._snapshot.typed(key)
+
+    def get_int(self, key: str, default: int = None) -> int:
+        """ Get the value as an integer """
+        return self._get_as(key, int, default)
+
+    def get_float(self, key: str, default: float = None) -> float:
+        """ Get the value as a float """
+        return self._get_as(key, float, default)
+
+    def get_bool(self, key: str, default: bool = None) -> bool:
+        """ Get the value as a boolean """
+        return self._get_as(key, bool, default)
+
+    def get_str(self, key: str, default: str = None) -> str:
+        """ Get the value as a string """
+        return self._get_as(key, str, default)
+
+    def get_duration(self, key: str, default: 'timedelta' = None) -> 'timedelta':
+        """ Get the value as a duration """
+        return self._get_as(key, 'duration', default)
+
+    def get_url(self, key: str, default: 'SplitResult' = None) -> 'SplitResult':
+        """ Get the value as a split URL """
+        return self._get_as(key, 'url', default)
+
+    def _get_as(self, key: str, type_name: 'Union(type, str)', default: 'mixed') -> 'mixed':
+        """ Get the value converted to the type """
+        value = self._snapshot.typed(key, Field.of(type_name))
+        return default if value is None else value
+
+    def bind(self, key: str, field: 'Field' = None) -> BoundValue:
+        """ Get an object that gives the converted current value of the key """
+        if field is None and self._schema is not None:
+            # Fails early when the key is not in the schema
+            self._schema.field(key)
+
+        return BoundValue(self, key, field)
+
+    def subscribe(self, callback: 'callable', key: 'Union(str, list)' = '') -> 'self':
+        """ Call the callback with (key, old value, new value) when the value of the key changes """
+        keys, _env_var = Config.compile_key_path(key)
+        self._subscriptions.append([key, keys, callback, self._resolve(keys)])
+        return self
+
+    def unsubscribe(self, callback: 'callable') -> 'self':
+        """ Remove the subscriptions of the callback """
+        self._subscriptions = [
+            subscription
+            for subscription in self._subscriptions
+            if subscription[2] is not callback
+        ]
+        return self
+
+    def _notify(self):
+        """ Call the subscribers of the changed values """
+        for subscription in list(self._subscriptions):
+            key, keys, callback, previous = subscription
+            value = self._resolve(keys)
+
+            if value is previous or value == previous:
+                continue
+
+            subscription[3] = value
+            callback(
+                key,
+                None if previous is MISSING else previous,
+                None if value is MISSING else value
+            )
+
+    def start_reloader(self, interval: float = 60, secrets: bool = True, \
+        files: bool = None) -> 'Reloader':
+        """ Start reloading the changed configuration files and secrets in the background """
+        self.stop_reloader()
+        self._reloader = Reloader(self, interval=interval, secrets=secrets, files=files)
+        self._reloader.start()
+        return self._reloader
+
+    def stop_reloader(self) -> 'self':
+        """ Stop the background reloader """
+        if self._reloader is not None:
+            self._reloader.stop()
+            self._reloader = None
+
+        return self
+
+    def changed_files(self) -> list:
+        """ Get the loaded configuration files that have changed since they were loaded """
+        return [
+            file_path
+            for file_path, signature in list(self._files.items())
+            if Config.file_signature(file_path) != signature
+        ]
+
+    @staticmethod
+    def file_signature(file_path: str) -> tuple:
+        """ Get the modification time and size of the file, None if it does not exist """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size
+
+    def _resolve(self, keys: tuple) -> 'mixed':
+        """ Resolve the configuration value of the compiled key path """
+        return self._snapshot.resolve(keys)
+
+    def _write_layer(self) -> str:
+        """ Get the name of the layer the values are set to, requires the write lock
+
+        Values set outside of a named layer override the earlier sources like
+        in a merged configuration. When another layer has been added after the
+        values set earlier, the values are set to a new layer on top.
+        """
+        if self._layers is None or self._layer != Config.DEFAULT_LAYER:
+            return self._layer
+
+        if not self._set_layers:
+            self._set_layers.append(Config.DEFAULT_LAYER)
+
+        names = self._layers.names()
+        name = self._set_layers[-1]
+
+        # The latest layer is used while it is on top or until it is added
+        if name not in names or names[-1] == name:
+            return name
+
+        name = f'{Config.DEFAULT_LAYER}.{len(self._set_layers) + 1}'
+        self._set_layers.append(name)
+        return name
+
+    def _get_layer(self) -> dict:
+        """ Get the tree of the layer the values are set to """
+        return self._layers.layer(self._write_layer()) or {}
+
+    def _set_layer(self, tree: dict) -> 'self':
+        """ Replace the tree of the layer the values are set to, requires the write lock """
+        layers = self._layers.copy().set_layer(self._write_layer(), tree)
+        return self._commit(self._config, layers, self._schema)
+
+    @contextmanager
+    def layer(self, name: str, replace: bool = False) -> 'self':
+        """ Write the configuration to the given layer within the context
+
+        A replaced layer is built from the values set within the context and
+        published at once on exit, like a batch.
+        """
+        assert self._layers is not None, 'Layers are available with Config(layered=True)'
+
+        with self._lock:
+            previous = self._layer
+            self._layer = name
+
+            try:
+                if not replace:
+                    yield self
+                    return
+
+                with self.batch():
+                    self._batch.append((name, REPLACE, None))
+                    yield self
+            finally:
+                self._layer = previous
+
+    @property
+    def attached(self) -> bool:
+        """ Check if the configuration is attached to the version published by another process """
+        return self._shared is not None and not self._shared_publisher
+
+    @property
+    def layered(self) -> bool:
+        """ Check if each source is stored as a separate layer """
+        return self._layers is not None
+
+    def layers(self) -> list:
+        """ Get the layer names in priority order, the lowest priority first """
+        if self._layers is None:
+            return []
+
+        return self._layers.names()
+
+    def source(self, key: 'Union(str, list)' = '') -> str:
+        """ Get the name of the layer the configuration value comes from """
+        return self._snapshot.source(key)
+
+    def use_environment_index(self, enabled: bool = True, auto_refresh: bool = False) -> 'self':
+        """ Read the environment overrides from a prebuilt index instead of os.environ """
+        if self._environment is not None:
+            self._environment.close()
+            self._environment = None
+
+        if enabled:
+            self._environment = EnvironmentIndex(auto_refresh=auto_refresh)
+
+        return self.invalidate()
+
+    def refresh_environment(self) -> 'self':
+        """ Scan the process environment to the environment index """
+        if self._environment is not None:
+            self._environment.refresh()
+
+        return self
 
     def load_secrets(self) -> 'self':
         """ Load external secrets """
-        if self.get('aws.secretsmanager.enabled'):
-            interface = SecretsManager(self)
-            interface.load()
+        interfaces = [interface_class(self) for interface_class in self._enabled_interfaces()]
+        fetched = Config._fetch(interfaces, lambda interface: interface.retrieve())
+        return self._apply_secrets(interfaces, fetched)
+
+    @staticmethod
+    def _fetch(interfaces: list, fetch: 'callable') -> list:
+        """ Fetch the secrets of the interfaces concurrently, the results in the interface order """
+        if len(interfaces) > 1:
+            with ThreadPoolExecutor(max_workers=len(interfaces)) as executor:
+                return list(executor.map(fetch, interfaces))
+
+        return [fetch(interface) for interface in interfaces]
 
-        if self.get('azure.keyvault.enabled'):
-            interface = KeyVault(self)
-            interface.load()
+    async def load_secrets_async(self) -> 'self':
+        """ Load external secrets without blocking the event loop """
+        # Imported on demand to keep importing the configuration fast
+        import asyncio # pylint: disable=import-outside-toplevel
+
+        interfaces = [interface_class(self) for interface_class in self._enabled_interfaces()]
+        fetched = await asyncio.gather(*(interface.retrieve_async() for interface in interfaces))
+        return self._apply_secrets(interfaces, fetched)
+
+    def _apply_secrets(self, interfaces: list, fetched: list) -> 'self':
+        """ Apply the fetched secrets of the interfaces in the priority order
+
+        The secrets are validated and published at once, an invalid secret
+        raises SchemaError and keeps the previous configuration.
+        """
+        with self._lock, self.batch():
+            for interface, secrets in zip(interfaces, fetched):
+                with self._source_layer(interface.NAME, replace=True):
+                    interface.apply(secrets)
+
+        for interface in interfaces:
+            self._interfaces[interface.NAME] = interface
 
         return self
 
-    def load_configuration(self, file_path: str, graceful: bool = False) -> 'self':
+    def refresh_secrets(self) -> 'self':
+        """ Apply the external secrets changed since they were loaded
+
+        The changes are fetched without the write lock and the changes of all
+        the interfaces are validated and published at once.
+        """
+        interfaces = []
+
+        for interface_class in self._enabled_interfaces():
+            interface = self._interfaces.get(interface_class.NAME)
+
+            if interface is None:
+                interface = self._interfaces[interface_class.NAME] = interface_class(self)
+
+            interfaces.append(interface)
+
+        # Versions of the applied secrets, restored when the changes are not applied
+        checkpoints = [interface.checkpoint() for interface in interfaces]
+
+        try:
+            fetched = Config._fetch(interfaces, lambda interface: interface.retrieve_changes())
+
+            with self._lock, self.batch():
+                for interface, secrets in zip(interfaces, fetched):
+                    with self._source_layer(interface.NAME):
+                        interface.apply(secrets)
+        except Exception:
+            # The changes are fetched again on the next refresh
+            for interface, checkpoint in zip(interfaces, checkpoints):
+                interface.rollback(checkpoint)
+            raise
+
+        return self
+
+    def _enabled_interfaces(self) -> list:
+        """ Get the external interface classes of the enabled providers in the priority order """
+        return [provider.load() for provider in registry.enabled(self)]
+
+    @contextmanager
+    def _source_layer(self, name: str, replace: bool = False) -> 'self':
+        """ Write to the named layer when layered, otherwise merge to the configuration """
+        if self._layers is None:
+            yield self
+            return
+
+        with self.layer(name, replace=replace):
+            yield self
+
+    def load_configuration(self, file_path: str, graceful: bool = False, \
+        cache_path: str = None) -> 'self':
         """ Load configuration """
         if not os.path.exists(file_path):
             if not graceful:
                 raise FileNotFoundError('File %s not found' % (file_path))
             return self
 
-        with open(file_path) as ymlfile:
-            values = yaml.load(ymlfile, Loader=yaml.Loader) or {}
-            self._config = merge(self._config, values)
-        return self
+        signature = Config.file_signature(file_path)
 
-    @staticmethod
-    def get_config_key(config_key_path: 'Union(str, list)' = '', default: 'mixed' = None, \
-        configuration: dict = None, env_var: str = None) -> 'mixed':
-        """ Get configuration key for the given path """
-        if not config_key_path:
-            config_key_path = []
+        with self._measure(file_path):
+            values = load_yaml(file_path, cache_path=cache_path) or {}
 
-        if isinstance(config_key_path, str):
-            separator = '.'
-            config_key_path = config_key_path.split(separator)
+        with self._lock:
+            tree = self._config
+            layers = self._layers
 
-        if not env_var:
-            env_var = '_'.join(config_key_path).upper()
+            # The configuration is not modified before it has been validated
+            if layers is not None:
+                layers = layers.copy().set_layer(file_path, values)
+            else:
+                in_place = self.in_place_merge and self._schema is None
+                tree = merge(tree, values, in_place=in_place)
 
-        if os.getenv(env_var):
-            value = os.getenv(env_var)
+            self._commit(tree, layers, self._schema)
+            self._files[file_path] = signature
+            return self
+
+    @staticmethod
+    def compile_key_path(config_key_path: 'Union(str, list)' = '') -> tuple:
+        """ Get the key tuple and the environment variable name for the given path """
+        return compile_key_path(config_key_path)
 
-            if value.lower() == 'true':
-                return True
+    @staticmethod
+    def resolve(keys: tuple, configuration: dict) -> 'mixed':
+        """ Walk the configuration tree, returns MISSING if the path does not exist """
+        return resolve(keys, configuration)
+
+    @staticmethod
+    def get_config_key(config_key_path: 'Union(str, list)' = '', default: 'mixed' = None, \
+        configuration: dict = None, env_var: str = None) -> 'mixed':
+        """ Get configuration key for the given path """
+        keys, implicit_env_var = Config.compile_key_path(config_key_path)
 
-            if value.lower() == 'false':
-                return False
+        value = os.environ.get(env_var or implicit_env_var)
 
-            if value.lower() in ['none', 'null']:
-                return None
+        if value:
+            return cast_value(value)
 
-            return value
+        value = Config.resolve(keys, configuration)
 
-        cfg = configuration.copy()
+        if value is MISSING:
+            return default
 
-        for _, key in enumerate(config_key_path):
-            if key not in cfg:
-                return default
-            cfg = cfg[key]
-        return cfg
+        return value
 
 Config.Config = Config
 sys.modules[__name__] = Config()
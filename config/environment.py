@@ -0,0 +1,123 @@
+"""
+Environment variable overrides
+
+By default every configuration lookup probes the process environment for the
+override variable. With an environment index the environment is scanned once
+and the typecasted override values are looked up from a prebuilt dictionary::
+
+    index = EnvironmentIndex()
+    index.get('DB_USERNAME')
+
+    # Scan the process environment again
+    index.refresh()
+
+When `auto_refresh` is set the class of `os.environ` counts its mutations and
+the index scans the environment again on the next lookup after a mutation.
+The original class is restored when the last observing index is closed or
+garbage collected. Changes made with `os.putenv` or by C extensions
+bypass `os.environ` and require an explicit `refresh()`.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import os
+import threading
+import weakref
+
+def cast_value(value: str) -> 'mixed':
+    """ Typecast the magic environment variable values """
+    lower = value.lower()
+
+    if lower == 'true':
+        return True
+
+    if lower == 'false':
+        return False
+
+    if lower in ['none', 'null']:
+        return None
+
+    return value
+
+# The class of os.environ is only available as os._Environ
+class ObservedEnviron(os._Environ): # pylint: disable=protected-access
+    """ os.environ that counts its mutations while environment indexes observe it """
+    # Number of the mutations, the observing indexes scan the environment
+    # again on the next lookup after a mutation
+    mutations = 0
+
+    # Number of the observing indexes and the class of os.environ to restore
+    observers = 0
+    original = os._Environ # pylint: disable=protected-access
+    lock = threading.Lock()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+
+        with ObservedEnviron.lock:
+            ObservedEnviron.mutations += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+
+        with ObservedEnviron.lock:
+            ObservedEnviron.mutations += 1
+
+    @staticmethod
+    def observe():
+        """ Start counting os.environ mutations """
+        with ObservedEnviron.lock:
+            if ObservedEnviron.observers == 0 and os.environ.__class__ is ObservedEnviron.original:
+                os.environ.__class__ = ObservedEnviron
+
+            ObservedEnviron.observers += 1
+
+    @staticmethod
+    def release():
+        """ Stop counting os.environ mutations, the class is restored when nothing observes """
+        with ObservedEnviron.lock:
+            ObservedEnviron.observers -= 1
+
+            if ObservedEnviron.observers == 0 and os.environ.__class__ is ObservedEnviron:
+                os.environ.__class__ = ObservedEnviron.original
+
+class EnvironmentIndex():
+    """ Snapshot of the environment variables with typecasted values """
+    def __init__(self, auto_refresh: bool = False):
+        """ Constructor """
+        self._values = {}
+        self._mutations = None
+
+        # Releases the observation when closed or garbage collected
+        self._finalizer = None
+
+        if auto_refresh:
+            ObservedEnviron.observe()
+            self._finalizer = weakref.finalize(self, ObservedEnviron.release)
+
+        self.refresh()
+
+    def get(self, env_var: str, default: 'mixed' = None) -> 'mixed':
+        """ Get the typecasted value of the environment variable """
+        if self._finalizer is not None and self._mutations != ObservedEnviron.mutations:
+            self.refresh()
+
+        return self._values.get(env_var, default)
+
+    def refresh(self) -> 'self':
+        """ Scan the process environment """
+        # Mutations made during the scan are scanned again on the next lookup
+        self._mutations = ObservedEnviron.mutations
+
+        # Empty values are not overrides, as with os.getenv lookups
+        self._values = {
+            key: cast_value(value)
+            for key, value in os.environ.items()
+            if value
+        }
+        return self
+
+    def close(self):
+        """ Stop observing the environment """
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
@@ -0,0 +1,5 @@
+"""
+External configuration sources
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
@@ -4,20 +4,47 @@ Implementation for AWS SecretsManager
 @author Arttu Manninen <arttu@kaktus.cc>
 """
 import re
+from botocore.exceptions import ClientError
 from config.external.aws.boto3 import Boto3
-from config.external.interface import ExternalInterface
+from config.external.interface import VersionedInterface
 
 boto3 = Boto3()
 
-class SecretsManager(ExternalInterface):
-    def load(self):
-        """ Load AWS SecretManager secrets to the configuration """
+class SecretsManager(VersionedInterface):
+    NAME = 'aws.secretsmanager'
+    PRIORITY = 100
+
+    # Maximum number of secrets in a BatchGetSecretValue request
+    BATCH_SIZE = 20
+
+    # Error codes of the endpoints that do not support BatchGetSecretValue and
+    # of the roles that are not allowed to call it, which requires its own permission
+    UNSUPPORTED_ERRORS = (
+        'InvalidAction',
+        'UnknownOperationException',
+        'NotImplemented',
+        'AccessDeniedException',
+        'AccessDenied'
+    )
+
+    def select(self) -> list:
+        """ List the AWS SecretManager secrets to load """
         prefix = self.config.get('aws.secretsmanager.prefix', default='')
-        client = boto3.client('secretsmanager')
+        client = boto3.client('secretsmanager', region=self.config.get('aws.region'))
         paginator = client.get_paginator('list_secrets')
         secrets = []
+        list_args = {}
+
+        # Filter the prefixed secrets server side when the others are skipped
+        if prefix and self.config.get('aws.secretsmanager.skip_unprefixed'):
+            list_args['Filters'] = [{
+                'Key': 'name',
+                'Values': [prefix + '@']
+            }]
+
+        for page in paginator.paginate(**list_args):
+            self.api_calls += 1
 
-        for page in paginator.paginate():
             for _i, secret_metadata in enumerate(page['SecretList']):
                 secrets.append(secret_metadata)
 
@@ -29,6 +56,8 @@ class SecretsManager(ExternalInterface):
 
         secrets.sort(key=sort_secrets)
 
+        selected = []
+
         for secret_metadata in secrets:
             name = secret_metadata['Name']
             key = name
@@ -42,13 +71,82 @@ class SecretsManager(ExternalInterface):
                 (name.find(prefix + '@') != 0):
                 continue
 
-            stored_secret = client.get_secret_value(SecretId=name)
-            stored_value = self._parse_secret_value(stored_secret['SecretString'])
+            selected.append((name, key, SecretsManager.get_version(secret_metadata)))
 
-            # Special case: when the name of the secret is "config" it is handled
-            # as a full set of configuration instead of a subset
+            # Full configuration ends the loading
             if key == 'config':
-                self.config.set(None, stored_value)
                 break
 
-            self.config.set(key, stored_value)
+        return selected
+
+    def get_values(self, names: list) -> dict:
+        """ Get the secret strings by the secret name """
+        client = boto3.client('secretsmanager', region=self.config.get('aws.region'))
+        return self.get_secret_values(client, names)
+
+    @staticmethod
+    def get_version(secret_metadata: dict) -> tuple:
+        """ Get the current version of the secret from the listed metadata """
+        current = None
+
+        for version_id, stages in secret_metadata.get('SecretVersionsToStages', {}).items():
+            if 'AWSCURRENT' in stages:
+                current = version_id
+
+        if current is None:
+            return None
+
+        return current, str(secret_metadata.get('LastChangedDate'))
+
+    def cache_key(self) -> tuple:
+        """ Get the values that identify the fetched secrets in the cache """
+        return (
+            self.NAME,
+            self.config.get('aws.region'),
+            self.config.get('aws.secretsmanager.prefix'),
+            bool(self.config.get('aws.secretsmanager.skip_unprefixed'))
+        )
+
+    def get_secret_values(self, client, names: list) -> dict:
+        """ Get the secret strings by the secret name """
+        max_workers = self.config.get('aws.secretsmanager.max_workers', default=self.MAX_WORKERS)
+        batches = [
+            names[i:i + self.BATCH_SIZE]
+            for i in range(0, len(names), self.BATCH_SIZE)
+        ]
+
+        self.api_calls += len(batches)
+
+        try:
+            responses = self._map(
+                lambda batch: client.batch_get_secret_value(SecretIdList=batch),
+                batches,
+                max_workers=max_workers
+            )
+        except (AttributeError, NotImplementedError):
+            responses = []
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') not in self.UNSUPPORTED_ERRORS:
+                raise
+            responses = []
+
+        values = {}
+
+        for response in responses:
+            for stored_secret in response['SecretValues']:
+                values[stored_secret['Name']] = stored_secret['SecretString']
+
+        # Fetch the secrets one by one when the batch retrieval is not available
+        # or it has failed for the individual secrets
+        missing = [name for name in names if name not in values]
+        self.api_calls += len(missing)
+        stored_secrets = self._map(
+            lambda name: client.get_secret_value(SecretId=name),
+            missing,
+            max_workers=max_workers
+        )
+
+        for name, stored_secret in zip(missing, stored_secrets):
+            values[name] = stored_secret['SecretString']
+
+        return values
@@ -3,34 +3,46 @@ Boto3 session interface class
 
 The purpose of this interface class is especially to leverage the Boto3
 session to create the clients so that it is possible to separate testing
-from production code
+from production code. Boto3 sessions are not thread-safe, so the session and
+the clients are created under a lock. The clients can be used concurrently.
 
 @author Arttu Manninen <arttu@kaktus.cc>
 """
-import boto3
+import threading
 
 class Boto3():
     """ Boto3 interface """
+    # Region of the clients when the region is not configured
+    DEFAULT_REGION = 'eu-north-1'
+
     def __init__(self):
         """ Constructor """
         self._session = None
         self._services = {}
+        self._lock = threading.RLock()
 
     def session(self):
         """ Get Boto3 session """
-        if self._session is None:
-            self._session = boto3.session.Session()
+        with self._lock:
+            if self._session is None:
+                # Imported on demand to keep importing the configuration fast
+                import boto3 # pylint: disable=import-outside-toplevel
+                self._session = boto3.session.Session()
 
-        return self._session
+            return self._session
 
     def session_reset(self):
         """ Reset the current Boto3 session """
-        self._session = None
-        self._services.clear()
-
-    def client(self, service_name: str, *args, region: str = 'eu-north-1', **kwargs):
-        """ Get Boto3 client using the session """
-        if service_name not in self._services:
-            self._services[service_name] = self.session() \
-                .client(service_name, region, *args, **kwargs)
-        return self._services[service_name]
+        with self._lock:
+            self._session = None
+            self._services.clear()
+
+    def client(self, service_name: str, *args, region: str = None, **kwargs):
+        """ Get Boto3 client of the region using the session """
+        region = region or self.DEFAULT_REGION
+
+        with self._lock:
+            if (service_name, region) not in self._services:
+                self._services[service_name, region] = self.session() \
+                    .client(service_name, region, *args, **kwargs)
+            return self._services[service_name, region]
@@ -0,0 +1,99 @@
+"""
+Implementation for AWS Systems Manager Parameter Store
+
+Loads the parameter hierarchy under `aws.parameterstore.path`, mapping the
+parameter path relative to the hierarchy to the configuration key, e.g. with
+path `/application` the parameter `/application/db/connection_string` is set
+to `db.connection_string`. SecureString parameters are decrypted and
+StringList parameters are set as lists.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import json
+from config.external.aws import boto3
+from config.external.interface import VersionedInterface
+
+class ParameterStore(VersionedInterface):
+    """ AWS Systems Manager Parameter Store """
+    NAME = 'aws.parameterstore'
+
+    # Non-secret settings, the secrets override them
+    PRIORITY = 50
+
+    # Maximum number of parameters in a GetParametersByPath response
+    PAGE_SIZE = 10
+
+    def __init__(self, config):
+        """ Constructor """
+        super().__init__(config)
+
+        # Values of the listed parameters by the parameter name, the values
+        # are included in the listing
+        self._values = {}
+
+    def get_path(self) -> str:
+        """ Get the parameter hierarchy path without the trailing slash """
+        path = self.config.get('aws.parameterstore.path', default='/') or '/'
+        return '/' + path.strip('/') if path.strip('/') else ''
+
+    def select(self) -> list:
+        """ List the parameters under the hierarchy path """
+        path = self.get_path()
+        client = boto3.client('ssm', region=self.config.get('aws.region'))
+        paginator = client.get_paginator('get_parameters_by_path')
+        parameters = []
+
+        for page in paginator.paginate(
+            Path=path or '/',
+            Recursive=True,
+            WithDecryption=True,
+            PaginationConfig={
+                'PageSize': self.PAGE_SIZE
+            }
+        ):
+            self.api_calls += 1
+            parameters.extend(page['Parameters'])
+
+        # Shallower paths first so that the nested parameters are merged over them
+        parameters.sort(key=lambda parameter: (parameter['Name'].count('/'), parameter['Name']))
+
+        self._values = {}
+        selected = []
+
+        for parameter in parameters:
+            name = parameter['Name']
+            key = self.to_key(name, path)
+
+            if not key:
+                continue
+
+            value = parameter['Value']
+
+            if parameter.get('Type') == 'StringList':
+                value = json.dumps(value.split(','))
+
+            self._values[name] = value
+            selected.append((
+                name,
+                key,
+                (parameter.get('Version'), str(parameter.get('LastModifiedDate')))
+            ))
+
+        return selected
+
+    def get_values(self, names: list) -> dict:
+        """ Get the parameter values by the parameter name """
+        return {name: self._values[name] for name in names}
+
+    def cache_key(self) -> tuple:
+        """ Get the values that identify the fetched parameters in the cache """
+        return (
+            self.NAME,
+            self.config.get('aws.region'),
+            self.get_path()
+        )
+
+    @staticmethod
+    def to_key(name: str, path: str) -> str:
+        """ Convert the parameter name to the configuration key """
+        return '.'.join(part for part in name[len(path):].split('/') if part)
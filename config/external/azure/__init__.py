@@ -3,20 +3,36 @@ Implementation for AWS SecretsManager
 
 @author Arttu Manninen <arttu@kaktus.cc>
 """
+import importlib.util
 import re
 import json
 import yaml
-from config.external.interface import ExternalInterface
-from azure.identity import DefaultAzureCredential, ClientSecretCredential, CertificateCredential, UsernamePasswordCredential
+from config.external.interface import VersionedInterface
+from azure import identity
 from azure.keyvault.secrets import SecretClient
 
-class KeyVault(ExternalInterface):
+class KeyVault(VersionedInterface):
+    NAME = 'azure.keyvault'
+    PRIORITY = 200
     SEPARATOR = '---'
     DOT = '--'
 
     """ External interface """
-    def get_credentials(self):
-        """ Get credentials """
+    def __init__(self, config):
+        """ Constructor """
+        super().__init__(config)
+        self._client = None
+        self._async_client = None
+        self._async_credential = None
+
+    def get_credentials(self, aio: bool = False):
+        """ Get credentials, the asynchronous credentials with aio, None if not available """
+        credentials = identity
+
+        # The asynchronous clients are imported only for the asynchronous loading
+        if aio:
+            from azure.identity import aio as credentials # pylint: disable=import-outside-toplevel
+
         tenant_id = self.config.get('azure.tenant_id')
         client_id = self.config.get('azure.client_id')
         client_secret = self.config.get('azure.client_secret')
@@ -25,75 +41,178 @@ class KeyVault(ExternalInterface):
         password = self.config.get('azure.password')
 
         if tenant_id and client_id and client_secret:
-            return ClientSecretCredential(
+            return credentials.ClientSecretCredential(
                 tenant_id=tenant_id,
                 client_id=client_id,
                 client_secret=client_secret
             )
 
         if tenant_id and client_id and certificate_path:
-            return CertificateCredential(
+            return credentials.CertificateCredential(
                 tenant_id=tenant_id,
                 client_id=client_id,
                 certificate_path=certificate_path
             )
 
         if client_id and username and password:
-            return UsernamePasswordCredential(
+            if not hasattr(credentials, 'UsernamePasswordCredential'):
+                return None
+
+            return credentials.UsernamePasswordCredential(
                 client_id=client_id,
                 username=username,
                 password=password
             )
 
-        return DefaultAzureCredential()
+        return credentials.DefaultAzureCredential()
 
     def get_client(self):
         """ Get client """
-        return SecretClient(
-            vault_url=self.config.get('azure.keyvault.uri'),
-            credential=self.get_credentials()
-        )
-
-    def load(self):
-        """ Load Azure Key Vault to the configuration """
-        prefix = self.config.get('azure.keyvault.prefix', default='')
+        if self._client is None:
+            self._client = SecretClient(
+                vault_url=self.config.get('azure.keyvault.uri'),
+                credential=self.get_credentials()
+            )
+        return self._client
 
+    def select(self) -> list:
+        """ List the Azure Key Vault secrets to load """
         client = self.get_client()
 
-        props = client.list_properties_of_secrets()
-        secrets = []
+        # the list doesn't include values or versions of the secrets
+        self.api_calls += 1
+        return self._select(list(client.list_properties_of_secrets()))
 
-        for prop in props:
-            # the list doesn't include values or versions of the secrets
-            stored = client.get_secret(prop.name)
-            secrets.append({
-                'name': prop.name,
-                'value': stored.value
-            })
-
-        def sort_secrets(secret):
+    def _select(self, props: list) -> list:
+        """ Select the secrets to load from the listed secret properties """
+        prefix = self.config.get('azure.keyvault.prefix', default='')
+        props = [prop for prop in props if prop.enabled is not False]
+
+        def sort_secrets(prop):
             """ Sort secrets """
-            if '---' in secret['name']:
+            if KeyVault.SEPARATOR in prop.name:
                 return 1
             return 0
 
-        secrets.sort(key=sort_secrets)
+        props.sort(key=sort_secrets)
 
-        for secret in secrets:
-            name = secret['name']
-            value = self._parse_secret_value(secret['value'])
+        # Filter the secrets before fetching the values
+        selected = []
 
-            if KeyVault.SEPARATOR not in secret['name'] and self.config.get('azure.keyvault.skip_unprefixed'):
+        for prop in props:
+            name = prop.name
+
+            if KeyVault.SEPARATOR not in prop.name and self.config.get('azure.keyvault.skip_unprefixed'):
                 continue
 
-            if KeyVault.SEPARATOR in secret['name']:
-                if not prefix or not secret['name'].startswith(f'{prefix}{KeyVault.SEPARATOR}'):
+            if KeyVault.SEPARATOR in prop.name:
+                if not prefix or not prop.name.startswith(f'{prefix}{KeyVault.SEPARATOR}'):
                     continue
 
-                name = name[len(prefix) + len(KeyVault.SEPARATOR)]
+                name = name[len(prefix) + len(KeyVault.SEPARATOR):]
 
-            if name == 'config':
-                self.config.set(value)
-                continue
+            # The listed properties have the update time but usually not the version
+            version = getattr(prop, 'version', None)
+            updated_on = getattr(prop, 'updated_on', None)
+
+            if version is not None or updated_on is not None:
+                version = (version, str(updated_on))
+
+            selected.append((prop.name, KeyVault.to_key(name), version))
+
+        return selected
+
+    def get_values(self, names: list) -> dict:
+        """ Get the secret values by the secret name """
+        client = self.get_client()
+        self.api_calls += len(names)
+        stored_values = self._map(
+            lambda name: client.get_secret(name).value,
+            names,
+            max_workers=self.config.get('azure.keyvault.max_workers', default=self.MAX_WORKERS)
+        )
+        return dict(zip(names, stored_values))
+
+    def get_async_client(self):
+        """ Get the asynchronous client, None when the aio transport is not available """
+        if self._async_client is None:
+            if importlib.util.find_spec('aiohttp') is None:
+                return None
+
+            credential = self.get_credentials(aio=True)
+
+            if credential is None:
+                return None
+
+            # pylint: disable-next=import-outside-toplevel
+            from azure.keyvault.secrets.aio import SecretClient as AsyncSecretClient
+
+            self._async_credential = credential
+            self._async_client = AsyncSecretClient(
+                vault_url=self.config.get('azure.keyvault.uri'),
+                credential=credential
+            )
+        return self._async_client
+
+    async def close_async_client(self):
+        """ Close the asynchronous client and its credentials """
+        client = self._async_client
+        credential = self._async_credential
+        self._async_client = None
+        self._async_credential = None
+
+        if client is not None:
+            await client.close()
+
+        if credential is not None and hasattr(credential, 'close'):
+            await credential.close()
+
+    async def fetch_async(self) -> list:
+        """ Fetch the secrets with the asynchronous client when available """
+        try:
+            return await super().fetch_async()
+        finally:
+            await self.close_async_client()
+
+    async def select_async(self) -> list:
+        """ List the Azure Key Vault secrets to load with the asynchronous client """
+        client = self.get_async_client()
+
+        if client is None:
+            return await super().select_async()
+
+        self.api_calls += 1
+        return self._select([prop async for prop in client.list_properties_of_secrets()])
+
+    async def get_values_async(self, names: list) -> dict:
+        """ Get the secret values concurrently with the asynchronous client """
+        client = self.get_async_client()
+
+        if client is None:
+            return await super().get_values_async(names)
+
+        async def get_value(name: str) -> str:
+            """ Get the secret value """
+            return (await client.get_secret(name)).value
+
+        self.api_calls += len(names)
+        stored_values = await self._map_async(
+            get_value,
+            names,
+            max_workers=self.config.get('azure.keyvault.max_workers', default=self.MAX_WORKERS)
+        )
+        return dict(zip(names, stored_values))
+
+    def cache_key(self) -> tuple:
+        """ Get the values that identify the fetched secrets in the cache """
+        return (
+            self.NAME,
+            self.config.get('azure.keyvault.uri'),
+            self.config.get('azure.keyvault.prefix'),
+            bool(self.config.get('azure.keyvault.skip_unprefixed'))
+        )
 
-            self.config.set(name.replace('--', '.').replace('-', '_'), value)
+    @staticmethod
+    def to_key(name: str) -> str:
+        """ Convert the unprefixed secret name to the configuration key """
+        return name.replace(KeyVault.DOT, '.').replace('-', '_')
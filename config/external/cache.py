@@ -0,0 +1,273 @@
+"""
+Encrypted on-disk cache for the external secrets
+
+Worker processes on the same host can share the fetched secrets instead of
+each fetching them from the external source. The cache is keyed by the source
+and its options (e.g. region, vault and prefix), encrypted with a locally
+supplied Fernet key and expires after the TTL. Only one process refreshes an
+expired entry while the others use the stale one. Example configuration::
+
+    secrets:
+      cache:
+        enabled: true
+        # Fernet key, e.g. from the environment variable SECRETS_CACHE_KEY
+        key: '...'
+        # Cache directory owned by the user with the mode 0700, defaults to
+        # ~/.cache/config-secrets
+        path: '/var/cache/application'
+        # Time to live in seconds
+        ttl: 300
+        # Use the stale cache if the external source fails
+        stale_on_error: true
+
+Refreshing the secrets goes through the cache as well. The entry records the
+versions of the secrets, so an interface that read its secrets from the cache
+refreshes them incrementally. Within the TTL the refresh applies only an entry
+written by another process since. The process that refreshes an expired entry
+fetches only the changed secrets from the external source and writes the
+refreshed secrets back, while the other processes poll only the cache.
+
+The cache requires the optional dependency `cryptography`, installed with the
+`cache` extra, i.e. `pip install config[cache]`. A new key can be generated
+with::
+
+    python3 -c 'from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())'
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from stat import S_IMODE, S_ISDIR
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover
+    fcntl = None
+
+class SecretsCache():
+    """ Encrypted on-disk secrets cache """
+    TTL = 300
+
+    def __init__(self, path: str, key: 'Union(str, bytes)', ttl: float = TTL, \
+        stale_on_error: bool = True):
+        """ Constructor """
+        # The optional dependency is imported only when the cache is enabled
+        try:
+            from cryptography.fernet import Fernet # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ImportError(
+                'Secrets cache requires the cryptography package, '
+                'install it with "pip install config[cache]"'
+            ) from error
+
+        self.path = path
+        self.ttl = float(ttl)
+        self.stale_on_error = stale_on_error
+        self._fernet = Fernet(key.encode() if isinstance(key, str) else key)
+
+    @staticmethod
+    def from_config(config) -> 'SecretsCache':
+        """ Get the secrets cache configured in the configuration, None when disabled """
+        if not config.get('secrets.cache.enabled'):
+            return None
+
+        key = config.get('secrets.cache.key')
+
+        if not key:
+            raise ValueError('Secrets cache requires an encryption key in "secrets.cache.key"')
+
+        stale_on_error = config.get('secrets.cache.stale_on_error')
+
+        return SecretsCache(
+            config.get(
+                'secrets.cache.path',
+                default=os.path.join(os.path.expanduser('~'), '.cache', 'config-secrets')
+            ),
+            key,
+            ttl=config.get('secrets.cache.ttl', default=SecretsCache.TTL),
+            stale_on_error=stale_on_error is None or bool(stale_on_error)
+        )
+
+    def directory(self) -> str:
+        """ Create the cache directory, raises PermissionError if other users can access it """
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        stat = os.lstat(self.path)
+
+        # Other users could plant symbolic links to overwrite the files of the user
+        if not S_ISDIR(stat.st_mode) or \
+            (hasattr(os, 'getuid') and stat.st_uid != os.getuid()) or \
+            S_IMODE(stat.st_mode) & 0o077:
+            raise PermissionError(
+                f'Secrets cache directory "{self.path}" must be a directory owned by the user '
+                'with the mode 0700'
+            )
+
+        return self.path
+
+    def file_path(self, interface) -> str:
+        """ Get the cache file path for the external interface """
+        cache_key = json.dumps(interface.cache_key(), default=str)
+        return os.path.join(self.path, hashlib.sha256(cache_key.encode()).hexdigest())
+
+    def read(self, file_path: str) -> tuple:
+        """ Read the cache file, returns a tuple (age, entry) or None """
+        from cryptography.fernet import InvalidToken # pylint: disable=import-outside-toplevel
+
+        try:
+            with open(file_path, 'rb') as cache_file:
+                token = cache_file.read()
+
+            entry = json.loads(self._fernet.decrypt(token))
+            age = time.time() - self._fernet.extract_timestamp(token)
+        except (OSError, ValueError, InvalidToken):
+            return None
+
+        return age, entry
+
+    def write(self, file_path: str, entry: dict):
+        """ Write the cache file atomically """
+        token = self._fernet.encrypt(json.dumps(entry).encode())
+
+        # The temporary file is created exclusively with the mode 0600
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory(), suffix='.tmp')
+
+        try:
+            with os.fdopen(descriptor, 'wb') as cache_file:
+                cache_file.write(token)
+
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    @staticmethod
+    def entry(interface, secrets: list) -> dict:
+        """ Get the cache entry of the secrets the interface has fetched """
+        entry = {'generation': time.time()}
+
+        if interface.selected:
+            # The versions are kept to refresh the secrets incrementally
+            entry['selected'] = [list(selected) for selected in interface.selected]
+            entry['values'] = interface.values
+        else:
+            entry['secrets'] = [list(secret) for secret in secrets]
+
+        return entry
+
+    @staticmethod
+    def restore(interface, entry: dict, changes: bool = False) -> list:
+        """ Restore the interface to the cache entry, returns the secrets of the entry
+
+        With `changes` nothing is returned when the interface has already
+        applied the entry.
+        """
+        generation = entry.get('generation')
+
+        if changes and generation is not None and generation == interface.generation:
+            return []
+
+        if 'secrets' in entry:
+            interface.forget()
+            interface.generation = generation
+            return [tuple(secret) for secret in entry['secrets']]
+
+        # JSON stores the version tuples as lists
+        interface.restore(
+            [
+                (name, key, tuple(version) if isinstance(version, list) else version)
+                for name, key, version in entry['selected']
+            ],
+            entry['values'],
+            generation
+        )
+        return interface.fetched()
+
+    def fetch(self, interface) -> list:
+        """ Fetch the secrets from the cache or from the external interface """
+        def fetch_all(_entry: dict) -> tuple:
+            """ Fetch all the secrets from the external interface """
+            secrets = interface.fetch()
+            return secrets, secrets
+
+        return self._load(interface, fetch_all)
+
+    def refresh(self, interface) -> list:
+        """ Fetch the secrets changed since the interface applied them, through the cache
+
+        The interface refreshes an expired entry incrementally from the
+        versions recorded in the entry and writes the refreshed secrets back.
+        A fresh entry written by another process is returned as a whole.
+        """
+        def fetch_changes(entry: dict) -> tuple:
+            """ Fetch the changes to the entry from the external interface """
+            secrets = []
+            generation = interface.generation
+
+            # Secrets another process has refreshed are applied before the changes
+            if entry is not None:
+                secrets = SecretsCache.restore(interface, entry, changes=True)
+
+            try:
+                changes = interface.fetch_changes()
+            except Exception:
+                # The stale entry is then returned as a whole
+                interface.generation = generation
+                raise
+
+            if not interface.selected:
+                # Interfaces without the versions fetch all the secrets
+                return changes, changes
+
+            return secrets + changes, interface.fetched()
+
+        return self._load(interface, fetch_changes, changes=True)
+
+    def _load(self, interface, fetch: 'callable', changes: bool = False) -> list:
+        """ Get the secrets of a fresh cache entry or fetch them under the cache lock
+
+        The fetch is called with the stale entry or None and returns the
+        secrets to apply and all the secrets to write to the cache.
+        """
+        self.directory()
+        file_path = self.file_path(interface)
+        cached = self.read(file_path)
+
+        if cached is not None and cached[0] < self.ttl:
+            return SecretsCache.restore(interface, cached[1], changes=changes)
+
+        lock_flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_NOFOLLOW', 0)
+
+        with os.fdopen(os.open(f'{file_path}.lock', lock_flags, 0o600), 'ab') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Another process is refreshing, use the stale secrets meanwhile
+                    if cached is not None:
+                        return SecretsCache.restore(interface, cached[1], changes=changes)
+
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            # The secrets may have been refreshed while waiting for the lock
+            refreshed = self.read(file_path)
+
+            if refreshed is not None and refreshed[0] < self.ttl:
+                return SecretsCache.restore(interface, refreshed[1], changes=changes)
+
+            cached = refreshed or cached
+
+            try:
+                secrets, fetched = fetch(cached[1] if cached is not None else None)
+            except Exception: # pylint: disable=broad-except
+                if cached is None or not self.stale_on_error:
+                    raise
+                return SecretsCache.restore(interface, cached[1], changes=changes)
+
+            entry = SecretsCache.entry(interface, fetched)
+            self.write(file_path, entry)
+            interface.generation = entry['generation']
+
+        return [tuple(secret) for secret in secrets]
@@ -1,31 +1,378 @@
 """
 External source interface class
 
+External sources fetch the secrets as a list of (configuration key, secret
+value) tuples in the order they are applied to the configuration. Secret
+values are parsed when they are applied.
+
+Interfaces implement the abstract `fetch`. Sources that can list the secrets
+with their versions inherit `VersionedInterface` and implement the abstract
+`select` and `get_values` instead. They are refreshed incrementally, i.e. only
+the values of the secrets with a changed version are fetched and applied.
+`retrieve_changes` fetches the changes without applying them, so that the
+configuration applies them under its write lock after the network calls.
+
+Interfaces count their API calls in `api_calls`. Retrieving and refreshing
+the secrets is measured with the instrumentation of the configuration when it
+is enabled.
+
+The asynchronous variants `load_async` and `retrieve_async` fetch the secrets
+without blocking the event loop. By default the blocking clients are called in
+the default executor, `fetch` of the interfaces that do not list the versions;
+versioned interfaces with an asynchronous client implement `select_async` and
+`get_values_async` and fetch the values concurrently under a semaphore with
+`_map_async`.
+
+Interfaces declare their `PRIORITY` and optionally the configuration key that
+enables them as `ENABLED_KEY`, by default `<name>.enabled` of the provider.
+When the secrets are loaded the enabled interfaces fetch their secrets
+concurrently and the secrets are applied by the priority, the lowest priority
+first.
+
 @author Arttu Manninen <arttu@kaktus.cc>
 """
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import deepcopy
+from functools import lru_cache
 import json
+import re
 import yaml
+from config.external.cache import SecretsCache
+
+# Single word values without the YAML or JSON syntax, e.g. most passwords.
+# Their value is the string itself unless YAML resolves it to e.g. a boolean.
+# Values starting with a digit are parsed since they may be JSON numbers.
+PLAIN_VALUE = re.compile(r'[^\s\d\-?:,\[\]{}#&*!|>\'"%@`][^\s]*(?<!:)\Z')
+
+# Words that JSON parses as numbers but YAML does not resolve
+JSON_WORDS = ('NaN', 'Infinity')
+
+# Single line values starting with a YAML indicator, e.g. passwords such as
+# "#x", "&a" or ">#pass", and the bare document markers are not parsed as YAML.
+# Other values are parsed as YAML like before, e.g. " a #b" is "a".
+INDICATOR_VALUE = re.compile(r'(?:[#&*!|>%@`].*|---|\.\.\.)\Z')
+
+# Tag of the bare YAML indicators
+YAML_INDICATOR_TAG = 'tag:yaml.org,2002:yaml'
+
+def is_plain_value(value: str) -> bool:
+    """ Check if the secret value is a plain string that does not need parsing """
+    if not PLAIN_VALUE.match(value) or value in JSON_WORDS:
+        return False
+
+    return not is_yaml_scalar(value)
+
+def is_yaml_scalar(value: str) -> bool:
+    """ Check if YAML resolves the value to e.g. a boolean, a number or null """
+    for tag, regexp in yaml.resolver.Resolver.yaml_implicit_resolvers.get(value[:1], []):
+        # The indicators "!", "&" and "*" alone are not values
+        if tag != YAML_INDICATOR_TAG and regexp.match(value):
+            return True
+
+    return False
+
+def is_indicator_value(value: str) -> bool:
+    """ Check if the value is a single line starting with a YAML indicator """
+    return bool(INDICATOR_VALUE.match(value))
+
+@lru_cache(maxsize=1024)
+def parse_secret_value(value: str) -> 'mixed':
+    """ Parse the secret value as JSON, YAML or a plain string, memoized by the value """
+    if is_plain_value(value):
+        return value
+
+    try:
+        return json.loads(value)
+    except json.decoder.JSONDecodeError:
+        pass
+
+    if is_indicator_value(value):
+        return value
+
+    # The pure Python loader rejects the malformed values LibYAML accepts,
+    # e.g. ">#password" that LibYAML parses as an empty string
+    try:
+        return yaml.load(value, Loader=yaml.SafeLoader)
+    except yaml.YAMLError:
+        return value
 
 class ExternalInterface(ABC):
     """ External interface """
+    NAME = None
+    PRIORITY = 0
+    ENABLED_KEY = None
+    MAX_WORKERS = 10
+
     def __init__(self, config):
         """ Constructor """
         self.config = config
 
-    @abstractmethod
+        # Versions and the key owners of the previously fetched secrets, the
+        # selected (name, key, version) tuples and their values by the name
+        self.versions = {}
+        self.owners = {}
+        self.selected = []
+        self.values = {}
+
+        # Generation of the secrets cache entry the secrets were read from
+        self.generation = None
+
+        # Number of the requests made to the source
+        self.api_calls = 0
+
     def load(self):
         """ Load external config """
+        self.apply(self.retrieve())
+
+    def retrieve(self) -> list:
+        """ Fetch the secrets from the secrets cache when enabled, otherwise from the source """
+        return self._measured(self._retrieve)
+
+    def _retrieve(self) -> list:
+        """ Fetch the secrets from the secrets cache when enabled, otherwise from the source """
+        cache = SecretsCache.from_config(self.config)
+
+        if cache is None:
+            return self.fetch()
+
+        return cache.fetch(self)
+
+    async def load_async(self):
+        """ Load external config without blocking the event loop """
+        self.apply(await self.retrieve_async())
+
+    async def retrieve_async(self) -> list:
+        """ Fetch the secrets without blocking the event loop """
+        if SecretsCache.from_config(self.config) is not None:
+            # The secrets cache is read and written synchronously
+            return await self._in_executor(self.retrieve)
+
+        with self._measure():
+            return await self.fetch_async()
+
+    async def fetch_async(self) -> list:
+        """ Fetch the secrets as a list of (key, value) tuples in the default executor """
+        return await self._in_executor(self.fetch)
+
+    @staticmethod
+    async def _in_executor(func: 'callable', *args) -> 'mixed':
+        """ Call the blocking function in the default executor """
+        # Imported on demand to keep importing the interfaces fast
+        import asyncio # pylint: disable=import-outside-toplevel
+
+        # The event loop of the running coroutine, get_running_loop is not in Python 3.6
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    @abstractmethod
+    def fetch(self) -> list:
+        """ Fetch the secrets as a list of (key, value) tuples """
+
+    def refresh(self) -> list:
+        """ Apply the secrets changed since the previous fetch, returns the applied secrets """
+        secrets = self.retrieve_changes()
+        self.apply(secrets)
+        return secrets
+
+    def retrieve_changes(self) -> list:
+        """ Fetch the secrets changed since the previous fetch without applying them """
+        return self._measured(self._retrieve_changes)
+
+    def _retrieve_changes(self) -> list:
+        """ Fetch the changed secrets through the secrets cache when enabled """
+        cache = SecretsCache.from_config(self.config)
+
+        if cache is None:
+            return self.fetch_changes()
+
+        return cache.refresh(self)
+
+    def fetch_changes(self) -> list:
+        """ Fetch the secrets changed since the previous fetch as a list of (key, value) tuples """
+        # Interfaces without the versions fetch all the secrets
+        return self.fetch()
+
+    def fetched(self) -> list:
+        """ Get the remembered secrets as (key, value) tuples in the applying order """
+        return [
+            (key, self.values[name])
+            for name, key, _version in self.selected
+            if name in self.values
+        ]
+
+    def restore(self, selected: list, values: dict, generation: float = None):
+        """ Remember the secrets read from the secrets cache instead of fetching them """
+        self.forget()
+        self._remember(selected, values)
+        self.generation = generation
+
+    def checkpoint(self) -> tuple:
+        """ Get the versions and the values of the applied secrets """
+        return self.versions, self.owners, self.selected, self.values, self.generation
+
+    def rollback(self, checkpoint: tuple):
+        """ Restore the versions and the values of the checkpoint """
+        self.versions, self.owners, self.selected, self.values, self.generation = checkpoint
+
+    def forget(self):
+        """ Forget the versions of the fetched secrets, the next refresh fetches all the secrets """
+        self.versions = {}
+        self.owners = {}
+        self.selected = []
+        self.values = {}
+        self.generation = None
+
+    def _measured(self, func: 'callable') -> 'mixed':
+        """ Call the function, measured as loading the source when instrumented """
+        with self._measure():
+            return func()
+
+    @contextmanager
+    def _measure(self):
+        """ Measure loading the source and its API calls within the context when instrumented """
+        instrumentation = self.config.instrumentation
+
+        if instrumentation is None:
+            yield
+            return
+
+        api_calls = self.api_calls
+
+        with instrumentation.measure(self.NAME) as measurement:
+            try:
+                yield
+            finally:
+                measurement.calls = self.api_calls - api_calls
+
+    def _remember(self, selected: list, values: dict):
+        """ Remember the versions of the selected secrets and their fetched values """
+        self.versions = {name: version for name, _key, version in selected}
+        self.owners = {key: name for name, key, _version in selected}
+        self.selected = list(selected)
+
+        # Values of the unchanged secrets are kept from the previous fetch
+        previous = self.values
+        self.values = {}
+
+        for name, _key, _version in selected:
+            if name in values:
+                self.values[name] = values[name]
+            elif name in previous:
+                self.values[name] = previous[name]
+
+    def cache_key(self) -> tuple:
+        """ Get the values that identify the fetched secrets in the cache """
+        return (self.NAME,)
+
+    def apply(self, secrets: list):
+        """ Apply the fetched secrets to the configuration at once """
+        values = []
+
+        for key, value in secrets:
+            value = self._parse_secret_value(value)
+
+            # Special case: when the name of the secret is "config" it is handled
+            # as a full set of configuration instead of a subset
+            if key == 'config':
+                values.append((None, value))
+                continue
+
+            values.append((key, value))
+
+        self.config.set_many(values)
+
+    @staticmethod
+    def _map(func: 'callable', items: list, max_workers: int = MAX_WORKERS) -> list:
+        """ Call the function for each item concurrently, the results are in the item order """
+        max_workers = min(int(max_workers or 1), len(items))
+
+        if max_workers <= 1:
+            return [func(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, items))
+
+    @staticmethod
+    async def _map_async(func: 'callable', items: list, max_workers: int = MAX_WORKERS) -> list:
+        """ Await the coroutine function for each item concurrently, in the item order """
+        import asyncio # pylint: disable=import-outside-toplevel
+
+        semaphore = asyncio.Semaphore(max(int(max_workers or 1), 1))
+
+        async def call(item: 'mixed') -> 'mixed':
+            """ Await the function when the semaphore allows """
+            async with semaphore:
+                return await func(item)
+
+        return await asyncio.gather(*(call(item) for item in items))
 
     @staticmethod
     def _parse_secret_value(value: str):
         """ Parse secret value """
-        try:
-            return json.loads(value)
-        except json.decoder.JSONDecodeError:
-            pass
-
-        try:
-            return yaml.load(value, Loader=yaml.Loader)
-        except yaml.scanner.ScannerError:
+        if not isinstance(value, str):
             return value
+
+        parsed = parse_secret_value(value)
+
+        # Memoized dictionaries and lists are copied to keep them intact
+        if isinstance(parsed, (dict, list)):
+            return deepcopy(parsed)
+
+        return parsed
+
+
+class VersionedInterface(ExternalInterface):
+    """ External interface that lists the secrets with their versions """
+    def fetch(self) -> list:
+        """ Fetch the secrets as a list of (key, value) tuples """
+        selected = self.select()
+        values = self.get_values([name for name, _key, _version in selected])
+        self._remember(selected, values)
+        return [(key, values[name]) for name, key, _version in selected]
+
+    @abstractmethod
+    def select(self) -> list:
+        """ List the secrets to load as (name, key, version) tuples in the applying order """
+
+    @abstractmethod
+    def get_values(self, names: list) -> dict:
+        """ Get the secret values by the secret name """
+
+    async def fetch_async(self) -> list:
+        """ Fetch the secrets as a list of (key, value) tuples without blocking the event loop """
+        selected = await self.select_async()
+        values = await self.get_values_async([name for name, _key, _version in selected])
+        self._remember(selected, values)
+        return [(key, values[name]) for name, key, _version in selected]
+
+    async def select_async(self) -> list:
+        """ List the secrets to load in the default executor """
+        return await self._in_executor(self.select)
+
+    async def get_values_async(self, names: list) -> dict:
+        """ Get the secret values in the default executor """
+        return await self._in_executor(self.get_values, names)
+
+    def fetch_changes(self) -> list:
+        """ Fetch the secrets changed since the previous fetch as a list of (key, value) tuples """
+        if not self.versions:
+            return self.fetch()
+
+        selected = self.select()
+
+        # The last secret for the key has the priority
+        owners = {key: name for name, key, _version in selected}
+        changed = [
+            (name, key)
+            for name, key, version in selected
+            if (key == 'config' or owners[key] == name) and (
+                version is None or
+                self.versions.get(name) != version or
+                self.owners.get(key) != name
+            )
+        ]
+
+        values = self.get_values([name for name, _key in changed])
+        self._remember(selected, values)
+        return [(key, values[name]) for name, key in changed]
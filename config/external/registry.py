@@ -0,0 +1,159 @@
+"""
+External provider registry
+
+Providers are registered by the name with the path of the interface class as
+"module:class". The enablement key of the provider is the key given in the
+registration, the `ENABLED_KEY` of the interface class or `<name>.enabled`.
+Providers registered with the enablement key are imported only when the key is
+set in the configuration, the others are imported to read their `ENABLED_KEY`.
+An interface class that cannot be imported uses the default key, so that the
+import fails only when the provider is enabled.
+
+Other packages can add providers with the `config.providers` entry point
+group, the entry point name being the provider name::
+
+    setuptools.setup(
+        ...
+        entry_points={
+            'config.providers': [
+                'hashicorp.vault = config_vault:VaultInterface'
+            ]
+        }
+    )
+
+Secrets of the enabled providers are applied by the priority of the interface
+class, the lowest priority first, so that the secrets of the higher priority
+providers override the lower ones. Providers with the same priority are
+applied in the registration order.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+from importlib import import_module
+
+try:
+    from importlib.metadata import entry_points
+except ImportError: # pragma: no cover
+    try:
+        from importlib_metadata import entry_points
+    except ImportError:
+        entry_points = None
+
+ENTRY_POINT_GROUP = 'config.providers'
+
+class Provider():
+    """ Registered provider """
+    def __init__(self, name: str, target: 'Union(str, type)', priority: int = None, \
+        enabled_key: str = None):
+        """ Constructor """
+        self.name = name
+        self.target = target
+        self._enabled_key = enabled_key
+        self._priority = priority
+
+    @property
+    def enabled_key(self) -> str:
+        """ Enablement key of the provider, the interface class key unless overridden """
+        if self._enabled_key is None:
+            try:
+                enabled_key = getattr(self.load(), 'ENABLED_KEY', None)
+            except ImportError:
+                enabled_key = None
+
+            self._enabled_key = enabled_key or f'{self.name}.enabled'
+
+        return self._enabled_key
+
+    def is_enabled(self, config) -> bool:
+        """ Check if the provider is enabled in the configuration """
+        return bool(config.get(self.enabled_key))
+
+    def load(self) -> type:
+        """ Get the interface class, imported on demand """
+        if isinstance(self.target, str):
+            module_name, class_name = self.target.split(':')
+            self.target = getattr(import_module(module_name), class_name)
+
+        return self.target
+
+    @property
+    def priority(self) -> int:
+        """ Priority of the provider, the interface class priority unless overridden """
+        if self._priority is not None:
+            return self._priority
+
+        return getattr(self.load(), 'PRIORITY', 0)
+
+class Registry():
+    """ Provider registry """
+    def __init__(self, discover: bool = True):
+        """ Constructor """
+        self._providers = {}
+        self._discover = discover
+
+    def register(self, name: str, target: 'Union(str, type)', priority: int = None, \
+        enabled_key: str = None) -> 'self':
+        """ Register a provider, replacing the earlier provider with the same name """
+        self._providers[name] = Provider(
+            name,
+            target,
+            priority=priority,
+            enabled_key=enabled_key
+        )
+        return self
+
+    def unregister(self, name: str) -> 'self':
+        """ Unregister a provider """
+        self._providers.pop(name, None)
+        return self
+
+    def discover(self) -> 'self':
+        """ Register the providers of the installed packages """
+        self._discover = False
+
+        if entry_points is None:
+            return self
+
+        try:
+            found = entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError: # pragma: no cover
+            # Before Python 3.10 entry points are grouped in a dictionary
+            found = entry_points().get(ENTRY_POINT_GROUP, [])
+
+        for entry_point in found:
+            if entry_point.name not in self._providers:
+                self.register(entry_point.name, entry_point.value)
+
+        return self
+
+    def providers(self) -> list:
+        """ Get the registered providers in the registration order """
+        if self._discover:
+            self.discover()
+
+        return list(self._providers.values())
+
+    def enabled(self, config) -> list:
+        """ Get the enabled providers in the priority order, the lowest priority first """
+        enabled = [provider for provider in self.providers() if provider.is_enabled(config)]
+
+        # Sorting is stable, providers with the same priority keep the registration order
+        return sorted(enabled, key=lambda provider: provider.priority)
+
+# Built-in providers are registered with the enablement key to import the SDKs
+# only when enabled
+registry = Registry()
+registry.register(
+    'aws.parameterstore',
+    'config.external.aws.ssm:ParameterStore',
+    enabled_key='aws.parameterstore.enabled'
+)
+registry.register(
+    'aws.secretsmanager',
+    'config.external.aws:SecretsManager',
+    enabled_key='aws.secretsmanager.enabled'
+)
+registry.register(
+    'azure.keyvault',
+    'config.external.azure:KeyVault',
+    enabled_key='azure.keyvault.enabled'
+)
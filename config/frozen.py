@@ -0,0 +1,149 @@
+"""
+Read-only configuration tree
+
+Large configuration trees, e.g. routing tables or tenant maps, can be frozen
+after loading to reduce their memory use::
+
+    config.load_configuration('config/tenants.yml')
+    config.freeze()
+
+Dictionaries are frozen to read-only dictionaries and lists to read-only
+lists, i.e. they are still dictionaries and lists for the type checks and for
+the JSON and YAML serialization. Keys are interned and equal strings are
+stored once, and the frozen nodes are allocated to their exact size.
+
+Frozen trees are never copied defensively. Writing to a frozen configuration
+copies only the modified path to plain dictionaries, `FrozenDict.copy()`
+returning a plain dictionary like the copy of a dictionary does.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import sys
+
+# Whether the YAML representers of the frozen types have been registered
+_representers = False
+
+def register_representers():
+    """ Represent the frozen dictionaries and lists as plain ones in YAML """
+    global _representers # pylint: disable=global-statement
+
+    if _representers:
+        return
+
+    # Imported on demand to keep importing the configuration fast
+    import yaml # pylint: disable=import-outside-toplevel
+
+    for representer in (yaml.representer.SafeRepresenter, yaml.representer.Representer):
+        representer.add_representer(FrozenDict, yaml.representer.SafeRepresenter.represent_dict)
+        representer.add_representer(FrozenList, yaml.representer.SafeRepresenter.represent_list)
+
+    _representers = True
+
+def read_only(*_args, **_kwargs):
+    """ Refuse to modify a frozen node """
+    raise TypeError('Frozen configuration cannot be modified')
+
+class FrozenList(list):
+    """ Read-only list """
+    __slots__ = ()
+
+    def __init__(self, items: 'Iterable' = ()):
+        """ Constructor """
+        register_representers()
+        list.__init__(self, items)
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = read_only
+    append = extend = insert = remove = pop = clear = sort = reverse = read_only
+
+    def copy(self) -> list:
+        """ Get a shallow copy as a plain list """
+        return list(self)
+
+    def __copy__(self) -> 'FrozenList':
+        """ Read-only lists are not copied """
+        return self
+
+    def __deepcopy__(self, memo: dict) -> 'FrozenList':
+        """ Read-only lists are not copied """
+        return self
+
+    def __reduce__(self) -> tuple:
+        """ Pickle the list by its items """
+        return (FrozenList, (list(self),))
+
+    def __repr__(self) -> str:
+        """ Get the representation of the list """
+        return f'FrozenList({list(self)!r})'
+
+class FrozenMapping():
+    """ Base class of the read-only mappings of the configuration tree """
+    __slots__ = ()
+
+    def copy(self) -> dict:
+        """ Get a shallow copy as a plain dictionary """
+        return dict(self.items())
+
+    def __copy__(self) -> 'FrozenMapping':
+        """ Read-only mappings are not copied """
+        return self
+
+    def __deepcopy__(self, memo: dict) -> 'FrozenMapping':
+        """ Read-only mappings are not copied """
+        return self
+
+class FrozenDict(FrozenMapping, dict):
+    """ Read-only dictionary """
+    __slots__ = ()
+
+    def __init__(self, items: 'Union(dict, list)' = ()):
+        """ Constructor """
+        register_representers()
+        dict.__init__(self, items)
+
+    __setitem__ = __delitem__ = __ior__ = read_only
+    clear = pop = popitem = setdefault = update = read_only
+
+    def copy(self) -> dict:
+        """ Get a shallow copy as a plain dictionary """
+        return dict(self)
+
+    def __reduce__(self) -> tuple:
+        """ Pickle the dictionary by its items """
+        return (FrozenDict, (dict(self),))
+
+    def __repr__(self) -> str:
+        """ Get the representation of the dictionary """
+        return f'FrozenDict({dict(self)!r})'
+
+# Types of the configuration tree nodes
+MAPPING_TYPES = (dict, FrozenMapping)
+LIST_TYPES = (list,)
+
+def freeze(value: 'mixed', strings: dict = None) -> 'mixed':
+    """ Freeze the dictionaries and the lists of the tree recursively """
+    if strings is None:
+        strings = {}
+
+    if isinstance(value, str):
+        return strings.setdefault(value, value)
+
+    if isinstance(value, MAPPING_TYPES):
+        return FrozenDict([
+            (sys.intern(key) if key.__class__ is str else key, freeze(item, strings))
+            for key, item in value.items()
+        ])
+
+    if isinstance(value, LIST_TYPES):
+        return FrozenList([freeze(item, strings) for item in value])
+
+    return value
+
+def thaw(value: 'mixed') -> 'mixed':
+    """ Convert the frozen tree to plain dictionaries and lists recursively """
+    if isinstance(value, MAPPING_TYPES):
+        return {key: thaw(item) for key, item in value.items()}
+
+    if isinstance(value, LIST_TYPES):
+        return [thaw(item) for item in value]
+
+    return value
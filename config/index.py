@@ -0,0 +1,175 @@
+"""
+Flattened key index
+
+The index lists the leaves of the configuration tree, i.e. the values other
+than dictionaries, by their dotted key path in sorted order. Keys under a
+prefix are contiguous in the sorted order and found with a binary search
+instead of walking the tree::
+
+    index = KeyIndex.build({'features': {'search': True, 'chat': False}, 'db': {'port': 5432}})
+
+    index.keys('features')
+    # ['features.chat', 'features.search']
+
+Leaves are indexed in buckets by the top level key, each bucket built on the
+first query under its key. Assigning a path returns a new index that shares
+the buckets of the other top level keys and drops only the bucket of the
+assigned key, i.e. a write costs the width of the root like copying the
+modified path of the tree, and an index can be shared by the immutable
+snapshots.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+from bisect import bisect_left
+from config.frozen import MAPPING_TYPES
+
+# Separator of the dotted key paths and the character following it
+SEPARATOR = '.'
+SEPARATOR_END = chr(ord(SEPARATOR) + 1)
+
+def flatten(tree: 'mixed', prefix: str = '') -> list:
+    """ Get the leaves of the tree as (dotted key path, value) tuples """
+    if not isinstance(tree, MAPPING_TYPES):
+        return [(prefix, tree)] if prefix else []
+
+    leaves = []
+    stack = [(prefix, tree)]
+
+    while stack:
+        path, node = stack.pop()
+
+        for key, value in node.items():
+            key_path = f'{path}{SEPARATOR}{key}' if path else str(key)
+
+            if isinstance(value, MAPPING_TYPES):
+                stack.append((key_path, value))
+            else:
+                leaves.append((key_path, value))
+
+    return leaves
+
+class SortedLeaves():
+    """ Leaves sorted by the dotted key path """
+    def __init__(self, leaves: list):
+        """ Constructor """
+        leaves = sorted(leaves, key=lambda leaf: leaf[0])
+
+        # Parallel lists sorted by the key
+        self._keys = [key for key, _value in leaves]
+        self._values = [value for _key, value in leaves]
+
+    def __len__(self) -> int:
+        """ Get the number of the leaves """
+        return len(self._keys)
+
+    def _find(self, key: str) -> int:
+        """ Get the position of the key, None when the key is not indexed """
+        i = bisect_left(self._keys, key)
+
+        if i < len(self._keys) and self._keys[i] == key:
+            return i
+
+        return None
+
+    def _range(self, prefix: str) -> tuple:
+        """ Get the range of the keys under the prefix """
+        return (
+            bisect_left(self._keys, prefix + SEPARATOR),
+            bisect_left(self._keys, prefix + SEPARATOR_END)
+        )
+
+    def keys(self, prefix: str) -> list:
+        """ Get the dotted key paths of the leaves under the prefix in sorted order """
+        exact = self._find(prefix)
+        start, end = self._range(prefix)
+        keys = self._keys[start:end]
+
+        if exact is not None:
+            keys.insert(0, prefix)
+
+        return keys
+
+    def items(self, prefix: str) -> list:
+        """ Get the (dotted key path, value) tuples of the leaves under the prefix """
+        exact = self._find(prefix)
+        start, end = self._range(prefix)
+        items = list(zip(self._keys[start:end], self._values[start:end]))
+
+        if exact is not None:
+            items.insert(0, (prefix, self._values[exact]))
+
+        return items
+
+    def all_items(self) -> list:
+        """ Get all the (dotted key path, value) tuples """
+        return list(zip(self._keys, self._values))
+
+class KeyIndex():
+    """ Index of the configuration leaves in buckets by the top level key """
+    def __init__(self, tree: dict = None, buckets: dict = None):
+        """ Constructor """
+        self._tree = tree if isinstance(tree, MAPPING_TYPES) else {}
+
+        # Sorted leaves by the top level key as a string, built on demand
+        self._buckets = buckets if buckets is not None else {}
+
+    @staticmethod
+    def build(tree: dict) -> 'KeyIndex':
+        """ Get the index of the tree """
+        return KeyIndex(tree)
+
+    def __len__(self) -> int:
+        """ Get the number of the indexed leaves """
+        return sum(len(self._bucket(str(key))) for key in self._tree)
+
+    def _bucket(self, name: str) -> SortedLeaves:
+        """ Get the leaves under the top level key, built on the first query """
+        try:
+            return self._buckets[name]
+        except KeyError:
+            pass
+
+        if name in self._tree:
+            leaves = flatten(self._tree[name], name)
+        else:
+            # Keys other than strings, e.g. the integers of YAML, are listed as strings
+            leaves = [
+                leaf
+                for key, value in self._tree.items()
+                if str(key) == name
+                for leaf in flatten(value, name)
+            ]
+
+        bucket = self._buckets[name] = SortedLeaves(leaves)
+        return bucket
+
+    def keys(self, prefix: str = '') -> list:
+        """ Get the dotted key paths of the leaves under the prefix in sorted order """
+        if not prefix:
+            return [key for key, _value in self.items()]
+
+        return self._bucket(prefix.split(SEPARATOR, 1)[0]).keys(prefix)
+
+    def items(self, prefix: str = '') -> list:
+        """ Get the (dotted key path, value) tuples of the leaves under the prefix """
+        if prefix:
+            return self._bucket(prefix.split(SEPARATOR, 1)[0]).items(prefix)
+
+        # Buckets are sorted runs, which the sort merges in linear time
+        return sorted(
+            (
+                item
+                for name in {str(key) for key in self._tree}
+                for item in self._bucket(name).all_items()
+            ),
+            key=lambda item: item[0]
+        )
+
+    def assign(self, tree: dict, keys: tuple) -> 'KeyIndex':
+        """ Get the index of the tree the path was assigned to, sharing the unchanged buckets """
+        if not keys:
+            return KeyIndex.build(tree)
+
+        buckets = self._buckets.copy()
+        buckets.pop(str(keys[0]), None)
+        return KeyIndex(tree, buckets)
@@ -0,0 +1,215 @@
+"""
+Instrumentation of the configuration loading and lookups
+
+Instrumentation is opt-in and records the load durations and the API call
+counts per source, i.e. per configuration file and external interface, the
+lookup counters and the most read key paths::
+
+    config.use_instrumentation()
+    config.load_configuration('config/defaults.yml')
+    config.load_secrets()
+
+    config.stats()
+    # {'loads': {'config/defaults.yml': {...}, 'aws.secretsmanager': {...}},
+    #  'get': {'hits': 120, 'misses': 8, 'env_overrides': 2, 'defaults': 1},
+    #  'hot_keys': [('db.host', 64), ...]}
+
+Hooks receive the metrics as (name, value, tags), e.g. for logging, StatsD or
+Prometheus. Load metrics are sent when a source has been loaded and the lookup
+counters when `flush()` is called::
+
+    instrumentation = Instrumentation(hooks=[logging_hook()])
+    instrumentation.add_hook(lambda name, value, tags: statsd.gauge(name, value, tags=tags))
+    config.use_instrumentation(instrumentation)
+
+When disabled the snapshots are not instrumented and the lookups have no
+overhead. The lookup counters are not locked, i.e. they are approximate when
+read concurrently.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from config.layers import MISSING
+from config.snapshot import Snapshot, compile_key_path
+
+logger = logging.getLogger(__name__)
+
+def logging_hook(log: logging.Logger = None, level: int = logging.INFO) -> 'callable':
+    """ Get a hook that logs the metrics """
+    log = log or logger
+
+    def hook(name: str, value: float, tags: dict):
+        """ Log the metric """
+        log.log(level, 'Configuration metric %s=%s %s', name, value, tags)
+
+    return hook
+
+class Measurement():
+    """ Measurement of loading a source """
+    __slots__ = ('source', 'calls', 'started')
+
+    def __init__(self, source: str):
+        """ Constructor """
+        self.source = source
+        self.calls = 0
+        self.started = time.perf_counter()
+
+class Instrumentation(): # pylint: disable=too-many-instance-attributes
+    """ Recorder of the load timings and the lookup counters """
+    def __init__(self, hooks: list = None, max_keys: int = 10000):
+        """ Constructor """
+        self.hooks = list(hooks or [])
+
+        # Maximum number of distinct key paths counted for the hot keys
+        self.max_keys = max_keys
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> 'self':
+        """ Reset the recorded values """
+        with self._lock:
+            self.loads = {}
+            self.hits = 0
+            self.misses = 0
+            self.env_overrides = 0
+            self.defaults = 0
+            self.reads = {}
+
+        return self
+
+    def add_hook(self, hook: 'callable') -> 'self':
+        """ Call the hook with (name, value, tags) of the recorded metrics """
+        self.hooks.append(hook)
+        return self
+
+    def remove_hook(self, hook: 'callable') -> 'self':
+        """ Remove the hook """
+        self.hooks = [registered for registered in self.hooks if registered is not hook]
+        return self
+
+    @contextmanager
+    def measure(self, source: str) -> Measurement:
+        """ Record the duration of loading the source within the context """
+        measurement = Measurement(source)
+
+        try:
+            yield measurement
+        finally:
+            self.record_load(
+                source,
+                time.perf_counter() - measurement.started,
+                calls=measurement.calls
+            )
+
+    def record_load(self, source: str, duration: float, calls: int = 0) -> 'self':
+        """ Record loading the source """
+        with self._lock:
+            load = self.loads.setdefault(source, {
+                'count': 0,
+                'duration': 0.0,
+                'last_duration': 0.0,
+                'calls': 0
+            })
+            load['count'] += 1
+            load['duration'] += duration
+            load['last_duration'] = duration
+            load['calls'] += calls
+
+        tags = {'source': source}
+        self.emit('config.load.duration', duration, tags)
+        self.emit('config.load.calls', calls, tags)
+        return self
+
+    def record_read(self, keys: tuple):
+        """ Count reading the key path """
+        reads = self.reads
+        count = reads.get(keys)
+
+        if count is not None:
+            reads[keys] = count + 1
+        elif len(reads) < self.max_keys:
+            reads[keys] = 1
+
+    def hot_keys(self, top: int = 10) -> list:
+        """ Get the (dotted key path, read count) tuples of the most read keys """
+        reads = sorted(dict(self.reads).items(), key=lambda item: item[1], reverse=True)
+        return [
+            ('.'.join(str(key) for key in keys), count)
+            for keys, count in reads[:top]
+        ]
+
+    def counters(self) -> dict:
+        """ Get the lookup counters """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'env_overrides': self.env_overrides,
+            'defaults': self.defaults
+        }
+
+    def stats(self, top: int = 10) -> dict:
+        """ Get the recorded load timings, lookup counters and the most read keys """
+        with self._lock:
+            loads = {source: dict(load) for source, load in self.loads.items()}
+
+        return {
+            'loads': loads,
+            'get': self.counters(),
+            'hot_keys': self.hot_keys(top)
+        }
+
+    def flush(self) -> 'self':
+        """ Send the lookup counters to the hooks """
+        for name, value in self.counters().items():
+            self.emit(f'config.get.{name}', value, {})
+
+        return self
+
+    def emit(self, name: str, value: float, tags: dict):
+        """ Call the hooks with the metric, a failing hook does not fail the caller """
+        for hook in list(self.hooks):
+            try:
+                hook(name, value, tags)
+            except Exception: # pylint: disable=broad-except
+                logger.exception('Configuration instrumentation hook failed')
+
+class InstrumentedSnapshot(Snapshot):
+    """ Snapshot that counts the lookups """
+    def __init__(self, instrumentation: Instrumentation, **kwargs):
+        """ Constructor """
+        super().__init__(**kwargs)
+        self._instrumentation = instrumentation
+
+    def get(self, key: 'Union(str, list)' = '', default: 'mixed' = None, \
+        env_var: str = None) -> 'mixed':
+        """ Get configuration key """
+        self._instrumentation.record_read(compile_key_path(key)[0])
+        value = super().get(key, MISSING, env_var)
+
+        if value is MISSING:
+            self._instrumentation.defaults += 1
+            return default
+
+        return value
+
+    def _override(self, env_var: str) -> 'mixed':
+        """ Get the value of the overriding environment variable, counting the overrides """
+        value = super()._override(env_var)
+
+        if value is not MISSING:
+            self._instrumentation.env_overrides += 1
+
+        return value
+
+    def _lookup(self, keys: tuple) -> 'mixed':
+        """ Get the resolved value of the compiled key path, counting the cache hits """
+        if keys in self._cache:
+            self._instrumentation.hits += 1
+        else:
+            self._instrumentation.misses += 1
+
+        return super()._lookup(keys)
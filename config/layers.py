@@ -0,0 +1,192 @@
+"""
+Layered configuration store
+
+Each configuration source is stored as a separate layer in priority order
+instead of merging the sources eagerly to a single tree. Values are resolved
+lazily from the top layer down with the same semantics as merging the layers
+in order: dictionaries are merged, lists are merged as union and other values
+of the upper layers override the lower ones::
+
+    layers = Layers()
+    layers.set_layer('defaults', {'db': {'name': 'example', 'port': 5432}})
+    layers.set_layer('secrets', {'db': {'password': 'secret'}})
+
+    layers.resolve(('db', 'port'))
+    # 5432
+
+    layers.source(('db', 'password'))
+    # 'secrets'
+
+Replacing the content of a layer keeps its position. Sources of the resolved
+paths are memoized, up to a limit, until any of the layers changes.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+from config.frozen import LIST_TYPES, MAPPING_TYPES
+from config.merge import merge, union
+
+# Marker for a configuration key that is not present in the tree
+MISSING = object()
+
+# Marker for a path that is shadowed by a value that is not a dictionary
+SHADOWED = object()
+
+# Marker for replacing the layer with the updates that follow it
+REPLACE = object()
+
+# Number of the memoized sources of the resolved paths
+SOURCES_SIZE = 4096
+
+def walk(tree: dict, keys: tuple) -> 'mixed':
+    """ Walk the layer tree to the given path """
+    node = tree
+
+    for key in keys:
+        if not isinstance(node, MAPPING_TYPES):
+            return SHADOWED
+
+        if key not in node:
+            return MISSING
+
+        node = node[key]
+    return node
+
+def assign(tree: dict, keys: tuple, value: 'mixed') -> dict:
+    """ Set the value to a copy of the tree, copying only the nodes along the path """
+    if not keys:
+        return value
+
+    node = tree.copy() if isinstance(tree, MAPPING_TYPES) else {}
+    node[keys[0]] = assign(node.get(keys[0]), keys[1:], value)
+    return node
+
+def update(tree: dict, updates: list, in_place: bool = False) -> dict:
+    """ Apply the (key path, value) updates in one pass, copying each node along the paths once
+
+    Values of the empty key path are merged to the tree. In place the
+    dictionaries of the tree are modified instead of copied.
+    """
+    # Nodes owned by the new tree by their id, kept to keep the ids unique
+    owned = {}
+
+    def own(node: 'mixed') -> dict:
+        """ Get the node as a dictionary that can be modified """
+        if id(node) in owned or (in_place and node.__class__ is dict):
+            return node
+
+        node = node.copy() if isinstance(node, MAPPING_TYPES) else {}
+        owned[id(node)] = node
+        return node
+
+    for keys, value in updates:
+        if not keys:
+            assert isinstance(value, dict)
+            tree = merge(tree, value, in_place=in_place)
+            continue
+
+        tree = own(tree)
+        node = tree
+
+        for key in keys[:-1]:
+            node[key] = node = own(node.get(key))
+
+        node[keys[-1]] = value
+
+    return tree
+
+class Layers():
+    """ Configuration layers in priority order """
+    def __init__(self, layers: tuple = ()):
+        """ Constructor """
+        # Tuple of (name, tree), the lowest priority first
+        self._layers = layers
+        self._sources = {}
+
+    def copy(self) -> 'Layers':
+        """ Get a copy of the layers, the layer trees are shared """
+        return Layers(self._layers)
+
+    def names(self) -> list:
+        """ Get the layer names in priority order, the lowest priority first """
+        return [name for name, _tree in self._layers]
+
+    def layer(self, name: str) -> dict:
+        """ Get the tree of the layer """
+        for layer_name, tree in self._layers:
+            if layer_name == name:
+                return tree
+        return None
+
+    def set_layer(self, name: str, tree: dict) -> 'self':
+        """ Replace the layer tree or add a new layer with the highest priority """
+        assert isinstance(tree, MAPPING_TYPES)
+        layers = list(self._layers)
+
+        for i, (layer_name, _tree) in enumerate(layers):
+            if layer_name == name:
+                layers[i] = (name, tree)
+                break
+        else:
+            layers.append((name, tree))
+
+        self._layers = tuple(layers)
+        self._sources = {}
+        return self
+
+    def remove_layer(self, name: str) -> 'self':
+        """ Remove the layer """
+        self._layers = tuple(layer for layer in self._layers if layer[0] != name)
+        self._sources = {}
+        return self
+
+    def resolve(self, keys: tuple) -> 'mixed':
+        """ Resolve the value of the path, returns MISSING if the path does not exist """
+        found = self._find(keys)
+
+        if not found:
+            return MISSING
+
+        value = MISSING
+
+        for _name, layer_value in reversed(found):
+            if isinstance(value, MAPPING_TYPES) and isinstance(layer_value, MAPPING_TYPES):
+                value = merge(value, layer_value)
+            elif isinstance(value, LIST_TYPES) and isinstance(layer_value, LIST_TYPES):
+                value = list(value) + union(value, layer_value)
+            else:
+                value = layer_value
+        return value
+
+    def _find(self, keys: tuple) -> list:
+        """ Get the (name, value) tuples of the layers that define the path, the top layer first """
+        found = []
+
+        for name, tree in reversed(self._layers):
+            value = walk(tree, keys)
+
+            if value is SHADOWED:
+                break
+
+            if value is MISSING:
+                continue
+
+            found.append((name, value))
+
+            # Values other than dictionaries and lists override the lower layers
+            if not isinstance(value, MAPPING_TYPES + LIST_TYPES):
+                break
+
+        if len(self._sources) < SOURCES_SIZE:
+            self._sources[keys] = found[0][0] if found else None
+
+        return found
+
+    def source(self, keys: tuple) -> str:
+        """ Get the name of the highest priority layer that defines the path """
+        try:
+            return self._sources[keys]
+        except KeyError:
+            pass
+
+        found = self._find(keys)
+        return found[0][0] if found else None
@@ -0,0 +1,73 @@
+"""
+YAML configuration file loader
+
+Configuration files are parsed with the safe LibYAML loader when PyYAML is
+built with LibYAML and with the pure Python safe loader otherwise.
+
+Parsed files can be cached to speed up the repeated starts. The cache entry of
+a file is used when the modification time, size and content hash of the file
+match, i.e. the file is read but not parsed::
+
+    load_yaml('config/defaults.yml', cache_path='/var/cache/application')
+
+The cache is stored with pickle and its directory must not be writable by
+untrusted users.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import hashlib
+import os
+import pickle
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def get_loader() -> type:
+    """ Get the safe YAML loader, imported on demand to keep importing the configuration fast """
+    import yaml # pylint: disable=import-outside-toplevel
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+def parse_yaml(content: 'Union(str, bytes)') -> 'mixed':
+    """ Parse YAML content """
+    import yaml # pylint: disable=import-outside-toplevel
+    return yaml.load(content, Loader=get_loader())
+
+def load_yaml(file_path: str, cache_path: str = None) -> 'mixed':
+    """ Load a YAML file, using the parsed file cache when the cache path is given """
+    with open(file_path, 'rb') as ymlfile:
+        content = ymlfile.read()
+
+    if cache_path is None:
+        return parse_yaml(content)
+
+    stat = os.stat(file_path)
+    signature = (stat.st_mtime_ns, stat.st_size, hashlib.sha256(content).hexdigest())
+    absolute_path = os.path.abspath(file_path)
+    cache_file_path = os.path.join(
+        cache_path,
+        hashlib.sha256(absolute_path.encode()).hexdigest() + '.pickle'
+    )
+
+    try:
+        with open(cache_file_path, 'rb') as cache_file:
+            cached_path, cached_signature, values = pickle.load(cache_file)
+
+        if cached_path == absolute_path and cached_signature == signature:
+            return values
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        pass
+
+    values = parse_yaml(content)
+
+    try:
+        os.makedirs(cache_path, mode=0o700, exist_ok=True)
+        temp_path = f'{cache_file_path}.{os.getpid()}.tmp'
+
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump((absolute_path, signature, values), cache_file, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temp_path, cache_file_path)
+    except OSError:
+        # Caching is an optimization, the parsed values are valid regardless
+        pass
+
+    return values
@@ -1,8 +1,16 @@
 """
 Deep merge enumerable objects
 
-Merging will create a deep copy of the objects and will not maintain the
-reference.
+Merging does not modify the arguments. The merged object shares the unchanged
+subtrees of the first argument and copies only the nodes along the modified
+paths, i.e. the cost of merging is proportional to the overlay plus the width
+of the copied nodes on the modified paths. A small overlay to a wide node, e.g.
+the root, still copies all of its keys. The shared subtrees must not be
+modified in place.
+
+With `in_place` the first argument and its nested nodes are modified in place::
+
+    merge(target, overlay, in_place=True)
 
 Dictionaries will keep the keys from all the members and values from last
 argument. Lists and arrays will be merged as union, but maintaining the value
@@ -50,35 +58,91 @@ Merging::
         'shallow': 'value'
     }
 
+Frozen dictionaries and lists are merged like the plain ones, the modified
+nodes being copied to plain dictionaries and lists.
+
 @author Arttu Manninen <arttu@kaktus.cc>
 """
-def merge(*args: dict) -> dict:
+from config.frozen import LIST_TYPES, MAPPING_TYPES
+
+def union(target: list, value: list) -> list:
+    """ Get the values that are not in the target list """
+    hashable = set()
+    unhashable = []
+
+    for item in target:
+        try:
+            hashable.add(item)
+        except TypeError:
+            unhashable.append(item)
+
+    values = []
+
+    for item in value:
+        try:
+            if item in hashable:
+                continue
+        except TypeError:
+            # Unhashable values fall back to the linear equality comparison
+            if item in target:
+                continue
+            values.append(item)
+            continue
+
+        # Hashable values may still equal an unhashable one, e.g. a frozenset
+        if unhashable and item in unhashable:
+            continue
+
+        values.append(item)
+    return values
+
+def merge(*args: dict, in_place: bool = False) -> dict:
     """ Merge two or more iterables """
     if len(args) < 2:
         raise AssertionError('Merge requires at least two arguments')
 
-    assert isinstance(args[0], dict)
-    target = args[0].copy()
+    assert isinstance(args[0], MAPPING_TYPES)
+    source = target = args[0]
     args = args[1:]
 
     for _i, arg in enumerate(args):
-        assert isinstance(arg, dict)
+        assert isinstance(arg, MAPPING_TYPES)
+        target = merge_node(target, arg, in_place=in_place)
 
-        for key, value in arg.items():
-            if isinstance(value, dict):
-                node = target.setdefault(key, {}).copy()
-                target[key] = merge(node, value)
-                continue
+    # The merged object is always a new object unless merged in place
+    if target is source and not in_place:
+        target = target.copy()
+    return target
+
+def merge_node(target: dict, arg: dict, in_place: bool = False) -> dict:
+    """ Merge a dictionary node, copying the target only when it is modified """
+    copied = in_place
 
-            if key not in target:
-                target[key] = None
+    for key, value in arg.items():
+        current = target.get(key)
 
-            # Merge arrays
-            if isinstance(target[key], list) and isinstance(value, list):
-                # Create a shallow copy so that the original does not change
-                target[key] = target[key] + [v for v in value if v not in target[key]]
-                # resulting_list.extend(x for x in second_list if x not in resulting_list)
+        if isinstance(value, MAPPING_TYPES):
+            if isinstance(current, MAPPING_TYPES):
+                value = merge_node(current, value, in_place=in_place)
+            else:
+                value = merge_node({}, value, in_place=True)
+
+        # Merge arrays
+        elif isinstance(current, LIST_TYPES) and isinstance(value, LIST_TYPES):
+            missing = union(current, value)
+
+            if not missing:
                 continue
 
-            target[key] = value
+            # Create a shallow copy so that the original does not change
+            value = list(current) + missing
+
+        if value is current and key in target:
+            continue
+
+        if not copied:
+            target = target.copy()
+            copied = True
+
+        target[key] = value
     return target
@@ -0,0 +1,76 @@
+"""
+Background reloading of the configuration
+
+Reloader polls the loaded configuration files for changes by their
+modification time and size and refreshes the external secrets periodically::
+
+    config.subscribe(lambda key, old, new: reconnect(new), 'db.password')
+    config.start_reloader(interval=60)
+
+Changed configuration files are loaded again in a layered configuration,
+where the layer of the file is replaced in its position, i.e. the keys removed
+from the file are removed and the later sources keep their priority. Without
+layers the sources are merged to a single tree that cannot be rebuilt, so the
+files are reloaded only with `Config(layered=True)`. Subscribers are called
+only when the value of their key path has changed.
+
+A process that shares the configuration publishes the reloaded configuration
+when it has changed. Attached worker processes do not reload the files or the
+secrets themselves but attach to the new published version.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class Reloader(threading.Thread):
+    """ Background reloader """
+    def __init__(self, config, interval: float = 60, secrets: bool = True, files: bool = None):
+        """ Constructor, files are reloaded by default when the configuration is layered """
+        super().__init__(name='config-reloader', daemon=True)
+
+        if files is None:
+            files = config.layered
+        elif files and not config.layered:
+            raise ValueError('Reloading the configuration files requires Config(layered=True)')
+
+        self.config = config
+        self.interval = interval
+        self.secrets = secrets
+        self.files = files
+        self._stopped = threading.Event()
+
+    def run(self):
+        """ Reload until stopped """
+        while not self._stopped.wait(self.interval):
+            try:
+                self.reload()
+            except Exception: # pylint: disable=broad-except
+                logger.exception('Reloading the configuration failed')
+
+    def reload(self) -> 'self':
+        """ Reload the changed configuration files and secrets """
+        # Attached workers get the reloaded configuration from the publishing process
+        if self.config.attached:
+            self.config.sync_shared()
+            return self
+
+        if self.files:
+            for file_path in self.config.changed_files():
+                self.config.load_configuration(file_path, graceful=True)
+
+        if self.secrets:
+            self.config.refresh_secrets()
+
+        # Publish the reloaded configuration or attach to the new published version
+        self.config.sync_shared()
+        return self
+
+    def stop(self):
+        """ Stop reloading """
+        self._stopped.set()
+
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
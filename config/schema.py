@@ -0,0 +1,206 @@
+"""
+Configuration schema
+
+Schema declares the types, defaults and converters of the configuration keys
+once. Values are converted when the configuration is loaded and the converted
+values are memoized per snapshot, so the typed accessors do not parse the
+value on every read::
+
+    config.use_schema(Schema({
+        'server.port': Field(int, default=8080),
+        'server.timeout': Field('duration', default='30s'),
+        'db.connection_string': 'url'
+    }))
+
+    config.get_typed('server.timeout')
+    # datetime.timedelta(seconds=30)
+
+    port = config.bind('server.port')
+    port.value
+    # 8080
+
+Invalid values raise SchemaError when the configuration is loaded, refreshed or
+set, and the previous configuration is kept.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import re
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+# Duration units in seconds
+DURATION_UNITS = {
+    'ms': 0.001,
+    's': 1,
+    'm': 60,
+    'h': 3600,
+    'd': 86400,
+    'w': 604800
+}
+
+DURATION_PART = re.compile(r'\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h|d|w)')
+
+# Numbers without a unit are seconds, e.g. the environment variable overrides
+DURATION_SECONDS = re.compile(r'\s*\d+(?:\.\d+)?\s*\Z')
+
+class SchemaError(ValueError):
+    """ Configuration values do not match the schema """
+    def __init__(self, errors: dict):
+        """ Constructor """
+        self.errors = errors
+        super().__init__('Invalid configuration: ' + ', '.join(
+            f'{key}: {error}' for key, error in errors.items()
+        ))
+
+def to_bool(value: 'mixed') -> bool:
+    """ Convert the value to a boolean """
+    if isinstance(value, str):
+        normalized = value.strip().lower()
+
+        if normalized in ('true', 'yes', 'on', '1'):
+            return True
+
+        if normalized in ('false', 'no', 'off', '0', ''):
+            return False
+
+        raise ValueError(f'Invalid boolean "{value}"')
+
+    return bool(value)
+
+def to_duration(value: 'mixed') -> timedelta:
+    """ Convert the value to a duration, numbers are seconds, e.g. 90, "1m30s" or "500ms" """
+    if isinstance(value, timedelta):
+        return value
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return timedelta(seconds=value)
+
+    value = str(value)
+
+    if DURATION_SECONDS.match(value):
+        return timedelta(seconds=float(value))
+
+    seconds = 0
+    position = 0
+
+    for match in DURATION_PART.finditer(value):
+        if match.start() != position:
+            break
+
+        seconds += float(match.group(1)) * DURATION_UNITS[match.group(2)]
+        position = match.end()
+
+    if not position or value[position:].strip():
+        raise ValueError(f'Invalid duration "{value}"')
+
+    return timedelta(seconds=seconds)
+
+def to_url(value: 'mixed') -> 'SplitResult':
+    """ Convert the value to a split URL """
+    url = urlsplit(str(value))
+
+    if not url.scheme:
+        raise ValueError(f'Invalid URL "{value}"')
+
+    return url
+
+def to_list(value: 'mixed') -> list:
+    """ Convert the value to a list, strings are split by comma """
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    return list(value)
+
+CONVERTERS = {
+    int: int,
+    float: float,
+    bool: to_bool,
+    str: str,
+    list: to_list,
+    dict: dict,
+    'duration': to_duration,
+    'url': to_url
+}
+
+class Field():
+    """ Schema field """
+    _types = {}
+
+    def __init__(self, type: 'Union(type, str)' = str, default: 'mixed' = None, \
+        converter: 'callable' = None): # pylint: disable=redefined-builtin
+        """ Constructor """
+        if converter is None and type not in CONVERTERS:
+            raise ValueError(f'Unsupported type "{type}", use a converter')
+
+        self.type = type
+        self.default = default
+        self.converter = converter or CONVERTERS[type]
+
+    @staticmethod
+    def of(type: 'Union(type, str)') -> 'Field': # pylint: disable=redefined-builtin
+        """ Get the shared field for the type """
+        if type not in Field._types:
+            Field._types[type] = Field(type)
+
+        return Field._types[type]
+
+    def convert(self, value: 'mixed') -> 'mixed':
+        """ Convert the value, missing values get the converted default """
+        if value is None:
+            if self.default is None:
+                return None
+
+            value = self.default
+
+        return self.converter(value)
+
+class Schema():
+    """ Configuration schema """
+    def __init__(self, fields: dict):
+        """ Constructor """
+        self.fields = {
+            key: field if isinstance(field, Field) else Field(field)
+            for key, field in fields.items()
+        }
+
+    def field(self, key: str) -> Field:
+        """ Get the field of the key """
+        try:
+            return self.fields[key]
+        except KeyError:
+            raise KeyError(f'Key "{key}" is not in the schema') from None
+
+    def validate(self, snapshot: 'Snapshot') -> dict:
+        """ Convert the values of the snapshot, raises SchemaError for the invalid values """
+        values = {}
+        errors = {}
+
+        for key in self.fields:
+            try:
+                values[key] = snapshot.typed(key)
+            except (TypeError, ValueError) as error:
+                errors[key] = error
+
+        if errors:
+            raise SchemaError(errors)
+
+        return values
+
+class BoundValue():
+    """ Typed value of the current configuration """
+    __slots__ = ('config', 'key', 'field')
+
+    def __init__(self, config, key: str, field: Field = None):
+        """ Constructor """
+        self.config = config
+        self.key = key
+        self.field = field
+
+    @property
+    def value(self) -> 'mixed':
+        """ Get the converted value """
+        return self.config.snapshot().typed(self.key, self.field)
+
+    def __call__(self) -> 'mixed':
+        """ Get the converted value """
+        return self.value
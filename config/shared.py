@@ -0,0 +1,293 @@
+"""
+Configuration shared by the worker processes
+
+A parent process, e.g. the master process of gunicorn or uWSGI, loads the
+configuration and the secrets once and publishes the configuration tree to a
+memory mapped file. The pre-forked workers attach to the file instead of
+loading the configuration themselves::
+
+    # Parent process
+    config.load_configuration('config/defaults.yml')
+    config.load_secrets()
+    config.share('/dev/shm/application-config')
+
+    # Worker process
+    config.attach('/dev/shm/application-config')
+
+The workers share the pages of the file and decode only the nodes they read.
+The parent publishes a new version with `config.sync_shared()`, or with the
+background reloader, and bumps the generation counter in the control file
+`<path>.generation`. Attached workers check the counter with
+`config.sync_shared()`, which is called also by the reloader, and attach to
+the new version when it has changed. The published file is replaced
+atomically, i.e. the workers keep reading the version they have attached to.
+
+The file is read-only for the workers and readable by everyone who can read
+the path, so it should be in a directory only the application can access.
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import mmap
+import os
+import pickle
+import struct
+from collections.abc import Mapping
+from config.frozen import FrozenMapping, MAPPING_TYPES
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover
+    fcntl = None
+
+MAGIC = b'CFGSHR01'
+
+# Magic and the offset of the root node
+HEADER = struct.Struct('<8sQ')
+
+# Node type and the size of the node: the number of keys or the value length
+NODE = struct.Struct('<cI')
+
+# Key offset, key length and value offset of a mapping entry
+ENTRY = struct.Struct('<QIQ')
+
+# Position of an entry in the insertion order
+ORDER = struct.Struct('<I')
+
+GENERATION = struct.Struct('<Q')
+
+MAPPING_NODE = b'D'
+VALUE_NODE = b'P'
+
+def encode_key(key: 'mixed') -> bytes:
+    """ Encode the key, the encoded keys are compared as bytes """
+    if isinstance(key, str):
+        return b's' + key.encode('utf-8', 'surrogatepass')
+
+    return b'p' + pickle.dumps(key, protocol=4)
+
+def decode_key(encoded: bytes) -> 'mixed':
+    """ Decode the key """
+    if encoded[:1] == b's':
+        return encoded[1:].decode('utf-8', 'surrogatepass')
+
+    return pickle.loads(encoded[1:])
+
+def encode(tree: dict) -> bytes:
+    """ Encode the tree, the nodes are written before their parent """
+    buffer = bytearray(HEADER.size)
+
+    def write(value: 'mixed') -> int:
+        """ Write the node, returns its offset """
+        if not isinstance(value, MAPPING_TYPES):
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            offset = len(buffer)
+            buffer.extend(NODE.pack(VALUE_NODE, len(data)))
+            buffer.extend(data)
+            return offset
+
+        entries = []
+
+        for position, (key, item) in enumerate(value.items()):
+            encoded = encode_key(key)
+            key_offset = len(buffer)
+            buffer.extend(encoded)
+            entries.append((encoded, key_offset, write(item), position))
+
+        entries.sort(key=lambda entry: entry[0])
+        offset = len(buffer)
+        buffer.extend(NODE.pack(MAPPING_NODE, len(entries)))
+
+        for encoded, key_offset, value_offset, _position in entries:
+            buffer.extend(ENTRY.pack(key_offset, len(encoded), value_offset))
+
+        # Entry indexes in the insertion order
+        order = [0] * len(entries)
+
+        for i, entry in enumerate(entries):
+            order[entry[3]] = i
+
+        for i in order:
+            buffer.extend(ORDER.pack(i))
+
+        return offset
+
+    root = write(tree)
+    HEADER.pack_into(buffer, 0, MAGIC, root)
+    return bytes(buffer)
+
+def decode(buffer: 'mmap', offset: int) -> 'mixed':
+    """ Decode the node, mappings are decoded on access """
+    node_type, size = NODE.unpack_from(buffer, offset)
+
+    if node_type == MAPPING_NODE:
+        return SharedDict(buffer, offset, size)
+
+    start = offset + NODE.size
+    return pickle.loads(buffer[start:start + size])
+
+class SharedDict(FrozenMapping, Mapping):
+    """ Read-only mapping decoded on access from the shared buffer """
+    __slots__ = ('_buffer', '_offset', '_size')
+
+    def __init__(self, buffer: 'mmap', offset: int, size: int):
+        """ Constructor """
+        self._buffer = buffer
+        self._offset = offset
+        self._size = size
+
+    def _entry(self, i: int) -> tuple:
+        """ Get the (key offset, key length, value offset) of the entry in the key order """
+        return ENTRY.unpack_from(self._buffer, self._offset + NODE.size + ENTRY.size * i)
+
+    def _key(self, i: int) -> bytes:
+        """ Get the encoded key of the entry in the key order """
+        key_offset, key_length, _value_offset = self._entry(i)
+        return self._buffer[key_offset:key_offset + key_length]
+
+    def _find(self, key: 'mixed') -> int:
+        """ Get the value offset of the key, raises KeyError when not found """
+        try:
+            encoded = encode_key(key)
+        except (TypeError, pickle.PicklingError):
+            raise KeyError(key) from None
+
+        low = 0
+        high = self._size
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if self._key(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self._size:
+            key_offset, key_length, value_offset = self._entry(low)
+
+            if self._buffer[key_offset:key_offset + key_length] == encoded:
+                return value_offset
+
+        raise KeyError(key)
+
+    def _ordered(self) -> 'Iterator':
+        """ Iterate the entries in the insertion order """
+        start = self._offset + NODE.size + ENTRY.size * self._size
+
+        for position in range(self._size):
+            (i,) = ORDER.unpack_from(self._buffer, start + ORDER.size * position)
+            yield self._entry(i)
+
+    def __getitem__(self, key: 'mixed') -> 'mixed':
+        """ Get the value of the key """
+        return decode(self._buffer, self._find(key))
+
+    def __contains__(self, key: 'mixed') -> bool:
+        """ Check if the key is in the mapping without decoding the value """
+        try:
+            self._find(key)
+        except KeyError:
+            return False
+
+        return True
+
+    def __len__(self) -> int:
+        """ Get the number of the keys """
+        return self._size
+
+    def __iter__(self) -> 'Iterator':
+        """ Iterate the keys in the insertion order """
+        for key_offset, key_length, _value_offset in self._ordered():
+            yield decode_key(self._buffer[key_offset:key_offset + key_length])
+
+    def items(self) -> list:
+        """ Get the (key, value) tuples in the insertion order """
+        return [
+            (
+                decode_key(self._buffer[key_offset:key_offset + key_length]),
+                decode(self._buffer, value_offset)
+            )
+            for key_offset, key_length, value_offset in self._ordered()
+        ]
+
+    def values(self) -> list:
+        """ Get the values in the insertion order """
+        return [value for _key, value in self.items()]
+
+    def __reduce__(self) -> tuple:
+        """ Pickle the mapping as a dictionary """
+        return (dict, (self.items(),))
+
+    def __repr__(self) -> str:
+        """ Get the representation of the mapping """
+        return f'SharedDict({self.copy()!r})'
+
+class SharedSegment():
+    """ Published configuration file and its generation counter """
+    def __init__(self, path: str):
+        """ Constructor """
+        self.path = path
+        self.control_path = f'{path}.generation'
+
+        # Generation of the attached version
+        self.generation = None
+
+    def current_generation(self) -> int:
+        """ Get the generation of the published version, 0 when nothing is published """
+        try:
+            with open(self.control_path, 'rb') as control_file:
+                data = control_file.read(GENERATION.size)
+        except FileNotFoundError:
+            return 0
+
+        if len(data) < GENERATION.size:
+            return 0
+
+        return GENERATION.unpack(data)[0]
+
+    def publish(self, tree: dict) -> int:
+        """ Publish the tree as a new version, returns the new generation """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+
+        with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') \
+            as data_file:
+            data_file.write(encode(tree))
+
+        os.replace(temp_path, self.path)
+
+        fd = os.open(self.control_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        with open(fd, 'r+b') as control_file:
+            if fcntl is not None:
+                fcntl.flock(control_file, fcntl.LOCK_EX)
+
+            data = control_file.read(GENERATION.size)
+            generation = GENERATION.unpack(data)[0] + 1 if len(data) == GENERATION.size else 1
+            control_file.seek(0)
+            control_file.write(GENERATION.pack(generation))
+
+        self.generation = generation
+        return generation
+
+    def attach(self) -> SharedDict:
+        """ Attach to the published version """
+        # The generation is read first so that a version published meanwhile
+        # is attached to again on the next check
+        generation = self.current_generation()
+
+        with open(self.path, 'rb') as data_file:
+            buffer = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, root = HEADER.unpack_from(buffer, 0)
+
+        if magic != MAGIC:
+            raise ValueError(f'File {self.path} is not a shared configuration')
+
+        self.generation = generation
+        return decode(buffer, root)
+
+    def changed(self) -> bool:
+        """ Check if a new version has been published since attaching """
+        return self.current_generation() != self.generation
@@ -0,0 +1,185 @@
+"""
+Immutable configuration snapshots
+
+Configuration writers build a new configuration tree, copying only the
+modified paths, and publish it as a new snapshot with a single reference swap.
+Readers use the current snapshot without locking and a snapshot taken for the
+duration of e.g. a request gives a consistent view of the configuration::
+
+    snapshot = config.snapshot()
+    snapshot.get('db.username')
+    snapshot.get('db.password')
+
+Resolved and converted values are memoized per snapshot. Environment variable
+overrides are read from the live environment or from the environment index.
+
+The leaves of the configuration tree can be listed by a key prefix. The
+flattened key index is built on the first query and assigning a single path
+updates the index of the next snapshot instead of rebuilding it::
+
+    config.keys('features')
+    # ['features.chat', 'features.search']
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import os
+from functools import lru_cache
+from config.environment import cast_value
+from config.index import KeyIndex
+from config.layers import MISSING
+
+# Number of the resolved and converted values memoized per snapshot, e.g.
+# dynamic keys of a long running process are not memoized beyond it
+CACHE_SIZE = 4096
+
+@lru_cache(maxsize=4096)
+def _compile_key_path(config_key_path: 'Union(str, tuple)') -> tuple:
+    """ Compile the hashable key path to the key tuple and the environment variable name """
+    if isinstance(config_key_path, str):
+        separator = '.'
+        keys = tuple(config_key_path.split(separator)) if config_key_path else ()
+    else:
+        keys = config_key_path
+
+    return keys, '_'.join(keys).upper()
+
+def compile_key_path(config_key_path: 'Union(str, list)' = '') -> tuple:
+    """ Get the key tuple and the environment variable name for the given path """
+    if not config_key_path:
+        config_key_path = ''
+
+    if not isinstance(config_key_path, (str, tuple)):
+        config_key_path = tuple(config_key_path)
+
+    return _compile_key_path(config_key_path)
+
+def resolve(keys: tuple, configuration: dict) -> 'mixed':
+    """ Walk the configuration tree, returns MISSING if the path does not exist """
+    cfg = configuration
+
+    for key in keys:
+        try:
+            cfg = cfg[key]
+        except (KeyError, TypeError):
+            return MISSING
+    return cfg
+
+class Snapshot():
+    """ Immutable view of the configuration """
+    def __init__(self, tree: dict = None, layers: 'Layers' = None, \
+        environment: 'EnvironmentIndex' = None, index: KeyIndex = None, \
+        schema: 'Schema' = None):
+        """ Constructor """
+        self._tree = tree if tree is not None else {}
+        self._layers = layers
+        self._environment = environment
+        self._schema = schema
+
+        # Converted values by the key and the schema field
+        self._typed = {}
+
+        # Flattened key index, built on demand
+        self._index = index
+
+        # Resolved values by the compiled key path
+        self._cache = {}
+
+    def get(self, key: 'Union(str, list)' = '', default: 'mixed' = None, \
+        env_var: str = None) -> 'mixed':
+        """ Get configuration key """
+        keys, implicit_env_var = compile_key_path(key)
+        value = self._override(env_var or implicit_env_var)
+
+        if value is MISSING:
+            value = self._lookup(keys)
+
+        if value is MISSING:
+            return default
+
+        return value
+
+    def _override(self, env_var: str) -> 'mixed':
+        """ Get the value of the overriding environment variable, MISSING if it is not set """
+        if self._environment is None:
+            value = os.environ.get(env_var)
+            return cast_value(value) if value else MISSING
+
+        return self._environment.get(env_var, MISSING)
+
+    def _lookup(self, keys: tuple) -> 'mixed':
+        """ Get the resolved value of the compiled key path that is not overridden """
+        return self.resolve(keys)
+
+    def resolve(self, keys: tuple) -> 'mixed':
+        """ Resolve the value of the compiled key path, returns MISSING if it does not exist """
+        try:
+            return self._cache[keys]
+        except KeyError:
+            pass
+
+        if self._layers is None:
+            value = resolve(keys, self._tree)
+        else:
+            value = self._layers.resolve(keys)
+
+        if len(self._cache) < CACHE_SIZE:
+            self._cache[keys] = value
+
+        return value
+
+    def typed(self, key: str, field: 'Field' = None) -> 'mixed':
+        """ Get the value converted with the field, by default with the schema field of the key
+
+        Values of the configuration are converted once per snapshot, the
+        environment variable overrides on every call since they may change.
+        """
+        if field is None:
+            if self._schema is None:
+                raise KeyError(f'Key "{key}" is not in the schema')
+
+            field = self._schema.field(key)
+
+        keys, env_var = compile_key_path(key)
+        value = self._override(env_var)
+
+        if value is not MISSING:
+            return field.convert(value)
+
+        try:
+            return self._typed[keys, field]
+        except KeyError:
+            pass
+
+        value = self._lookup(keys)
+        value = field.convert(None if value is MISSING else value)
+
+        if len(self._typed) < CACHE_SIZE:
+            self._typed[keys, field] = value
+
+        return value
+
+    def source(self, key: 'Union(str, list)' = '') -> str:
+        """ Get the name of the layer the configuration value comes from """
+        if self._layers is None:
+            return None
+
+        keys, _env_var = compile_key_path(key)
+        return self._layers.source(keys)
+
+    def key_index(self, build: bool = True) -> KeyIndex:
+        """ Get the flattened key index, None if it has not been built and build is False """
+        if self._index is None and build:
+            tree = self.resolve(())
+            self._index = KeyIndex.build(tree if tree is not MISSING else {})
+
+        return self._index
+
+    def keys(self, prefix: 'Union(str, list)' = '') -> list:
+        """ Get the dotted key paths of the configuration values under the prefix """
+        keys, _env_var = compile_key_path(prefix)
+        return self.key_index().keys('.'.join(str(key) for key in keys))
+
+    def items(self, prefix: 'Union(str, list)' = '') -> list:
+        """ Get the (dotted key path, value) tuples under the prefix, without the overrides """
+        keys, _env_var = compile_key_path(prefix)
+        return self.key_index().items('.'.join(str(key) for key in keys))
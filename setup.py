@@ -44,5 +44,10 @@ setuptools.setup(
         'azure-keyvault-secrets>=4.2.0',
         'azure-identity>=1.5.0',
         'numpy>=1.20.2'
-    ]
+    ],
+    extras_require={
+        'cache': [
+            'cryptography>=2.5'
+        ]
+    }
 )
@@ -45,3 +45,12 @@ class TestBoto3():
         boto.session_reset()
         secrets_manager_2 = boto.client('secretsmanager')
         assert secrets_manager_1 is not secrets_manager_2
+
+    @staticmethod
+    def test_boto3_client_uses_the_region():
+        """ Test that the clients are created and cached by the region """
+        client_1 = boto.client('secretsmanager', region='eu-west-1')
+        client_2 = boto.client('secretsmanager', region='eu-west-1')
+        assert client_1 is client_2
+        assert client_1.meta.region_name == 'eu-west-1'
+        assert boto.client('secretsmanager').meta.region_name == Boto3.DEFAULT_REGION
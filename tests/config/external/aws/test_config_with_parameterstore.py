@@ -0,0 +1,187 @@
+"""
+Test configuration with AWS Systems Manager Parameter Store extension
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import threading
+import time
+import warnings
+import pytest
+from config import Config
+from config.external.aws import boto3 as session_boto3
+from config.external.aws.boto3 import Boto3
+from config.external.aws.ssm import ParameterStore
+
+# Ignore deprecation warnings for boto3 and moto since there is virtually
+# nothing we can do about them
+with warnings.catch_warnings():
+    warnings.filterwarnings('ignore', category=DeprecationWarning)
+    from moto import mock_secretsmanager, mock_ssm
+    import boto3
+
+aws_region = 'eu-north-1'
+test_path = '/application'
+
+@pytest.fixture(name='ssm')
+def fixture_ssm(monkeypatch):
+    """ Mocked SSM client """
+    monkeypatch.delenv('AWS_SECRETSMANAGER_ENABLED', raising=False)
+    monkeypatch.delenv('AWS_PARAMETERSTORE_ENABLED', raising=False)
+
+    with mock_ssm():
+        yield boto3.client('ssm', aws_region)
+
+def get_config(path: str = test_path) -> Config:
+    """ Get configuration with the parameter store enabled """
+    config = Config()
+    config.set('aws.region', aws_region)
+    config.set('aws.parameterstore', {
+        'enabled': True,
+        'path': path
+    })
+    return config
+
+class TestConfigWithParameterStore():
+    """ Test config with AWS Systems Manager Parameter Store """
+    @staticmethod
+    def test_load_secrets_does_not_load_anything_when_not_enabled(ssm):
+        """ Test that the parameters are not loaded unless enabled """
+        ssm.put_parameter(Name=f'{test_path}/db/name', Value='example', Type='String')
+
+        config = get_config()
+        config.set('aws.parameterstore.enabled', False)
+        config.load_secrets()
+
+        assert config.get('db.name') is None
+
+    @staticmethod
+    def test_load_secrets_loads_the_hierarchy(ssm):
+        """ Test that the parameter hierarchy is mapped to the configuration keys """
+        ssm.put_parameter(Name=f'{test_path}/db/connection_string', Value='postgresql:///example', \
+            Type='String')
+        ssm.put_parameter(Name=f'{test_path}/db/password', Value='secret', Type='SecureString')
+        ssm.put_parameter(Name=f'{test_path}/hosts', Value='a,b', Type='StringList')
+        ssm.put_parameter(Name=f'{test_path}/server/port', Value='8080', Type='String')
+        ssm.put_parameter(Name='/other/db/name', Value='other', Type='String')
+
+        config = get_config()
+        config.load_secrets()
+
+        assert config.get('db.connection_string') == 'postgresql:///example'
+        assert config.get('db.password') == 'secret'
+        assert config.get('hosts') == ['a', 'b']
+        assert config.get('server.port') == 8080
+        assert config.get('db.name') is None
+
+    @staticmethod
+    def test_load_secrets_paginates(ssm):
+        """ Test that all the pages of the hierarchy are loaded """
+        for i in range(ParameterStore.PAGE_SIZE * 2 + 5):
+            ssm.put_parameter(Name=f'{test_path}/values/key{i}', Value=str(i), Type='String')
+
+        config = get_config()
+        config.load_secrets()
+
+        assert len(config.get('values')) == ParameterStore.PAGE_SIZE * 2 + 5
+        assert config.get('values.key24') == 24
+
+    @staticmethod
+    def test_full_configuration_is_merged(ssm):
+        """ Test that the parameter "config" is merged as a full configuration """
+        ssm.put_parameter(Name=f'{test_path}/config', Value='{"db": {"name": "full"}}', \
+            Type='String')
+        ssm.put_parameter(Name=f'{test_path}/db/port', Value='5432', Type='String')
+
+        config = get_config(f'{test_path}/')
+        config.load_secrets()
+
+        assert config.get('db') == {'name': 'full', 'port': 5432}
+
+    @staticmethod
+    def test_secrets_override_parameters(ssm):
+        """ Test that the parameters have a lower priority than the secrets """
+        ssm.put_parameter(Name=f'{test_path}/db/password', Value='parameter', Type='String')
+        ssm.put_parameter(Name=f'{test_path}/db/name', Value='example', Type='String')
+
+        with mock_secretsmanager():
+            boto3.client('secretsmanager', aws_region).create_secret(
+                Name='db.password',
+                SecretString='secret'
+            )
+
+            config = get_config()
+            config.set('aws.secretsmanager.enabled', True)
+            config.load_secrets()
+
+        assert config.get('db.password') == 'secret'
+        assert config.get('db.name') == 'example'
+
+    @staticmethod
+    def test_concurrent_loading_with_a_new_session(ssm):
+        """ Test that the concurrent providers create their clients to a new session """
+        ssm.put_parameter(Name=f'{test_path}/db/name', Value='example', Type='String')
+
+        with mock_secretsmanager():
+            boto3.client('secretsmanager', aws_region).create_secret(
+                Name='db.password',
+                SecretString='secret'
+            )
+
+            for _i in range(5):
+                session_boto3.session_reset()
+                config = get_config()
+                config.set('aws.secretsmanager.enabled', True)
+                config.load_secrets()
+
+                assert config.get('db') == {'name': 'example', 'password': 'secret'}
+
+    @staticmethod
+    def test_clients_are_created_one_at_a_time():
+        """ Test that the clients are not created concurrently to the shared session """
+        class Session():
+            """ Session that records the concurrent client creation """
+            def __init__(self):
+                self.active = 0
+                self.max_active = 0
+
+            def client(self, service_name, region):
+                """ Create a client """
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                time.sleep(0.01)
+                self.active -= 1
+                return (service_name, region)
+
+        session = Session()
+        interface = Boto3()
+        interface._session = session
+        threads = [
+            threading.Thread(target=interface.client, args=(service_name,))
+            for service_name in ('secretsmanager', 'ssm', 'sts')
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert session.max_active == 1
+        assert interface.client('ssm') == ('ssm', Boto3.DEFAULT_REGION)
+
+    @staticmethod
+    def test_refresh_applies_changed_parameters(ssm):
+        """ Test that refreshing applies only the changed parameters """
+        ssm.put_parameter(Name=f'{test_path}/db/name', Value='example', Type='String')
+        ssm.put_parameter(Name=f'{test_path}/db/port', Value='5432', Type='String')
+
+        config = get_config()
+        config.load_secrets()
+
+        ssm.put_parameter(Name=f'{test_path}/db/name', Value='changed', Type='String', \
+            Overwrite=True)
+
+        interface = config._interfaces[ParameterStore.NAME]
+        assert interface.refresh() == [('db.name', 'changed')]
+        assert config.get('db.name') == 'changed'
+        assert config.get('db.port') == 5432
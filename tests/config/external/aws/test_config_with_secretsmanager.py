@@ -3,11 +3,14 @@ Test configuration with AWS SecretsManager extension
 
 @author Arttu Manninen <arttu@kaktus.cc>
 """
+import asyncio
 import os
 import json
 import warnings
 import yaml
 from config import Config
+from config.external.aws import SecretsManager
+from config.external.aws import boto3 as SecretsManagerBoto3
 
 # Ignore deprecation warnings for boto3 and moto since there is virtually
 # nothing we can do about them
@@ -15,6 +18,7 @@ with warnings.catch_warnings():
     warnings.filterwarnings('ignore', category=DeprecationWarning)
     from moto import mock_secretsmanager
     import boto3
+    from botocore.exceptions import ClientError
 
 aws_region = 'eu-north-1'
 config_key = 'secret.manager'
@@ -246,3 +250,297 @@ class TestConfigWithSecretsManager():
         config.set('aws.secretsmanager.skip_unprefixed', False)
         config.load_secrets()
         assert config.get('full') == yaml_config['full']
+
+    @staticmethod
+    @mock_secretsmanager
+    def test_load_secrets_to_a_layer():
+        """ Test that layered configuration loads the secrets to a separate layer """
+        client = boto3.client('secretsmanager', aws_region)
+        client.create_secret(
+            Name=config_key,
+            SecretString=config_value
+        )
+
+        layered_config = Config(layered=True)
+        layered_config.set('aws.secretsmanager.enabled', True)
+        layered_config.load_secrets()
+        assert layered_config.get(config_key) == config_value
+        assert layered_config.source(config_key) == 'aws.secretsmanager'
+
+        client.delete_secret(SecretId=config_key, ForceDeleteWithoutRecovery=True)
+        layered_config.load_secrets()
+        assert layered_config.get(config_key) is None
+
+    @staticmethod
+    @mock_secretsmanager
+    def test_reloaded_secrets_are_published_at_once():
+        """ Test that reloading the secrets to a layer does not publish the lower layers """
+        client = boto3.client('secretsmanager', aws_region)
+        client.create_secret(Name='db.password', SecretString='secret')
+
+        layered_config = Config(layered=True)
+        layered_config.set('aws.secretsmanager.enabled', True)
+        layered_config.set('db.password', 'default')
+        layered_config.load_secrets()
+
+        changes = []
+        layered_config.subscribe(lambda key, old, new: changes.append((old, new)), 'db.password')
+        client.put_secret_value(SecretId='db.password', SecretString='rotated')
+        layered_config.load_secrets()
+        layered_config.load_secrets()
+
+        assert changes == [('secret', 'rotated')]
+        assert layered_config.source('db.password') == 'aws.secretsmanager'
+
+    @staticmethod
+    @mock_secretsmanager
+    def test_load_secrets_concurrently():
+        """ Test that secrets fetched concurrently keep the prefix precedence """
+        client = boto3.client('secretsmanager', aws_region)
+
+        for i in range(30):
+            client.create_secret(
+                Name=f'concurrent.key{i}',
+                SecretString=f'value{i}'
+            )
+            client.create_secret(
+                Name=f'{test_prefix}@concurrent.key{i}',
+                SecretString=f'prefixed-value{i}'
+            )
+
+        for max_workers in (1, 4):
+            concurrent_config = Config()
+            concurrent_config.set('aws.secretsmanager', {
+                'enabled': True,
+                'prefix': test_prefix,
+                'max_workers': max_workers
+            })
+            concurrent_config.load_secrets()
+
+            for i in range(30):
+                assert concurrent_config.get(f'concurrent.key{i}') == f'prefixed-value{i}'
+
+    @staticmethod
+    def test_get_secret_values_in_batches():
+        """ Test that the secret values are fetched in batches of 20 """
+        class BatchClient():
+            """ Client with BatchGetSecretValue """
+            def __init__(self):
+                self.batches = []
+
+            def batch_get_secret_value(self, SecretIdList):
+                """ Get the secrets of the batch, fails for the "error" secret """
+                self.batches.append(SecretIdList)
+                return {
+                    'SecretValues': [
+                        {'Name': name, 'SecretString': f'{name}-value'}
+                        for name in SecretIdList
+                        if name != 'error'
+                    ],
+                    'Errors': [
+                        {'SecretId': name, 'ErrorCode': 'InternalServiceError'}
+                        for name in SecretIdList
+                        if name == 'error'
+                    ]
+                }
+
+            @staticmethod
+            def get_secret_value(SecretId):
+                """ Get a single secret """
+                return {'Name': SecretId, 'SecretString': f'{SecretId}-single'}
+
+        client = BatchClient()
+        names = [f'secret{i}' for i in range(45)] + ['error']
+        values = SecretsManager(Config()).get_secret_values(client, names)
+
+        assert [len(batch) for batch in client.batches] == [20, 20, 6]
+        assert values['secret0'] == 'secret0-value'
+        assert values['secret44'] == 'secret44-value'
+        assert values['error'] == 'error-single'
+
+    @staticmethod
+    @mock_secretsmanager
+    def test_load_secrets_uses_the_configured_region():
+        """ Test that the secrets are read from the configured region """
+        client = boto3.client('secretsmanager', 'us-east-1')
+        client.create_secret(Name='regional.secret', SecretString='us-east-1')
+
+        regional_config = Config()
+        regional_config.set('aws.region', 'us-east-1')
+        SecretsManager(regional_config).load()
+
+        assert regional_config.get('regional.secret') == 'us-east-1'
+
+    @staticmethod
+    def test_get_secret_values_without_batch_permission():
+        """ Test that the values are fetched one by one when the batch call is denied """
+        class DeniedClient():
+            """ Client of a role without the BatchGetSecretValue permission """
+            @staticmethod
+            def batch_get_secret_value(SecretIdList):
+                """ Deny the batch """
+                raise ClientError({
+                    'Error': {'Code': 'AccessDeniedException', 'Message': 'Denied'}
+                }, 'BatchGetSecretValue')
+
+            @staticmethod
+            def get_secret_value(SecretId):
+                """ Get a single secret """
+                return {'Name': SecretId, 'SecretString': f'{SecretId}-single'}
+
+        values = SecretsManager(Config()).get_secret_values(DeniedClient(), ['a', 'b'])
+        assert values == {'a': 'a-single', 'b': 'b-single'}
+
+    @staticmethod
+    @mock_secretsmanager
+    def test_load_secrets_filters_prefixed_secrets_server_side():
+        """ Test that the prefix filter is sent to AWS when unprefixed are skipped """
+        client = boto3.client('secretsmanager', aws_region)
+        client.create_secret(
+            Name=f'{test_prefix}@filtered.key',
+            SecretString='prefixed'
+        )
+        client.create_secret(
+            Name='filtered.key',
+            SecretString='unprefixed'
+        )
+
+        filtered_config = Config()
+        filtered_config.set('aws.secretsmanager', {
+            'enabled': True,
+            'prefix': test_prefix,
+            'skip_unprefixed': True
+        })
+
+        stubbed_client = SecretsManagerBoto3.client('secretsmanager')
+        paginate = stubbed_client.get_paginator('list_secrets').paginate
+        calls = []
+
+        def get_paginator(_name):
+            """ Record the paginate arguments """
+            class Paginator():
+                """ Recording paginator """
+                @staticmethod
+                def paginate(**kwargs):
+                    """ Paginate """
+                    calls.append(kwargs)
+                    return paginate(**kwargs)
+            return Paginator()
+
+        stubbed_client.get_paginator = get_paginator
+
+        try:
+            filtered_config.load_secrets()
+        finally:
+            del stubbed_client.get_paginator
+
+        assert calls == [{'Filters': [{'Key': 'name', 'Values': [f'{test_prefix}@']}]}]
+        assert filtered_config.get('filtered.key') == 'prefixed'
+
+    @staticmethod
+    @mock_secretsmanager
+    def test_load_secrets_async():
+        """ Test that the secrets are loaded without blocking the event loop """
+        client = boto3.client('secretsmanager', aws_region)
+        client.create_secret(Name='async.secret', SecretString='value')
+        client.create_secret(Name=f'{test_prefix}@async.secret', SecretString='prefixed')
+
+        async_config = Config()
+        async_config.set('aws.region', aws_region)
+        async_config.set('aws.secretsmanager', {
+            'enabled': True,
+            'prefix': test_prefix
+        })
+
+        async def load() -> list:
+            """ Load the secrets while the event loop runs another task """
+            events = []
+
+            async def secrets():
+                """ Load the secrets """
+                await async_config.load_secrets_async()
+                events.append('loaded')
+
+            async def other():
+                """ Other startup task """
+                events.append('other')
+
+            await asyncio.gather(secrets(), other())
+            return events
+
+        assert asyncio.run(load()) == ['other', 'loaded']
+        assert async_config.get('async.secret') == 'prefixed'
+
+    @staticmethod
+    @mock_secretsmanager
+    def test_load_is_measured():
+        """ Test that the instrumentation records the load and the API calls """
+        client = boto3.client('secretsmanager', aws_region)
+
+        for i in range(25):
+            client.create_secret(Name=f'measured.secret_{i}', SecretString='value')
+
+        measured_config = Config()
+        measured_config.set('aws.region', aws_region)
+        measured_config.use_instrumentation()
+        interface = SecretsManager(measured_config)
+        interface.load()
+
+        # One page of the list and two batches of the values, which moto does
+        # not implement and the values are fetched one by one
+        load = measured_config.stats()['loads']['aws.secretsmanager']
+        assert load['count'] == 1
+        assert load['calls'] == interface.api_calls == 1 + 2 + 25
+
+    @staticmethod
+    @mock_secretsmanager
+    def test_refresh_applies_only_changed_secrets():
+        """ Test that refresh fetches and applies only the changed secrets """
+        client = boto3.client('secretsmanager', aws_region)
+        client.create_secret(Name='refresh.unchanged', SecretString='unchanged')
+        client.create_secret(Name='refresh.changed', SecretString='original')
+        client.create_secret(Name='refresh.shadowed', SecretString='unprefixed')
+        client.create_secret(Name=f'{test_prefix}@refresh.shadowed', SecretString='prefixed')
+
+        refresh_config = Config()
+        refresh_config.set('aws.secretsmanager', {
+            'enabled': True,
+            'prefix': test_prefix
+        })
+        interface = SecretsManager(refresh_config)
+        interface.load()
+
+        client.put_secret_value(SecretId='refresh.changed', SecretString='rotated')
+        client.put_secret_value(SecretId='refresh.shadowed', SecretString='rotated')
+        client.create_secret(Name='refresh.created', SecretString='created')
+
+        assert sorted(interface.refresh()) == [
+            ('refresh.changed', 'rotated'),
+            ('refresh.created', 'created')
+        ]
+        assert refresh_config.get('refresh.changed') == 'rotated'
+        assert refresh_config.get('refresh.shadowed') == 'prefixed'
+        assert interface.refresh() == []
+
+        # Removing the prefixed secret gives the priority to the unprefixed
+        client.delete_secret(
+            SecretId=f'{test_prefix}@refresh.shadowed',
+            ForceDeleteWithoutRecovery=True
+        )
+        assert interface.refresh() == [('refresh.shadowed', 'rotated')]
+
+    @staticmethod
+    @mock_secretsmanager
+    def test_config_refresh_secrets():
+        """ Test that config refreshes the loaded secrets """
+        client = boto3.client('secretsmanager', aws_region)
+        client.create_secret(Name='refresh.config', SecretString='original')
+
+        refresh_config = Config()
+        refresh_config.set('aws.secretsmanager.enabled', True)
+        refresh_config.refresh_secrets()
+        assert refresh_config.get('refresh.config') == 'original'
+
+        client.put_secret_value(SecretId='refresh.config', SecretString='rotated')
+        refresh_config.refresh_secrets()
+        assert refresh_config.get('refresh.config') == 'rotated'
@@ -0,0 +1,227 @@
+"""
+Test Azure Key Vault loading with a local secret client
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import asyncio
+import json
+import threading
+import time
+from config import Config
+from config.external.azure import KeyVault
+
+test_prefix = 'test-prefix'
+
+secrets = {
+    'db--name': 'example',
+    'db--password': 'unprefixed-password',
+    'test-prefix---db--password': 'prefixed-password',
+    'other-prefix---db--password': 'other-password',
+    'test-prefix---feature--enabled-flag': 'true',
+    'disabled': 'disabled-value',
+    'config': json.dumps({'full': {'path': 'value'}})
+}
+
+versions = {}
+
+class SecretProperties():
+    """ Secret properties """
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        # Listed properties have no version, like in the SDK
+        self.version = None
+        self.updated_on = versions.get(name, 'initial')
+
+class KeyVaultSecret():
+    """ Secret with a value """
+    def __init__(self, name: str, value: str):
+        self.name = name
+        self.value = value
+
+class SecretClient():
+    """ Local secret client """
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.fetched = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def list_properties_of_secrets():
+        """ List the secret properties """
+        return [SecretProperties(name, name != 'disabled') for name in secrets]
+
+    def get_secret(self, name: str) -> KeyVaultSecret:
+        """ Get a secret """
+        with self._lock:
+            self.fetched.append(name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+        time.sleep(self.latency)
+
+        with self._lock:
+            self.active -= 1
+
+        return KeyVaultSecret(name, secrets[name])
+
+class LocalKeyVault(KeyVault):
+    """ Key Vault with the local secret client """
+    client = None
+
+    def get_client(self):
+        """ Get client """
+        return self.client
+
+class AsyncSecretClient():
+    """ Local asynchronous secret client """
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.fetched = []
+        self.active = 0
+        self.max_active = 0
+        self.closed = False
+
+    async def list_properties_of_secrets(self):
+        """ List the secret properties """
+        for name in secrets:
+            yield SecretProperties(name, name != 'disabled')
+
+    async def get_secret(self, name: str) -> KeyVaultSecret:
+        """ Get a secret """
+        self.fetched.append(name)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.latency)
+        self.active -= 1
+        return KeyVaultSecret(name, secrets[name])
+
+    async def close(self):
+        """ Close the client """
+        self.closed = True
+
+class AsyncLocalKeyVault(LocalKeyVault):
+    """ Key Vault with the local asynchronous secret client """
+    async_client = None
+
+    def get_async_client(self):
+        """ Get the asynchronous client """
+        self._async_client = self.async_client
+        return self.async_client
+
+def get_interface(client: SecretClient, interface_class: type = LocalKeyVault, \
+    **options) -> LocalKeyVault:
+    """ Get Key Vault with the given options """
+    config = Config()
+    config.set('azure.keyvault', options)
+    interface = interface_class(config)
+    interface.client = client
+    return interface
+
+def load(client: SecretClient, **options) -> Config:
+    """ Load the secrets with the given Key Vault options """
+    interface = get_interface(client, **options)
+    interface.load()
+    return interface.config
+
+class TestKeyVault():
+    """ Test Azure Key Vault loading """
+    @staticmethod
+    def test_load_applies_prefixed_values_over_unprefixed():
+        """ Test that the prefixed values have priority """
+        config = load(SecretClient(), prefix=test_prefix)
+        assert config.get('db.name') == 'example'
+        assert config.get('db.password') == 'prefixed-password'
+        assert config.get('feature.enabled_flag') is True
+        assert config.get('full.path') == 'value'
+
+    @staticmethod
+    def test_load_fetches_only_the_selected_secrets():
+        """ Test that the discarded secrets are not fetched """
+        client = SecretClient()
+        load(client, prefix=test_prefix, skip_unprefixed=True)
+        assert sorted(client.fetched) == [
+            'test-prefix---db--password',
+            'test-prefix---feature--enabled-flag'
+        ]
+
+    @staticmethod
+    def test_load_without_prefix_skips_prefixed():
+        """ Test that the prefixed secrets are not fetched without a prefix """
+        client = SecretClient()
+        config = load(client)
+        assert config.get('db.password') == 'unprefixed-password'
+        assert 'other-prefix---db--password' not in client.fetched
+        assert 'disabled' not in client.fetched
+
+    @staticmethod
+    def test_load_fetches_concurrently():
+        """ Test that the values are fetched concurrently up to max_workers """
+        client = SecretClient(latency=0.05)
+        load(client, prefix=test_prefix, max_workers=2)
+        assert client.max_active == 2
+
+        client = SecretClient(latency=0.01)
+        load(client, prefix=test_prefix, max_workers=1)
+        assert client.max_active == 1
+
+    @staticmethod
+    def test_load_async_with_the_asynchronous_client():
+        """ Test that the values are fetched concurrently with the asynchronous client """
+        client = SecretClient()
+        async_client = AsyncSecretClient(latency=0.01)
+        interface = get_interface(client, AsyncLocalKeyVault, prefix=test_prefix, max_workers=2)
+        interface.async_client = async_client
+        asyncio.run(interface.load_async())
+
+        assert interface.config.get('db.password') == 'prefixed-password'
+        assert interface.config.get('full.path') == 'value'
+        assert client.fetched == []
+        assert async_client.max_active == 2
+        assert async_client.closed
+        assert interface.api_calls == 1 + len(async_client.fetched)
+
+    @staticmethod
+    def test_load_async_without_the_asynchronous_client():
+        """ Test that the blocking client is called in the executor without the aio transport """
+        client = SecretClient()
+        interface = get_interface(client, AsyncLocalKeyVault, prefix=test_prefix)
+        asyncio.run(interface.load_async())
+
+        assert interface.config.get('db.password') == 'prefixed-password'
+        assert 'test-prefix---db--password' in client.fetched
+
+    @staticmethod
+    def test_load_is_measured():
+        """ Test that the instrumentation records the load and the API calls """
+        interface = get_interface(SecretClient(), prefix=test_prefix, skip_unprefixed=True)
+        interface.config.use_instrumentation()
+        interface.load()
+
+        load = interface.config.stats()['loads']['azure.keyvault']
+        assert load['count'] == 1
+        assert load['calls'] == 3
+
+    @staticmethod
+    def test_refresh_fetches_only_changed_secrets():
+        """ Test that refresh fetches only the secrets with a new version """
+        client = SecretClient()
+        interface = get_interface(client, prefix=test_prefix)
+        interface.load()
+
+        client.fetched.clear()
+        assert interface.refresh() == []
+        assert client.fetched == []
+
+        secrets['test-prefix---db--password'] = 'rotated-password'
+        versions['test-prefix---db--password'] = 'rotated'
+
+        try:
+            assert interface.refresh() == [('db.password', 'rotated-password')]
+            assert client.fetched == ['test-prefix---db--password']
+            assert interface.config.get('db.password') == 'rotated-password'
+        finally:
+            secrets['test-prefix---db--password'] = 'prefixed-password'
+            del versions['test-prefix---db--password']
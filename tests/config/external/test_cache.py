@@ -0,0 +1,260 @@
+"""
+Test encrypted on-disk secrets cache
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import os
+import sys
+import tempfile
+import pytest
+from cryptography.fernet import Fernet
+from config import Config
+from config.external.cache import SecretsCache
+from config.external.interface import ExternalInterface, VersionedInterface
+
+class CountingInterface(ExternalInterface):
+    """ External interface that counts the fetches """
+    NAME = 'counting'
+
+    def __init__(self, config, secrets: list = None):
+        super().__init__(config)
+        self.secrets = secrets or [('cached.key', 'cached-value'), ('cached.json', '{"foo": 1}')]
+        self.fetches = 0
+        self.error = None
+
+    def fetch(self) -> list:
+        """ Fetch the secrets """
+        self.fetches += 1
+
+        if self.error:
+            raise self.error
+
+        return self.secrets
+
+class RemoteInterface(VersionedInterface):
+    """ External interface that lists the secret versions and counts the requests """
+    NAME = 'versioned'
+
+    def __init__(self, config, remote: dict):
+        super().__init__(config)
+        self.remote = remote
+        self.selects = 0
+        self.fetched_names = []
+
+    def select(self) -> list:
+        """ List the secrets with their versions """
+        self.selects += 1
+        return [(name, name, (version, 'date')) for name, (_value, version) in self.remote.items()]
+
+    def get_values(self, names: list) -> dict:
+        """ Get the secret values """
+        self.fetched_names.extend(names)
+        return {name: self.remote[name][0] for name in names}
+
+def get_config(path: str, **options) -> Config:
+    """ Get configuration with the secrets cache enabled """
+    config = Config()
+    config.set('secrets.cache', {
+        'enabled': True,
+        'path': path,
+        'key': Fernet.generate_key().decode(),
+        **options
+    })
+    return config
+
+class TestSecretsCache():
+    """ Test secrets cache """
+    @staticmethod
+    def test_cache_is_disabled_by_default():
+        """ Test that there is no cache unless enabled """
+        assert SecretsCache.from_config(Config()) is None
+
+    @staticmethod
+    def test_cache_requires_a_key():
+        """ Test that the cache refuses to work without an encryption key """
+        config = Config()
+        config.set('secrets.cache.enabled', True)
+
+        with pytest.raises(ValueError):
+            SecretsCache.from_config(config)
+
+    @staticmethod
+    def test_cache_requires_cryptography(monkeypatch):
+        """ Test that the cache explains the missing optional dependency """
+        monkeypatch.setitem(sys.modules, 'cryptography.fernet', None)
+
+        with pytest.raises(ImportError, match='config\\[cache\\]'):
+            SecretsCache('/tmp', Fernet.generate_key())
+
+    @staticmethod
+    def test_cache_defaults_to_a_user_directory():
+        """ Test that the default cache directory is not shared with the other users """
+        config = Config()
+        config.set('secrets.cache', {'enabled': True, 'key': Fernet.generate_key().decode()})
+
+        assert SecretsCache.from_config(config).path == \
+            os.path.join(os.path.expanduser('~'), '.cache', 'config-secrets')
+
+    @staticmethod
+    def test_cache_directory_must_be_private():
+        """ Test that the cache refuses a directory other users can write to """
+        with tempfile.TemporaryDirectory() as path:
+            os.chmod(path, 0o777)
+            config = get_config(path)
+
+            with pytest.raises(PermissionError):
+                CountingInterface(config).load()
+
+            assert os.listdir(path) == []
+
+    @staticmethod
+    def test_cache_directory_must_not_be_a_link():
+        """ Test that the cache refuses a symbolic link as the directory """
+        with tempfile.TemporaryDirectory() as path:
+            os.mkdir(os.path.join(path, 'target'), 0o700)
+            os.symlink(os.path.join(path, 'target'), os.path.join(path, 'link'))
+
+            with pytest.raises(PermissionError):
+                CountingInterface(get_config(os.path.join(path, 'link'))).load()
+
+    @staticmethod
+    def test_load_uses_the_cached_secrets():
+        """ Test that the second load is served from the cache """
+        with tempfile.TemporaryDirectory() as path:
+            config = get_config(path)
+            interface = CountingInterface(config)
+            interface.load()
+            interface.load()
+
+            assert interface.fetches == 1
+            assert config.get('cached.key') == 'cached-value'
+            assert config.get('cached.json') == {'foo': 1}
+
+            # Another worker with the same key uses the same cache
+            worker_config = Config()
+            worker_config.set('secrets.cache', config.get('secrets.cache'))
+            worker_interface = CountingInterface(worker_config)
+            worker_interface.load()
+            assert worker_interface.fetches == 0
+            assert worker_config.get('cached.key') == 'cached-value'
+
+    @staticmethod
+    def test_cache_is_encrypted():
+        """ Test that the secrets are not stored as plain text """
+        with tempfile.TemporaryDirectory() as path:
+            config = get_config(path)
+            CountingInterface(config).load()
+
+            for file_name in os.listdir(path):
+                with open(os.path.join(path, file_name), 'rb') as cache_file:
+                    assert b'cached-value' not in cache_file.read()
+
+    @staticmethod
+    def test_cache_with_a_different_key_is_not_used():
+        """ Test that a cache encrypted with another key is refetched """
+        with tempfile.TemporaryDirectory() as path:
+            CountingInterface(get_config(path)).load()
+            interface = CountingInterface(get_config(path))
+            interface.load()
+            assert interface.fetches == 1
+
+    @staticmethod
+    def test_expired_cache_is_refreshed():
+        """ Test that the cache is refreshed after the TTL """
+        with tempfile.TemporaryDirectory() as path:
+            config = get_config(path, ttl=0)
+            interface = CountingInterface(config)
+            interface.load()
+            interface.secrets = [('cached.key', 'refreshed-value')]
+            interface.load()
+
+            assert interface.fetches == 2
+            assert config.get('cached.key') == 'refreshed-value'
+
+    @staticmethod
+    def test_stale_cache_is_used_on_error():
+        """ Test that the stale cache is used when the external source fails """
+        with tempfile.TemporaryDirectory() as path:
+            config = get_config(path, ttl=0)
+            interface = CountingInterface(config)
+            interface.load()
+            interface.error = ConnectionError('Unavailable')
+            config.set('cached.key', None)
+            interface.load()
+
+            assert interface.fetches == 2
+            assert config.get('cached.key') == 'cached-value'
+
+            config.set('secrets.cache.stale_on_error', False)
+
+            with pytest.raises(ConnectionError):
+                interface.load()
+
+    @staticmethod
+    def test_refresh_within_the_ttl_uses_the_cache():
+        """ Test that an interface loaded from the cache does not poll the source """
+        remote = {'cached.a': ('a', 1), 'cached.b': ('b', 1)}
+
+        with tempfile.TemporaryDirectory() as path:
+            config = get_config(path)
+            RemoteInterface(config, remote).load()
+
+            worker_config = Config()
+            worker_config.set('secrets.cache', config.get('secrets.cache'))
+            worker = RemoteInterface(worker_config, remote)
+            worker.load()
+
+            assert worker.refresh() == []
+            assert worker.selects == 0
+            assert worker.fetched_names == []
+            assert worker.versions == {'cached.a': (1, 'date'), 'cached.b': (1, 'date')}
+
+    @staticmethod
+    def test_expired_cache_is_refreshed_incrementally_and_shared():
+        """ Test that one process refreshes the changed secrets and the others read them """
+        remote = {'cached.a': ('a', 1), 'cached.b': ('b', 1)}
+
+        with tempfile.TemporaryDirectory() as path:
+            config = get_config(path)
+            interface = RemoteInterface(config, remote)
+            interface.load()
+
+            worker_config = Config()
+            worker_config.set('secrets.cache', config.get('secrets.cache'))
+            worker = RemoteInterface(worker_config, remote)
+            worker.load()
+
+            remote['cached.b'] = ('rotated', 2)
+
+            # The worker finds the cache expired and refreshes it from the source
+            worker_config.set('secrets.cache.ttl', 0)
+            assert worker.refresh() == [('cached.b', 'rotated')]
+            assert worker.selects == 1
+            assert worker.fetched_names == ['cached.b']
+
+            # The other process applies the refreshed secrets from the cache
+            assert sorted(interface.refresh()) == [('cached.a', 'a'), ('cached.b', 'rotated')]
+            assert interface.selects == 1
+            assert interface.fetched_names == ['cached.a', 'cached.b']
+            assert config.get('cached.b') == 'rotated'
+            assert interface.refresh() == []
+
+    @staticmethod
+    def test_stale_refresh_is_used_on_error():
+        """ Test that a failing refresh applies the stale entry the interface has not applied """
+        remote = {'cached.a': ('a', 1)}
+
+        with tempfile.TemporaryDirectory() as path:
+            config = get_config(path, ttl=0)
+            RemoteInterface(config, remote).load()
+
+            worker_config = Config()
+            worker_config.set('secrets.cache', config.get('secrets.cache'))
+            worker = RemoteInterface(worker_config, remote)
+
+            def fail():
+                raise ConnectionError('Unavailable')
+
+            worker.fetch_changes = fail
+            assert worker.refresh() == [('cached.a', 'a')]
+            assert worker_config.get('cached.a') == 'a'
@@ -0,0 +1,131 @@
+"""
+Test external interface
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import asyncio
+import math
+import pytest
+from config import Config
+from config.external.interface import ExternalInterface, VersionedInterface, is_plain_value, \
+    parse_secret_value
+
+class FetchOnlyInterface(ExternalInterface):
+    """ Interface that only implements fetch """
+    NAME = 'fetch.only'
+
+    def fetch(self) -> list:
+        """ Fetch the secrets """
+        self.api_calls += 1
+        return [('db.password', 'secret')]
+
+class TestExternalInterface():
+    """ Test external interface """
+    @staticmethod
+    @pytest.mark.parametrize('value', ['hunter2', 'p@ssw0rd!', 'a:b', 'a#b', 'Secret-value'])
+    def test_plain_values_are_not_parsed(value):
+        """ Test that the plain values are recognized without parsing """
+        assert is_plain_value(value)
+        assert ExternalInterface._parse_secret_value(value) == value
+
+    @staticmethod
+    @pytest.mark.parametrize('value, expected', [
+        ('true', True),
+        ('off', False),
+        ('null', None),
+        ('~', None),
+        ('1e3', 1000.0),
+        ('12', 12),
+        ('.5', 0.5),
+        ('a:', {'a': None}),
+        ('[1, 2]', [1, 2]),
+        ('{"foo": "bar"}', {'foo': 'bar'}),
+        ('foo: bar\nbar: [1, 2]', {'foo': 'bar', 'bar': [1, 2]})
+    ])
+    def test_values_with_syntax_are_parsed(value, expected):
+        """ Test that the values with JSON or YAML syntax are parsed """
+        assert not is_plain_value(value)
+        assert ExternalInterface._parse_secret_value(value) == expected
+
+    @staticmethod
+    def test_json_words_are_parsed():
+        """ Test that the words JSON parses as numbers are parsed """
+        assert math.isnan(ExternalInterface._parse_secret_value('NaN'))
+        assert ExternalInterface._parse_secret_value('Infinity') == math.inf
+
+    @staticmethod
+    def test_invalid_yaml_is_kept_as_is():
+        """ Test that values that fail to parse are kept as strings """
+        assert ExternalInterface._parse_secret_value('text foobar\nnumber: 2') == \
+            'text foobar\nnumber: 2'
+        assert ExternalInterface._parse_secret_value('!!python/object:os.system foo') == \
+            '!!python/object:os.system foo'
+        assert ExternalInterface._parse_secret_value('password: >#x') == 'password: >#x'
+
+    @staticmethod
+    @pytest.mark.parametrize('value', [
+        '>#Zq9w!x', '|#pass', '>#', '|#a b', '>', '|-', '!', '!secret', '!foo bar', '&a', '*a',
+        '%YAML', '@x', '`x', '...', '#comment'
+    ])
+    def test_indicator_values_are_kept_as_is(value):
+        """ Test that the single line values starting with a YAML indicator are not parsed """
+        assert ExternalInterface._parse_secret_value(value) == value
+
+    @staticmethod
+    @pytest.mark.parametrize('value, expected', [
+        ('- a', ['a']),
+        ('? x', {'x': None}),
+        ("'quoted'", 'quoted'),
+        ('>\n  folded', 'folded'),
+        (' lead', 'lead'),
+        ('trail ', 'trail'),
+        ('abc #c', 'abc'),
+        (' #x', None),
+        ('---', '---'),
+        ('--- a', 'a')
+    ])
+    def test_structured_values_are_parsed(value, expected):
+        """ Test that the values with the YAML structure are parsed """
+        assert ExternalInterface._parse_secret_value(value) == expected
+
+    @staticmethod
+    def test_interfaces_implement_the_abstract_methods():
+        """ Test that an interface cannot be created without fetch or select and get_values """
+        class SelectOnlyInterface(VersionedInterface):
+            """ Versioned interface without get_values """
+            def select(self) -> list:
+                return []
+
+        with pytest.raises(TypeError):
+            ExternalInterface(Config())
+
+        with pytest.raises(TypeError):
+            SelectOnlyInterface(Config())
+
+        assert FetchOnlyInterface(Config()).fetch() == [('db.password', 'secret')]
+
+    @staticmethod
+    def test_parsed_values_are_memoized():
+        """ Test that the parsed values are memoized and copied """
+        value = '{"memoized": {"list": [1, 2]}}'
+        parsed = ExternalInterface._parse_secret_value(value)
+        hits = parse_secret_value.cache_info().hits
+
+        parsed['memoized']['list'].append(3)
+
+        assert ExternalInterface._parse_secret_value(value) == {'memoized': {'list': [1, 2]}}
+        assert parse_secret_value.cache_info().hits == hits + 1
+
+    @staticmethod
+    def test_fetch_only_interface_is_loaded_async():
+        """ Test that the interface without select is fetched in the executor """
+        config = Config()
+        config.use_instrumentation()
+        interface = FetchOnlyInterface(config)
+
+        assert asyncio.run(interface.retrieve_async()) == [('db.password', 'secret')]
+
+        asyncio.run(interface.load_async())
+        assert config.get('db.password') == 'secret'
+        assert config.stats()['loads']['fetch.only']['count'] == 2
+        assert config.stats()['loads']['fetch.only']['calls'] == 2
@@ -0,0 +1,255 @@
+"""
+Test external provider registry
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import threading
+import time
+from importlib.metadata import EntryPoint
+import pytest
+from config import Config
+from config.external.cache import SecretsCache
+from config.external import registry as registry_module
+from config.external.interface import ExternalInterface, VersionedInterface
+from config.external.registry import Registry
+
+LATENCY = 0.1
+
+class SlowInterface(ExternalInterface):
+    """ External interface with latency """
+    NAME = 'slow.low'
+    PRIORITY = 10
+    VALUE = 'low'
+
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def fetch(self) -> list:
+        """ Fetch the secrets """
+        with SlowInterface.lock:
+            SlowInterface.active += 1
+            SlowInterface.max_active = max(SlowInterface.max_active, SlowInterface.active)
+
+        time.sleep(LATENCY)
+
+        with SlowInterface.lock:
+            SlowInterface.active -= 1
+
+        return [('provider.value', self.VALUE), (f'provider.{self.VALUE}', 'true')]
+
+class SlowHighInterface(SlowInterface):
+    """ External interface with latency and a higher priority """
+    NAME = 'slow.high'
+    PRIORITY = 20
+    VALUE = 'high'
+
+@pytest.fixture(name='providers')
+def fixture_providers(monkeypatch):
+    """ Register the test providers to the default registry """
+    monkeypatch.setattr(registry_module.registry, '_providers', {})
+    monkeypatch.setattr(registry_module.registry, '_discover', False)
+
+    # High priority first to verify that the priority orders the providers
+    registry_module.registry.register('slow.high', SlowHighInterface)
+    registry_module.registry.register('slow.low', SlowInterface)
+
+    SlowInterface.max_active = 0
+    return registry_module.registry
+
+class TestRegistry():
+    """ Test provider registry """
+    @staticmethod
+    def test_enabled_providers_are_sorted_by_priority():
+        """ Test that only enabled providers are returned, the lowest priority first """
+        registry = Registry(discover=False)
+        registry.register('slow.high', SlowHighInterface)
+        registry.register('slow.low', SlowInterface)
+        registry.register('disabled', SlowInterface)
+
+        config = Config()
+        config.set('slow.high.enabled', True)
+        config.set('slow.low.enabled', True)
+
+        assert [provider.name for provider in registry.enabled(config)] == \
+            ['slow.low', 'slow.high']
+
+    @staticmethod
+    def test_priority_and_enabled_key_can_be_overridden():
+        """ Test that registration overrides the priority and the enablement key """
+        registry = Registry(discover=False)
+        registry.register('slow.high', SlowHighInterface, priority=0, enabled_key='custom')
+        registry.register('slow.low', SlowInterface)
+
+        config = Config()
+        config.set('custom', True)
+        config.set('slow.low.enabled', True)
+
+        assert [provider.name for provider in registry.enabled(config)] == \
+            ['slow.high', 'slow.low']
+
+    @staticmethod
+    def test_interface_declares_the_enabled_key():
+        """ Test that the interface class declares the enablement key """
+        class CustomKeyInterface(SlowInterface):
+            """ External interface enabled with its own key """
+            ENABLED_KEY = 'custom.provider.active'
+
+        registry = Registry(discover=False)
+        registry.register('custom', CustomKeyInterface)
+        registry.register('overridden', CustomKeyInterface, enabled_key='overridden.on')
+
+        config = Config()
+        config.set('custom.enabled', True)
+        assert registry.enabled(config) == []
+
+        config.set('custom.provider.active', True)
+        config.set('overridden.on', True)
+        assert [provider.name for provider in registry.enabled(config)] == \
+            ['custom', 'overridden']
+
+    @staticmethod
+    def test_disabled_providers_are_not_imported():
+        """ Test that the interface class of a disabled provider is not imported """
+        registry = Registry(discover=False)
+        registry.register('missing', 'config.external.missing:Missing')
+
+        assert registry.enabled(Config()) == []
+
+        registry.unregister('missing')
+        assert registry.providers() == []
+
+    @staticmethod
+    def test_entry_points_are_discovered(monkeypatch):
+        """ Test that the providers are discovered from the package entry points """
+        def entry_points(group: str):
+            return [
+                EntryPoint(
+                    name='cached',
+                    value='config.external.cache:SecretsCache',
+                    group=group
+                )
+            ]
+
+        monkeypatch.setitem(Registry.discover.__globals__, 'entry_points', entry_points)
+
+        registry = Registry()
+        registry.register('slow.high', SlowHighInterface)
+
+        assert [provider.name for provider in registry.providers()] == ['slow.high', 'cached']
+        assert registry.providers()[1].load() is SecretsCache
+
+    @staticmethod
+    def test_load_secrets_fetches_concurrently(providers):
+        """ Test that the enabled providers are fetched concurrently """
+        config = Config()
+        config.set('slow.low.enabled', True)
+        config.set('slow.high.enabled', True)
+
+        start = time.perf_counter()
+        config.load_secrets()
+
+        assert time.perf_counter() - start < LATENCY * 2
+        assert SlowInterface.max_active == 2
+        assert providers.enabled(config)
+
+    @staticmethod
+    def test_load_secrets_applies_by_priority(providers):
+        """ Test that the higher priority provider overrides the lower one """
+        assert providers.providers()[0].name == 'slow.high'
+
+        config = Config()
+        config.set('slow.low.enabled', True)
+        config.set('slow.high.enabled', True)
+        config.load_secrets()
+
+        assert config.get('provider.value') == 'high'
+        assert config.get('provider.low') is True
+        assert config.get('provider.high') is True
+
+    @staticmethod
+    def test_layered_load_secrets_adds_layers_by_priority(providers):
+        """ Test that the provider layers are in the priority order """
+        assert providers.providers()
+
+        config = Config(layered=True)
+        config.set('slow.low.enabled', True)
+        config.set('slow.high.enabled', True)
+        config.load_secrets()
+
+        assert config.layers() == ['default', 'slow.low', 'slow.high']
+        assert config.get('provider.value') == 'high'
+        assert config.source('provider.value') == 'slow.high'
+        assert config.source('provider.low') == 'slow.low'
+
+    @staticmethod
+    @pytest.mark.parametrize('layered', [False, True])
+    def test_refresh_secrets_fetches_without_the_write_lock(providers, layered):
+        """ Test that the writers are not blocked while the providers are fetched """
+        assert providers.providers()
+
+        config = Config(layered=layered)
+        config.set('slow.low.enabled', True)
+        config.load_secrets()
+
+        refresh = threading.Thread(target=config.refresh_secrets)
+        refresh.start()
+        time.sleep(LATENCY / 4)
+
+        start = time.perf_counter()
+        config.set('writer.value', True)
+        elapsed = time.perf_counter() - start
+        refresh.join()
+
+        assert elapsed < LATENCY / 2
+        assert config.get('writer.value') is True
+        assert config.get('provider.value') == 'low'
+
+    @staticmethod
+    def test_failed_refresh_keeps_the_changes_of_the_other_providers(monkeypatch):
+        """ Test that the changes fetched in a failed refresh are fetched again """
+        remote = {'a.key': ('v1', 1)}
+
+        class RemoteInterface(VersionedInterface):
+            """ External interface that lists the secret versions """
+            NAME = 'versioned'
+
+            def select(self) -> list:
+                return [(name, name, version) for name, (_value, version) in remote.items()]
+
+            def get_values(self, names: list) -> dict:
+                return {name: remote[name][0] for name in names}
+
+        class FailingInterface(ExternalInterface):
+            """ External interface that fails when set to fail """
+            NAME = 'failing'
+            PRIORITY = 10
+            error = None
+
+            def fetch(self) -> list:
+                if FailingInterface.error:
+                    raise FailingInterface.error
+                return []
+
+        monkeypatch.setattr(registry_module.registry, '_providers', {})
+        monkeypatch.setattr(registry_module.registry, '_discover', False)
+        registry_module.registry.register('versioned', RemoteInterface)
+        registry_module.registry.register('failing', FailingInterface)
+
+        config = Config()
+        config.set('versioned.enabled', True)
+        config.set('failing.enabled', True)
+        config.refresh_secrets()
+        assert config.get('a.key') == 'v1'
+
+        remote['a.key'] = ('v2', 2)
+        FailingInterface.error = ConnectionError('Unavailable')
+
+        with pytest.raises(ConnectionError):
+            config.refresh_secrets()
+
+        assert config.get('a.key') == 'v1'
+
+        FailingInterface.error = None
+        config.refresh_secrets()
+        assert config.get('a.key') == 'v2'
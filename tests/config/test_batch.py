@@ -0,0 +1,136 @@
+"""
+Test setting many configuration keys at once
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import threading
+import pytest
+from config import Config
+from config.layers import update
+
+tree = {
+    'db': {'name': 'example', 'port': 5432},
+    'cache': {'hosts': ['a']}
+}
+
+def get_config(**options) -> Config:
+    """ Get a configuration with the tree """
+    config = Config(**options)
+    config.set(None, tree)
+    return config
+
+class TestBatch():
+    """ Test setting many configuration keys at once """
+    @staticmethod
+    def test_update_copies_each_node_once():
+        """ Test that the updated nodes are copied and the others are shared """
+        updated = update(tree, [
+            (('db', 'name'), 'changed'),
+            (('db', 'user'), 'user'),
+            ((), {'cache': {'hosts': ['b']}}),
+            (('new', 'key'), 1)
+        ])
+
+        assert updated == {
+            'db': {'name': 'changed', 'port': 5432, 'user': 'user'},
+            'cache': {'hosts': ['a', 'b']},
+            'new': {'key': 1}
+        }
+        assert tree['db'] == {'name': 'example', 'port': 5432}
+        assert update(tree, [(('new',), 1)])['db'] is tree['db']
+
+    @staticmethod
+    def test_set_many_notifies_once():
+        """ Test that the values are published with one change notification """
+        config = get_config()
+        changes = []
+        config.subscribe(lambda key, old, new: changes.append((old, new)), 'db')
+        snapshot = config.snapshot()
+
+        config.set_many({'db.name': 'changed', ('db', 'port'): 5433, None: {'db': {'user': 'u'}}})
+
+        assert config.get('db') == {'name': 'changed', 'port': 5433, 'user': 'u'}
+        assert len(changes) == 1
+        assert snapshot.get('db.name') == 'example'
+        assert config.keys('db') == ['db.name', 'db.port', 'db.user']
+
+    @staticmethod
+    def test_set_many_in_place():
+        """ Test that the non-atomic update modifies the configuration in place """
+        config = get_config(in_place_merge=True)
+        db = config.get('db')
+
+        config.set_many([('db.name', 'changed')], atomic=False)
+        assert db['name'] == 'changed'
+
+        config.set_many([('db.name', 'atomic')])
+        assert db['name'] == 'changed'
+        assert config.get('db.name') == 'atomic'
+
+    @staticmethod
+    def test_batch_applies_on_exit():
+        """ Test that the values set within the batch are applied on exit """
+        config = get_config()
+        changes = []
+        config.subscribe(lambda key, old, new: changes.append(new), 'db.port')
+
+        with config.batch():
+            config.set('db.port', 1)
+            config.set('db.port', 2)
+
+            with config.batch():
+                config.set_many({'db.name': 'changed'})
+
+            assert config.get('db.port') == 5432
+
+        assert config.get('db.port') == 2
+        assert config.get('db.name') == 'changed'
+        assert changes == [2]
+
+    @staticmethod
+    def test_batch_is_discarded_on_error():
+        """ Test that readers do not see a partially applied batch """
+        config = get_config()
+
+        with pytest.raises(RuntimeError):
+            with config.batch():
+                config.set('db.name', 'changed')
+                raise RuntimeError('Loading failed')
+
+        assert config.get('db.name') == 'example'
+
+        with pytest.raises(AssertionError):
+            config.set_many([('db.name', 'changed'), (None, 'not a dictionary')])
+
+        assert config.get('db.name') == 'example'
+
+    @staticmethod
+    def test_batch_blocks_other_writers():
+        """ Test that the other threads write after the batch """
+        config = get_config()
+
+        with config.batch():
+            config.set('db.port', 1)
+            writer = threading.Thread(target=lambda: config.set('db.port', 2))
+            writer.start()
+            writer.join(0.05)
+            assert writer.is_alive()
+
+        writer.join()
+        assert config.get('db.port') == 2
+
+    @staticmethod
+    def test_layered_batch():
+        """ Test that the values are set to the layers they were set in """
+        config = Config(layered=True)
+        config.set('db.name', 'example')
+
+        with config.batch():
+            config.set('db.port', 5432)
+
+            with config.layer('local'):
+                config.set('db.name', 'local')
+
+        assert config.layers() == ['default', 'local']
+        assert config.get('db') == {'name': 'local', 'port': 5432}
+        assert config.source('db.port') == 'default'
@@ -111,3 +111,70 @@ class TestConfig(unittest.TestCase):
 
         config.set('deep_key_path', deep_key_value)
         assert config.get(deep_key_path) == deep_key_env_var_value
+
+    @staticmethod
+    def test_compile_key_path_returns_keys_and_environment_variable():
+        """ Test that compile_key_path splits the path and builds the environment variable """
+        assert Config.compile_key_path('db.connection_string') == \
+            (('db', 'connection_string'), 'DB_CONNECTION_STRING')
+        assert Config.compile_key_path(['db', 'name']) == (('db', 'name'), 'DB_NAME')
+        assert Config.compile_key_path() == ((), '')
+
+    @staticmethod
+    def test_get_caches_the_resolved_value():
+        """ Test that get stores the resolved value for the compiled key path """
+        cached_config = Config()
+        cached_config.set('cached.key', 'cached value')
+        assert cached_config.get('cached.key') == 'cached value'
+        assert cached_config.snapshot()._cache[('cached', 'key')] == 'cached value'
+
+    @staticmethod
+    def test_get_caches_missing_keys_and_returns_default():
+        """ Test that a cached missing key still returns the given default """
+        cached_config = Config()
+        assert cached_config.get('missing.key') is None
+        assert cached_config.get('missing.key', default='fallback') == 'fallback'
+
+    @staticmethod
+    def test_set_invalidates_the_cache():
+        """ Test that set invalidates previously resolved values """
+        cached_config = Config()
+        assert cached_config.get('invalidated.key') is None
+        cached_config.set('invalidated.key', 'new value')
+        assert cached_config.get('invalidated.key') == 'new value'
+        cached_config.set(value={'invalidated': {'key': 'merged value'}})
+        assert cached_config.get('invalidated.key') == 'merged value'
+
+    @staticmethod
+    def test_load_configuration_invalidates_the_cache():
+        """ Test that load_configuration invalidates previously resolved values """
+        cached_config = Config()
+        cached_config.load_configuration(main_configuration_path)
+        assert cached_config.get('test.nested.path.value') == 'test value'
+        cached_config.load_configuration(extended_configuration_path)
+        assert cached_config.get('test.nested.path.value') == 'overriding test value'
+
+    @staticmethod
+    def test_environment_variable_overrides_a_cached_value():
+        """ Test that an environment variable has precedence over a cached value """
+        cached_config = Config()
+        cached_config.set('cached.environment', 'configured value')
+        assert cached_config.get('cached.environment') == 'configured value'
+
+        os.environ['CACHED_ENVIRONMENT'] = 'environment value'
+
+        try:
+            assert cached_config.get('cached.environment') == 'environment value'
+        finally:
+            del os.environ['CACHED_ENVIRONMENT']
+
+    @staticmethod
+    def test_in_place_merge_modifies_the_configuration():
+        """ Test that the configuration is merged in place when requested """
+        in_place_config = Config(in_place_merge=True)
+        in_place_config.set(value={'in_place': {'foo': 'bar'}})
+        root = in_place_config.get()
+        in_place_config.load_configuration(main_configuration_path)
+        assert in_place_config.get() is root
+        assert in_place_config.get('in_place.foo') == 'bar'
+        assert in_place_config.get('test.nested.path.value') == 'test value'
@@ -0,0 +1,140 @@
+"""
+Test environment override index
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import gc
+import os
+import threading
+from config import Config
+from config.environment import EnvironmentIndex, ObservedEnviron, cast_value
+
+class TestEnvironment():
+    """ Test environment override index """
+    @staticmethod
+    def test_cast_value_typecasts_magic_values():
+        """ Test that cast_value typecasts the magic values case insensitively """
+        assert cast_value('TRUE') is True
+        assert cast_value('False') is False
+        assert cast_value('none') is None
+        assert cast_value('NULL') is None
+        assert cast_value('value') == 'value'
+
+    @staticmethod
+    def test_environment_index_contains_typecasted_values():
+        """ Test that the index contains the typecasted environment values """
+        os.environ['TEST_ENVIRONMENT_INDEX_VALUE'] = 'true'
+
+        try:
+            index = EnvironmentIndex()
+            assert index.get('TEST_ENVIRONMENT_INDEX_VALUE') is True
+            assert index.get('TEST_ENVIRONMENT_INDEX_MISSING', 'default') == 'default'
+        finally:
+            del os.environ['TEST_ENVIRONMENT_INDEX_VALUE']
+
+    @staticmethod
+    def test_environment_index_is_a_snapshot():
+        """ Test that the index does not see changes before refresh """
+        index = EnvironmentIndex()
+        os.environ['TEST_ENVIRONMENT_INDEX_SNAPSHOT'] = 'snapshot'
+
+        try:
+            assert index.get('TEST_ENVIRONMENT_INDEX_SNAPSHOT') is None
+            index.refresh()
+            assert index.get('TEST_ENVIRONMENT_INDEX_SNAPSHOT') == 'snapshot'
+        finally:
+            del os.environ['TEST_ENVIRONMENT_INDEX_SNAPSHOT']
+
+    @staticmethod
+    def test_environment_index_auto_refresh():
+        """ Test that the index follows os.environ mutations with auto_refresh """
+        index = EnvironmentIndex(auto_refresh=True)
+
+        try:
+            os.environ['TEST_ENVIRONMENT_INDEX_AUTO'] = 'null'
+            assert index.get('TEST_ENVIRONMENT_INDEX_AUTO', 'default') is None
+            del os.environ['TEST_ENVIRONMENT_INDEX_AUTO']
+            assert index.get('TEST_ENVIRONMENT_INDEX_AUTO', 'default') == 'default'
+        finally:
+            index.close()
+
+    @staticmethod
+    def test_environment_index_restores_os_environ():
+        """ Test that os.environ is restored when the observing indexes are released """
+        original = type(os.environ)
+        index_1 = EnvironmentIndex(auto_refresh=True)
+        index_2 = EnvironmentIndex(auto_refresh=True)
+        assert type(os.environ) is ObservedEnviron
+
+        index_1.close()
+        index_1.close()
+        assert type(os.environ) is ObservedEnviron
+
+        del index_2
+        gc.collect()
+        assert type(os.environ) is original
+
+    @staticmethod
+    def test_environment_index_counts_mutations():
+        """ Test that a mutation only invalidates the index """
+        index = EnvironmentIndex(auto_refresh=True)
+
+        try:
+            values = index._values
+            mutations = ObservedEnviron.mutations
+            os.environ['TEST_ENVIRONMENT_INDEX_COUNTED'] = 'counted'
+            os.environ['TEST_ENVIRONMENT_INDEX_COUNTED'] = 'counted again'
+
+            assert ObservedEnviron.mutations == mutations + 2
+            assert index._values is values
+            assert index.get('TEST_ENVIRONMENT_INDEX_COUNTED') == 'counted again'
+        finally:
+            del os.environ['TEST_ENVIRONMENT_INDEX_COUNTED']
+            index.close()
+
+    @staticmethod
+    def test_concurrent_mutations_are_counted():
+        """ Test that the mutations of concurrent threads are all counted """
+        index = EnvironmentIndex(auto_refresh=True)
+        mutations = ObservedEnviron.mutations
+
+        def mutate(name: str):
+            for i in range(500):
+                os.environ[name] = str(i)
+
+            del os.environ[name]
+
+        threads = [
+            threading.Thread(target=mutate, args=(f'TEST_ENVIRONMENT_INDEX_THREAD_{i}',))
+            for i in range(4)
+        ]
+
+        try:
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            assert ObservedEnviron.mutations == mutations + 4 * 501
+        finally:
+            index.close()
+
+    @staticmethod
+    def test_config_reads_overrides_from_the_index():
+        """ Test that config uses the index for the environment overrides """
+        config = Config()
+        config.set('environment.indexed', 'configured value')
+        config.use_environment_index()
+
+        os.environ['ENVIRONMENT_INDEXED'] = 'environment value'
+
+        try:
+            assert config.get('environment.indexed') == 'configured value'
+            config.refresh_environment()
+            assert config.get('environment.indexed') == 'environment value'
+        finally:
+            del os.environ['ENVIRONMENT_INDEXED']
+
+        config.use_environment_index(False)
+        assert config.get('environment.indexed') == 'configured value'
@@ -0,0 +1,139 @@
+"""
+Test compact read-only configuration tree
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import copy
+import json
+import pickle
+from collections.abc import Mapping
+import pytest
+import yaml
+from config import Config
+from config.frozen import FrozenDict, FrozenList, freeze, thaw
+from config.merge import merge
+
+tree = {
+    'db': {'name': 'example', 'port': 5432},
+    'hosts': ['a', 'b'],
+    'tenants': {f'tenant-{i}': {'plan': 'free', 'users': i} for i in range(20)}
+}
+
+class TestFrozen():
+    """ Test compact read-only configuration tree """
+    @staticmethod
+    def test_frozen_tree_equals_the_tree():
+        """ Test that the frozen tree compares equal and reads like the tree """
+        frozen = freeze(tree)
+
+        assert isinstance(frozen, Mapping)
+        assert frozen == tree
+        assert tree == frozen
+        assert frozen['tenants']['tenant-15'] == {'plan': 'free', 'users': 15}
+        assert frozen['hosts'] == ['a', 'b']
+        assert list(frozen) == list(tree)
+        assert 'db' in frozen and 'missing' not in frozen
+        assert frozen.get('missing', 1) == 1
+        assert thaw(frozen) == tree
+        assert json.dumps(thaw(frozen)) == json.dumps(tree)
+
+        with pytest.raises(KeyError):
+            frozen['tenants']['tenant-20'] # pylint: disable=pointless-statement
+
+    @staticmethod
+    def test_frozen_tree_is_read_only():
+        """ Test that the frozen tree cannot be modified """
+        frozen = freeze(tree)
+
+        with pytest.raises(TypeError):
+            frozen['db'] = {}
+
+        with pytest.raises(TypeError):
+            frozen['db'].update({'port': 5433})
+
+        with pytest.raises(TypeError):
+            frozen['hosts'].append('c')
+
+        assert frozen == tree
+
+    @staticmethod
+    def test_equal_strings_are_stored_once():
+        """ Test that the keys and the equal strings of the tree are shared """
+        frozen = freeze({
+            'a': {''.join(['pl', 'an']): ''.join(['fr', 'ee'])},
+            'b': {''.join(['pl', 'an']): ''.join(['fr', 'ee'])}
+        })
+
+        assert list(frozen['a'])[0] is list(frozen['b'])[0]
+        assert frozen['a']['plan'] is frozen['b']['plan']
+
+    @staticmethod
+    def test_frozen_tree_is_serializable():
+        """ Test that the frozen nodes are dictionaries and lists for JSON and YAML """
+        config = Config()
+        config.set(None, tree)
+        config.freeze()
+        db = config.get('db')
+
+        assert isinstance(db, dict)
+        assert isinstance(config.get('hosts'), list)
+        assert json.loads(json.dumps(db)) == tree['db']
+        assert json.loads(json.dumps(config.get())) == tree
+        assert yaml.safe_load(yaml.safe_dump(db)) == tree['db']
+        assert yaml.safe_load(yaml.safe_dump(config.get())) == tree
+        assert yaml.safe_load(yaml.dump(config.get('hosts'))) == tree['hosts']
+
+    @staticmethod
+    def test_frozen_tree_is_not_copied():
+        """ Test that copying returns the frozen tree and pickling restores it """
+        frozen = freeze(tree)
+
+        assert copy.deepcopy(frozen) is frozen
+        assert pickle.loads(pickle.dumps(frozen)) == tree
+        assert isinstance(frozen.copy(), dict)
+
+    @staticmethod
+    def test_frozen_tree_can_be_merged():
+        """ Test that merging copies only the modified nodes of the frozen tree """
+        frozen = freeze(tree)
+        merged = merge(frozen, {'db': {'port': 5433}, 'hosts': ['c']})
+
+        assert merged['db'] == {'name': 'example', 'port': 5433}
+        assert merged['hosts'] == ['a', 'b', 'c']
+        assert merged['tenants'] is frozen['tenants']
+        assert frozen['db']['port'] == 5432
+
+    @staticmethod
+    def test_frozen_config_can_be_written():
+        """ Test that the frozen configuration can still be written """
+        config = Config(in_place_merge=True)
+        config.set(None, tree)
+        config.freeze()
+
+        assert isinstance(config.get('db'), FrozenDict)
+        assert isinstance(config.get('hosts'), FrozenList)
+        assert not config.in_place_merge
+
+        config.set('db.port', 5433)
+        config.set(None, {'hosts': ['c']})
+
+        assert config.get('db') == {'name': 'example', 'port': 5433}
+        assert config.get('hosts') == ['a', 'b', 'c']
+        assert config.get('tenants.tenant-3.users') == 3
+        assert config.keys('db') == ['db.name', 'db.port']
+
+    @staticmethod
+    def test_frozen_layers():
+        """ Test that the layers are frozen and resolved """
+        config = Config(layered=True)
+        config.set(None, tree)
+
+        with config.layer('overrides'):
+            config.set('db.port', 5433)
+            config.set('hosts', ['c'])
+
+        config.freeze()
+
+        assert config.get('db') == {'name': 'example', 'port': 5433}
+        assert config.get('hosts') == ['a', 'b', 'c']
+        assert config.source('db.port') == 'overrides'
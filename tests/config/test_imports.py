@@ -0,0 +1,44 @@
+"""
+Test importing the configuration on demand
+"""
+import subprocess
+import sys
+
+class TestImports():
+    """ Test imports """
+    @staticmethod
+    def test_optional_dependencies_are_not_imported():
+        """ Test that importing config does not import the SDKs, the YAML parser or asyncio """
+        code = '\n'.join([
+            'import sys',
+            'import config',
+            'modules = ("boto3", "botocore", "azure", "yaml", "cryptography", "asyncio")',
+            'print(",".join(name for name in modules if name in sys.modules))'
+        ])
+        output = subprocess.check_output([sys.executable, '-c', code], text=True)
+        assert output.strip() == ''
+
+    @staticmethod
+    def test_interface_does_not_import_asyncio():
+        """ Test that importing the external interface does not import asyncio """
+        code = '\n'.join([
+            'import sys',
+            'import config.external.interface',
+            'print("asyncio" in sys.modules)'
+        ])
+        output = subprocess.check_output([sys.executable, '-c', code], text=True)
+        assert output.strip() == 'False'
+
+    @staticmethod
+    def test_enabled_providers_are_imported(monkeypatch):
+        """ Test that the provider of an enabled secret source is imported """
+        import config
+        monkeypatch.delenv('AWS_SECRETSMANAGER_ENABLED', raising=False)
+        monkeypatch.delenv('AZURE_KEYVAULT_ENABLED', raising=False)
+        from config.external.aws import SecretsManager
+
+        conf = config.Config()
+        assert conf._enabled_interfaces() == []
+
+        conf.set('aws.secretsmanager.enabled', True)
+        assert conf._enabled_interfaces() == [SecretsManager]
@@ -0,0 +1,124 @@
+"""
+Test flattened key index
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import random
+from config import Config
+from config.index import KeyIndex, flatten
+from config.layers import assign
+
+tree = {
+    'features': {
+        'search': True,
+        'chat': {'enabled': False, 'limit': 5}
+    },
+    'features_old': 1,
+    'feature': 'x',
+    'db': {'port': 5432, 'hosts': ['a', 'b']}
+}
+
+class TestIndex():
+    """ Test flattened key index """
+    @staticmethod
+    def test_flatten_lists_the_leaves():
+        """ Test that flatten lists the values other than dictionaries """
+        assert sorted(flatten(tree)) == [
+            ('db.hosts', ['a', 'b']),
+            ('db.port', 5432),
+            ('feature', 'x'),
+            ('features.chat.enabled', False),
+            ('features.chat.limit', 5),
+            ('features.search', True),
+            ('features_old', 1)
+        ]
+
+    @staticmethod
+    def test_keys_are_listed_by_prefix():
+        """ Test that only the keys under the prefix are listed """
+        index = KeyIndex.build(tree)
+
+        assert len(index) == 7
+        assert index.keys('features') == [
+            'features.chat.enabled',
+            'features.chat.limit',
+            'features.search'
+        ]
+        assert index.keys('features.chat.limit') == ['features.chat.limit']
+        assert index.keys('feature') == ['feature']
+        assert index.keys('missing') == []
+        assert index.items('db') == [('db.hosts', ['a', 'b']), ('db.port', 5432)]
+
+    @staticmethod
+    def test_assign_matches_rebuilding():
+        """ Test that the assigned index matches the index built from the assigned tree """
+        random_state = random.Random(1)
+        current = tree
+        index = KeyIndex.build(current)
+        names = ['a', 'b', 'features', 'chat', 'db', 'port']
+        values = [1, 'x', None, [1], {}, {'a': 1, 'b': {'c': 2}}, {'chat': {'limit': 1}}]
+
+        for _i in range(500):
+            keys = tuple(random_state.choice(names) for _j in range(random_state.randint(1, 3)))
+            value = random_state.choice(values)
+
+            current = assign(current, keys, value)
+            index = index.assign(current, keys)
+
+            assert index.items() == KeyIndex.build(current).items()
+            assert index.items(keys[0]) == sorted(flatten(current.get(keys[0]), keys[0]))
+
+    @staticmethod
+    def test_config_lists_keys_and_items():
+        """ Test that config lists the keys and the items under the prefix """
+        config = Config()
+        config.set(None, tree)
+
+        assert config.keys('features.chat') == ['features.chat.enabled', 'features.chat.limit']
+        assert config.items(['db', 'port']) == [('db.port', 5432)]
+
+    @staticmethod
+    def test_set_updates_the_built_index():
+        """ Test that setting a path updates the index instead of rebuilding it """
+        config = Config()
+        config.set(None, tree)
+        snapshot = config.snapshot()
+
+        assert config.keys('db') == ['db.hosts', 'db.port']
+
+        config.set('db.name', 'example')
+        assert config.snapshot().key_index(build=False) is not None
+        assert config.keys('db') == ['db.hosts', 'db.name', 'db.port']
+
+        # The earlier snapshot keeps its index
+        assert snapshot.keys('db') == ['db.hosts', 'db.port']
+
+        config.set(None, {'db': {'user': 'example'}})
+        assert config.snapshot().key_index(build=False) is None
+        assert config.keys('db') == ['db.hosts', 'db.name', 'db.port', 'db.user']
+
+    @staticmethod
+    def test_set_shares_the_unchanged_buckets():
+        """ Test that setting a path rebuilds only the leaves under its top level key """
+        index = KeyIndex.build(tree)
+        features = index.items('features')
+        db = index.items('db')
+
+        assigned = index.assign(assign(tree, ('db', 'name'), 'example'), ('db', 'name'))
+
+        assert assigned.items('features') == features
+        assert assigned._bucket('features') is index._bucket('features')
+        assert assigned.items('db') == db[:1] + [('db.name', 'example')] + db[1:]
+        assert index.items('db') == db
+
+    @staticmethod
+    def test_layered_config_lists_merged_keys():
+        """ Test that the keys of all the layers are listed """
+        config = Config(layered=True)
+        config.set(None, tree)
+
+        with config.layer('overrides'):
+            config.set('db.name', 'example')
+
+        assert config.keys('db') == ['db.hosts', 'db.name', 'db.port']
+        assert config.items('db.name') == [('db.name', 'example')]
@@ -0,0 +1,110 @@
+"""
+Test the instrumentation of the configuration
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import logging
+from config import Config
+from config.instrumentation import Instrumentation, InstrumentedSnapshot, logging_hook
+from config.snapshot import Snapshot
+
+def get_config(instrumentation: Instrumentation = None) -> Config:
+    """ Get an instrumented configuration """
+    config = Config()
+    config.set('db', {'host': 'localhost', 'port': 5432})
+    return config.use_instrumentation(instrumentation)
+
+class TestInstrumentation():
+    """ Test the instrumentation of the configuration """
+    @staticmethod
+    def test_disabled_by_default():
+        """ Test that the snapshots are not instrumented by default """
+        config = Config()
+        assert type(config.snapshot()) is Snapshot # pylint: disable=unidiomatic-typecheck
+        assert config.stats() == {}
+
+        config.use_instrumentation()
+        assert isinstance(config.snapshot(), InstrumentedSnapshot)
+
+        config.use_instrumentation(enabled=False)
+        assert type(config.snapshot()) is Snapshot # pylint: disable=unidiomatic-typecheck
+
+    @staticmethod
+    def test_lookup_counters(monkeypatch):
+        """ Test the hit, miss, environment override and default counters """
+        monkeypatch.setenv('DB_NAME', 'override')
+        config = get_config()
+
+        assert config.get('db.host') == 'localhost'
+        assert config.get('db.host') == 'localhost'
+        assert config.get('db.port') == 5432
+        assert config.get('db.name') == 'override'
+        assert config.get('db.missing', default=1) == 1
+
+        assert config.stats()['get'] == {
+            'hits': 1,
+            'misses': 3,
+            'env_overrides': 1,
+            'defaults': 1
+        }
+
+    @staticmethod
+    def test_hot_keys():
+        """ Test that the most read keys are listed by the read count """
+        config = get_config(Instrumentation(max_keys=2))
+
+        for _i in range(3):
+            config.get('db.port')
+
+        config.get('db.host')
+        config.get(['db', 'host'])
+        config.get('db.missing')
+
+        assert config.stats(top=5)['hot_keys'] == [('db.port', 3), ('db.host', 2)]
+
+    @staticmethod
+    def test_load_configuration_is_measured(tmp_path):
+        """ Test that the configuration files are measured as sources """
+        file_path = tmp_path / 'config.yml'
+        file_path.write_text('db:\n  name: example\n')
+
+        config = get_config()
+        config.load_configuration(str(file_path))
+        config.load_configuration(str(file_path))
+
+        load = config.stats()['loads'][str(file_path)]
+        assert load['count'] == 2
+        assert load['calls'] == 0
+        assert load['duration'] >= load['last_duration'] > 0
+
+    @staticmethod
+    def test_hooks_receive_the_metrics(caplog):
+        """ Test that the hooks receive the load metrics and the flushed counters """
+        metrics = []
+
+        def failing(_name, _value, _tags):
+            """ Failing hook """
+            raise RuntimeError('Hook failed')
+
+        instrumentation = Instrumentation(hooks=[failing])
+        instrumentation.add_hook(lambda name, value, tags: metrics.append((name, value, tags)))
+
+        with instrumentation.measure('source') as measurement:
+            measurement.calls = 3
+
+        instrumentation.remove_hook(failing)
+        instrumentation.hits = 5
+        instrumentation.flush()
+
+        assert metrics[0][0] == 'config.load.duration'
+        assert metrics[0][2] == {'source': 'source'}
+        assert metrics[1] == ('config.load.calls', 3, {'source': 'source'})
+        assert ('config.get.hits', 5, {}) in metrics
+        assert 'Configuration instrumentation hook failed' in caplog.text
+
+    @staticmethod
+    def test_logging_hook(caplog):
+        """ Test that the logging hook logs the metrics """
+        caplog.set_level(logging.INFO, logger='config.instrumentation')
+        Instrumentation(hooks=[logging_hook()]).record_load('source', 0.5, calls=2)
+        assert 'config.load.calls=2' in caplog.text
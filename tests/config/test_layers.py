@@ -0,0 +1,160 @@
+"""
+Test layered configuration store
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import os
+from config import Config
+from config.layers import Layers, MISSING, assign
+from config.merge import merge
+
+current_path = os.path.dirname(os.path.realpath(__file__))
+main_configuration_path = os.path.join(current_path, 'files', 'main.yml')
+extended_configuration_path = os.path.join(current_path, 'files', 'extended.yml')
+
+defaults = {
+    'db': {
+        'name': 'example',
+        'port': 5432
+    },
+    'hosts': ['foo', 'bar'],
+    'shadowed': {
+        'path': 'value'
+    }
+}
+
+overrides = {
+    'db': {
+        'port': 5433,
+        'password': 'secret'
+    },
+    'hosts': ['bar', 'far'],
+    'shadowed': 'value'
+}
+
+class TestLayers():
+    """ Test layered configuration store """
+    @staticmethod
+    def get_layers() -> Layers:
+        """ Get layers with the defaults and the overrides """
+        layers = Layers()
+        layers.set_layer('defaults', defaults)
+        layers.set_layer('overrides', overrides)
+        return layers
+
+    @staticmethod
+    def test_resolve_equals_merged_layers():
+        """ Test that the resolved values equal to merging the layers """
+        layers = TestLayers.get_layers()
+        merged = merge(defaults, overrides)
+        assert layers.resolve(()) == merged
+        assert layers.resolve(('db',)) == merged['db']
+        assert layers.resolve(('db', 'name')) == 'example'
+        assert layers.resolve(('db', 'port')) == 5433
+        assert layers.resolve(('hosts',)) == ['foo', 'bar', 'far']
+
+    @staticmethod
+    def test_resolve_returns_missing_for_shadowed_paths():
+        """ Test that a value in the upper layer shadows the lower layer paths """
+        layers = TestLayers.get_layers()
+        assert layers.resolve(('shadowed', 'path')) is MISSING
+        assert layers.resolve(('imaginary',)) is MISSING
+
+    @staticmethod
+    def test_source_returns_the_highest_priority_layer():
+        """ Test that source returns the layer name the value comes from """
+        layers = TestLayers.get_layers()
+        assert layers.source(('db', 'name')) == 'defaults'
+        assert layers.source(('db', 'password')) == 'overrides'
+        assert layers.source(('imaginary',)) is None
+
+    @staticmethod
+    def test_set_layer_keeps_the_layer_position():
+        """ Test that replacing a layer keeps its priority """
+        layers = TestLayers.get_layers()
+        assert layers.resolve(('db', 'port')) == 5433
+        layers.set_layer('defaults', {'db': {'port': 1}})
+        assert layers.names() == ['defaults', 'overrides']
+        assert layers.resolve(('db', 'port')) == 5433
+        assert layers.resolve(('db', 'name')) is MISSING
+        layers.remove_layer('overrides')
+        assert layers.resolve(('db', 'port')) == 1
+
+    @staticmethod
+    def test_assign_copies_only_the_path():
+        """ Test that assign copies the nodes along the path """
+        tree = {'foo': {'bar': 1}, 'far': {'boo': 2}}
+        assigned = assign(tree, ('foo', 'bar'), 3)
+        assert assigned['foo']['bar'] == 3
+        assert tree['foo']['bar'] == 1
+        assert assigned['far'] is tree['far']
+
+    @staticmethod
+    def test_config_resolves_layers():
+        """ Test that the layered configuration stores the files as layers """
+        config = Config(layered=True)
+        config.load_configuration(main_configuration_path)
+        config.load_configuration(extended_configuration_path)
+        config.set('test.nested.default', True)
+
+        assert config.get('test.nested.path.value') == 'overriding test value'
+        assert config.get('test.shallow') == 123
+        assert config.get('test.nested.default') is True
+        assert config.layers() == [
+            main_configuration_path,
+            extended_configuration_path,
+            Config.DEFAULT_LAYER
+        ]
+        assert config.source('test.nested.path.value') == extended_configuration_path
+        assert config.source('test.shallow') == main_configuration_path
+
+    @staticmethod
+    def test_config_replaces_the_layer():
+        """ Test that a replaced layer does not keep the previous values """
+        config = Config(layered=True)
+        config.set('db.password', 'default')
+
+        with config.layer('secrets'):
+            config.set('db.password', 'secret')
+            config.set(value={'db': {'username': 'user'}})
+
+        assert config.get('db.password') == 'secret'
+        assert config.source('db.password') == 'secrets'
+
+        changes = []
+        config.subscribe(lambda key, old, new: changes.append((key, old, new)), 'db')
+
+        with config.layer('secrets', replace=True):
+            config.set('db.username', 'rotated')
+            assert config.get('db.username') == 'user'
+
+        assert changes == [(
+            'db',
+            {'password': 'secret', 'username': 'user'},
+            {'password': 'default', 'username': 'rotated'}
+        )]
+        assert config.get('db.password') == 'default'
+        assert config.get('db') == {'password': 'default', 'username': 'rotated'}
+
+    @staticmethod
+    def test_latest_set_value_wins():
+        """ Test that a value set after another layer is not shadowed by it """
+        config = Config(layered=True)
+        config.set('a', 1)
+
+        with config.layer('secrets'):
+            config.set('a', 2)
+
+        config.set('a', 3)
+        config.set('b', 4)
+
+        assert config.get('a') == 3
+        assert config.source('a') == 'default.2'
+        assert config.layers() == ['default', 'secrets', 'default.2']
+
+        # Reloading a layer keeps its position under the later values
+        with config.layer('secrets', replace=True):
+            config.set('a', 5)
+
+        assert config.get('a') == 3
+        assert config.layers() == ['default', 'secrets', 'default.2']
@@ -0,0 +1,63 @@
+"""
+Test YAML configuration file loader
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import os
+import tempfile
+import pytest
+import yaml
+from config import Config
+from config.loader import get_loader, load_yaml, parse_yaml
+
+current_path = os.path.dirname(os.path.realpath(__file__))
+main_configuration_path = os.path.join(current_path, 'files', 'main.yml')
+
+class TestLoader():
+    """ Test loader """
+    @staticmethod
+    def test_loader_is_safe():
+        """ Test that the loader does not construct arbitrary Python objects """
+        assert issubclass(get_loader(), (yaml.SafeLoader, getattr(yaml, 'CSafeLoader', ())))
+
+        with pytest.raises(yaml.YAMLError):
+            parse_yaml('!!python/object/apply:os.getcwd []')
+
+    @staticmethod
+    def test_load_yaml():
+        """ Test that load_yaml parses the file """
+        assert load_yaml(main_configuration_path)['test']['nested']['path']['value'] \
+            == 'test value'
+
+    @staticmethod
+    def test_load_yaml_uses_the_cache(monkeypatch):
+        """ Test that the cached file is not parsed again """
+        with tempfile.TemporaryDirectory() as cache_path:
+            values = load_yaml(main_configuration_path, cache_path=cache_path)
+            assert len(os.listdir(cache_path)) == 1
+
+            monkeypatch.setitem(load_yaml.__globals__, 'parse_yaml', None)
+            assert load_yaml(main_configuration_path, cache_path=cache_path) == values
+
+    @staticmethod
+    def test_load_yaml_parses_changed_files():
+        """ Test that a changed file is parsed again """
+        with tempfile.TemporaryDirectory() as path:
+            file_path = os.path.join(path, 'cached.yml')
+
+            for value in ('first', 'second'):
+                with open(file_path, 'w') as configuration_file:
+                    configuration_file.write(f'cached: {value}\n')
+
+                # Keep the modification time and size, the content hash differs
+                os.utime(file_path, (1000, 1000))
+                assert load_yaml(file_path, cache_path=path) == {'cached': value}
+
+    @staticmethod
+    def test_load_configuration_with_cache():
+        """ Test that the configuration can be loaded with the cache """
+        with tempfile.TemporaryDirectory() as cache_path:
+            for _i in range(2):
+                config = Config()
+                config.load_configuration(main_configuration_path, cache_path=cache_path)
+                assert config.get('test.nested.path.value') == 'test value'
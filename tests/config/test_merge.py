@@ -3,7 +3,7 @@ Test merge function
 
 @author Arttu Manninen <arttu@kaktus.cc>
 """
-from config.merge import merge
+from config.merge import merge, union
 import numpy
 
 class TestMerge():
@@ -106,3 +106,78 @@ class TestMerge():
         assert numpy.array_equal(
             merged['list'], ['foo', 'bar', 'far']
         )
+
+    @staticmethod
+    def test_merge_scraps_duplicates_in_lists_with_unhashable_values():
+        """ Test merging lists with dictionaries and lists as values """
+        dict_1 = {
+            'list': [{'foo': 'bar'}, ['foo'], 'foo']
+        }
+        dict_2 = {
+            'list': [['foo'], {'foo': 'bar'}, {'bar': 'foo'}, 'foo', 'bar']
+        }
+        merged = merge(dict_1, dict_2)
+        assert merged['list'] == [{'foo': 'bar'}, ['foo'], 'foo', {'bar': 'foo'}, 'bar']
+
+    @staticmethod
+    def test_merge_keeps_duplicates_of_the_merged_list():
+        """ Test that only the values present in the target list are scrapped """
+        merged = merge({'list': ['foo']}, {'list': ['bar', 'bar', 'foo']})
+        assert merged['list'] == ['foo', 'bar', 'bar']
+
+    @staticmethod
+    def test_merge_compares_hashable_values_with_unhashable_values():
+        """ Test that equal values are scrapped regardless of hashability """
+        merged = merge({'list': [{1, 2}, 1]}, {'list': [frozenset((1, 2)), 1.0, True, 2]})
+        assert merged['list'] == [{1, 2}, 1, 2]
+
+    @staticmethod
+    def test_union_returns_the_missing_values():
+        """ Test that union returns the values missing from the target in order """
+        assert union(['foo', 'bar'], ['far', 'bar', 'boo']) == ['far', 'boo']
+
+    @staticmethod
+    def test_merge_shares_unchanged_subtrees():
+        """ Test that merge copies only the modified paths """
+        dict_1 = {
+            'modified': {'nested': {'value': 1}},
+            'unchanged': {'nested': {'value': 1}}
+        }
+        merged = merge(dict_1, {'modified': {'nested': {'value': 2}}})
+        assert merged is not dict_1
+        assert merged['unchanged'] is dict_1['unchanged']
+        assert merged['modified'] is not dict_1['modified']
+        assert merged['modified']['nested'] == {'value': 2}
+        assert dict_1['modified']['nested'] == {'value': 1}
+
+    @staticmethod
+    def test_merge_shares_subtrees_merged_without_changes():
+        """ Test that a subtree merged with identical values is not copied """
+        dict_1 = {'deep': {'nested': {'value': 1, 'list': ['foo']}}}
+        merged = merge(dict_1, {'deep': {'nested': {'value': 1, 'list': ['foo']}}})
+        assert merged['deep'] is dict_1['deep']
+
+    @staticmethod
+    def test_merge_does_not_share_the_merged_dicts():
+        """ Test that the dictionaries of the merged objects are copied """
+        dict_2 = {'deep': {'nested': {'value': 1}}}
+        merged = merge({}, dict_2)
+        assert merged['deep'] is not dict_2['deep']
+        assert merged['deep']['nested'] is not dict_2['deep']['nested']
+
+    @staticmethod
+    def test_merge_replaces_a_value_with_a_dict():
+        """ Test that a dictionary replaces a value that is not a dictionary """
+        merged = merge({'foo': None, 'bar': 'bar'}, {'foo': {'bar': 1}, 'bar': {'foo': 1}})
+        assert merged == {'foo': {'bar': 1}, 'bar': {'foo': 1}}
+
+    @staticmethod
+    def test_merge_in_place():
+        """ Test that merging in place modifies the target """
+        nested = {'value': 1}
+        dict_1 = {'deep': {'nested': nested}}
+        merged = merge(dict_1, {'deep': {'nested': {'value': 2}}}, {'foo': 'bar'}, in_place=True)
+        assert merged is dict_1
+        assert merged['deep']['nested'] is nested
+        assert nested['value'] == 2
+        assert dict_1['foo'] == 'bar'
@@ -0,0 +1,143 @@
+"""
+Test background reloading and change subscriptions
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import os
+import tempfile
+import time
+import pytest
+from config import Config
+from config.reloader import Reloader
+
+def write_configuration(file_path: str, content: str, mtime: int):
+    """ Write the configuration file with the given modification time """
+    with open(file_path, 'w') as configuration_file:
+        configuration_file.write(content)
+
+    os.utime(file_path, (mtime, mtime))
+
+class TestReloader():
+    """ Test reloader """
+    @staticmethod
+    def test_subscriber_is_called_only_for_changed_values():
+        """ Test that the subscribers are called when their value changes """
+        config = Config()
+        config.set('db', {'password': 'original', 'name': 'example'})
+        calls = []
+        config.subscribe(lambda *args: calls.append(args), 'db.password')
+
+        config.set('db.name', 'changed')
+        config.set('db.password', 'original')
+        assert calls == []
+
+        config.set('db.password', 'rotated')
+        config.set(value={'db': {'password': 'merged'}})
+        assert calls == [
+            ('db.password', 'original', 'rotated'),
+            ('db.password', 'rotated', 'merged')
+        ]
+
+    @staticmethod
+    def test_unsubscribe():
+        """ Test that unsubscribed callbacks are not called """
+        config = Config()
+        calls = []
+
+        def callback(*args):
+            """ Record the call """
+            calls.append(args)
+
+        config.subscribe(callback, 'foo')
+        config.unsubscribe(callback)
+        config.set('foo', 'bar')
+        assert calls == []
+
+    @staticmethod
+    def test_set_does_not_modify_the_previous_tree():
+        """ Test that set publishes a new configuration tree """
+        config = Config()
+        config.set('deep.key', 'original')
+        previous = config.get('deep')
+        config.set('deep.key', 'changed')
+        assert previous == {'key': 'original'}
+        assert config.get('deep.key') == 'changed'
+
+    @staticmethod
+    def test_reload_loads_changed_files():
+        """ Test that the changed configuration files are loaded again """
+        with tempfile.TemporaryDirectory() as path:
+            file_path = os.path.join(path, 'reloaded.yml')
+            write_configuration(file_path, 'reloaded:\n  value: 1\n', 1000)
+
+            config = Config(layered=True)
+            config.load_configuration(file_path)
+            calls = []
+            config.subscribe(lambda *args: calls.append(args), 'reloaded.value')
+
+            reloader = Reloader(config, secrets=False)
+            reloader.reload()
+            assert calls == []
+            assert config.changed_files() == []
+
+            write_configuration(file_path, 'reloaded:\n  value: 2\n', 2000)
+            assert config.changed_files() == [file_path]
+            reloader.reload()
+
+            assert config.get('reloaded.value') == 2
+            assert calls == [('reloaded.value', 1, 2)]
+            assert config.changed_files() == []
+
+    @staticmethod
+    def test_reload_keeps_the_source_order():
+        """ Test that a reloaded file keeps its priority and drops the removed keys """
+        with tempfile.TemporaryDirectory() as path:
+            defaults_path = os.path.join(path, 'defaults.yml')
+            local_path = os.path.join(path, 'local.yml')
+            write_configuration(defaults_path, 'db:\n  host: default\n  name: example\n', 1000)
+            write_configuration(local_path, 'db:\n  host: local\n', 1000)
+
+            config = Config(layered=True)
+            config.load_configuration(defaults_path)
+            config.load_configuration(local_path)
+
+            write_configuration(defaults_path, 'db:\n  host: changed\n', 2000)
+            Reloader(config, secrets=False).reload()
+
+            assert config.get('db') == {'host': 'local'}
+            assert config.source('db.host') == local_path
+
+    @staticmethod
+    def test_files_are_reloaded_only_when_layered():
+        """ Test that the files of a merged configuration are not reloaded """
+        config = Config()
+        assert not Reloader(config).files
+        assert Reloader(Config(layered=True)).files
+
+        with pytest.raises(ValueError):
+            Reloader(config, files=True)
+
+    @staticmethod
+    def test_start_and_stop_reloader():
+        """ Test that the background reloader runs until stopped """
+        with tempfile.TemporaryDirectory() as path:
+            file_path = os.path.join(path, 'background.yml')
+            write_configuration(file_path, 'background: 1\n', 1000)
+
+            config = Config(layered=True)
+            config.load_configuration(file_path)
+            reloader = config.start_reloader(interval=0.01)
+
+            try:
+                write_configuration(file_path, 'background: 2\n', 2000)
+
+                for _i in range(500):
+                    if config.get('background') == 2:
+                        break
+                    time.sleep(0.01)
+
+                assert config.get('background') == 2
+            finally:
+                config.stop_reloader()
+
+            assert not reloader.is_alive()
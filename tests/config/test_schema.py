@@ -0,0 +1,272 @@
+"""
+Test configuration schema
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import os
+import tempfile
+from datetime import timedelta
+import pytest
+from config import Config
+from config.external import registry as registry_module
+from config.external.interface import ExternalInterface
+from config.schema import Field, Schema, SchemaError, to_bool, to_duration
+
+schema = Schema({
+    'server.port': Field(int, default=8080),
+    'server.timeout': Field('duration', default='30s'),
+    'server.debug': bool,
+    'db.url': 'url',
+    'hosts': list,
+    'upper': Field(str, converter=lambda value: str(value).upper())
+})
+
+class StaticInterface(ExternalInterface):
+    """ External interface with the secrets of the class """
+    NAME = 'static'
+    SECRETS = []
+
+    def fetch(self) -> list:
+        """ Fetch the secrets """
+        return StaticInterface.SECRETS
+
+@pytest.fixture(name='provider')
+def fixture_provider(monkeypatch):
+    """ Register the static provider to the default registry """
+    monkeypatch.setattr(registry_module.registry, '_providers', {})
+    monkeypatch.setattr(registry_module.registry, '_discover', False)
+    monkeypatch.setattr(StaticInterface, 'SECRETS', [])
+    registry_module.registry.register('static', StaticInterface)
+    return StaticInterface
+
+class TestSchema():
+    """ Test configuration schema """
+    @staticmethod
+    def test_converters():
+        """ Test the bundled converters """
+        assert to_bool('Yes') is True
+        assert to_bool('off') is False
+        assert to_duration('1h30m') == timedelta(minutes=90)
+        assert to_duration('500ms') == timedelta(milliseconds=500)
+        assert to_duration(90) == timedelta(seconds=90)
+        assert to_duration('30') == timedelta(seconds=30)
+        assert to_duration(' 1.5 ') == timedelta(seconds=1.5)
+
+        with pytest.raises(ValueError):
+            to_bool('maybe')
+
+        with pytest.raises(ValueError):
+            to_duration('10 parsecs')
+
+    @staticmethod
+    def test_values_are_converted_with_the_schema():
+        """ Test that the values and the defaults are converted """
+        config = Config()
+        config.set('server.port', '9000')
+        config.set('db.url', 'postgresql://localhost/example')
+        config.set('hosts', 'a, b')
+        config.set('upper', 'value')
+        config.use_schema(schema)
+
+        assert config.get_typed('server.port') == 9000
+        assert config.get_typed('server.timeout') == timedelta(seconds=30)
+        assert config.get_typed('server.debug') is None
+        assert config.get_typed('db.url').hostname == 'localhost'
+        assert config.get_typed('hosts') == ['a', 'b']
+        assert config.get_typed('upper') == 'VALUE'
+
+        with pytest.raises(KeyError):
+            config.get_typed('unknown')
+
+    @staticmethod
+    def test_environment_overrides_are_converted(monkeypatch):
+        """ Test that the environment variable overrides are converted """
+        monkeypatch.setenv('SERVER_TIMEOUT', '2m')
+
+        config = Config()
+        config.use_schema(schema)
+
+        assert config.get_typed('server.timeout') == timedelta(minutes=2)
+
+        monkeypatch.setenv('SERVER_TIMEOUT', '30')
+        assert config.get_duration('server.timeout') == timedelta(seconds=30)
+
+    @staticmethod
+    @pytest.mark.parametrize('environment_index', [False, True])
+    def test_environment_overrides_are_not_memoized(monkeypatch, environment_index):
+        """ Test that a changed environment override is converted again """
+        config = Config()
+        config.set('port', 1)
+        config.use_schema(Schema({'port': int}))
+
+        if environment_index:
+            config.use_environment_index(auto_refresh=True)
+
+        assert config.get_typed('port') == 1
+
+        monkeypatch.setenv('PORT', '5')
+        assert config.get('port') == '5'
+        assert config.get_typed('port') == 5
+        assert config.get_int('port') == 5
+
+        monkeypatch.delenv('PORT')
+        assert config.get_typed('port') == 1
+        config.use_environment_index(enabled=False)
+
+    @staticmethod
+    def test_converted_values_are_memoized():
+        """ Test that the value is converted once per snapshot """
+        calls = []
+
+        def converter(value):
+            calls.append(value)
+            return int(value)
+
+        config = Config()
+        config.set('counted', '1')
+        config.use_schema(Schema({'counted': Field(int, converter=converter)}))
+
+        for _i in range(10):
+            assert config.get_typed('counted') == 1
+
+        assert calls == ['1']
+
+        config.set('counted', '2')
+        assert config.get_typed('counted') == 2
+        assert calls == ['1', '2']
+
+    @staticmethod
+    def test_invalid_values_raise_when_loaded():
+        """ Test that the invalid values raise when the configuration is loaded """
+        config = Config()
+        config.use_schema(schema)
+
+        with tempfile.TemporaryDirectory() as path:
+            file_path = os.path.join(path, 'config.yml')
+
+            with open(file_path, 'w') as config_file:
+                config_file.write('server:\n  port: http\n')
+
+            with pytest.raises(SchemaError) as error:
+                config.load_configuration(file_path)
+
+        assert list(error.value.errors) == ['server.port']
+
+    @staticmethod
+    @pytest.mark.parametrize('options', [{}, {'in_place_merge': True}, {'layered': True}])
+    def test_failed_load_keeps_the_previous_configuration(options):
+        """ Test that an invalid configuration file is not published """
+        config = Config(**options)
+        config.set('server.port', 8000)
+        config.use_schema(schema)
+        snapshot = config.snapshot()
+
+        with tempfile.TemporaryDirectory() as path:
+            file_path = os.path.join(path, 'config.yml')
+
+            with open(file_path, 'w') as config_file:
+                config_file.write('server:\n  port: http\n  debug: true\n')
+
+            with pytest.raises(SchemaError):
+                config.load_configuration(file_path)
+
+        assert config.snapshot() is snapshot
+        assert config.get('server') == {'port': 8000}
+        assert config.changed_files() == []
+        assert config.layers() == (['default'] if options.get('layered') else [])
+
+    @staticmethod
+    @pytest.mark.parametrize('options', [{}, {'in_place_merge': True}, {'layered': True}])
+    def test_invalid_set_keeps_the_previous_configuration(options):
+        """ Test that invalid values set to the configuration are not published """
+        config = Config(**options)
+        config.set('server.port', 8000)
+        config.use_schema(schema)
+        snapshot = config.snapshot()
+
+        with pytest.raises(SchemaError):
+            config.set('server.port', 'http')
+
+        with pytest.raises(SchemaError):
+            config.set_many({'server.debug': True, 'server.port': 'http'})
+
+        with pytest.raises(SchemaError):
+            config.set(None, {'server': {'port': 'http'}})
+
+        assert config.snapshot() is snapshot
+        assert config.get('server') == {'port': 8000}
+
+    @staticmethod
+    @pytest.mark.parametrize('options', [{}, {'in_place_merge': True}, {'layered': True}])
+    def test_invalid_secrets_keep_the_previous_configuration(provider, options):
+        """ Test that invalid loaded or refreshed secrets are not published """
+        calls = []
+
+        config = Config(**options)
+        config.set('static.enabled', True)
+        config.set('server.port', 8000)
+        config.use_schema(Schema({'server.port': int}))
+        config.subscribe(lambda *args: calls.append(args), 'server.port')
+
+        provider.SECRETS = [('server.port', 'not-a-port')]
+        snapshot = config.snapshot()
+
+        with pytest.raises(SchemaError):
+            config.load_secrets()
+
+        with pytest.raises(SchemaError):
+            config.refresh_secrets()
+
+        assert config.snapshot() is snapshot
+        assert config.get('server.port') == 8000
+        assert calls == []
+
+        provider.SECRETS = [('server.port', '9000')]
+        config.refresh_secrets()
+        assert config.get_typed('server.port') == 9000
+        assert calls == [('server.port', 8000, 9000)]
+
+    @staticmethod
+    def test_invalid_schema_is_not_used():
+        """ Test that a schema the configuration does not conform to is not used """
+        config = Config()
+        config.set('server.port', 'http')
+
+        with pytest.raises(SchemaError):
+            config.use_schema(schema)
+
+        assert config.validate() is config
+        assert config.get('server.port') == 'http'
+
+    @staticmethod
+    def test_typed_accessors():
+        """ Test the typed accessors without a schema """
+        config = Config()
+        config.set('server', {'port': '8080', 'debug': 'true', 'timeout': '1m'})
+
+        assert config.get_int('server.port') == 8080
+        assert config.get_float('server.port') == 8080.0
+        assert config.get_str('server.port') == '8080'
+        assert config.get_bool('server.debug') is True
+        assert config.get_duration('server.timeout') == timedelta(minutes=1)
+        assert config.get_int('server.missing', default=1) == 1
+        assert config.get_url('server.url') is None
+
+    @staticmethod
+    def test_bound_values_follow_the_configuration():
+        """ Test that a bound value gives the current converted value """
+        config = Config()
+        config.use_schema(schema)
+        port = config.bind('server.port')
+        debug = config.bind('server.debug', Field(bool, default=False))
+
+        assert port.value == 8080
+        assert debug() is False
+
+        config.set('server', {'port': '9000', 'debug': 'on'})
+
+        assert port.value == 9000
+        assert debug() is True
+
+        with pytest.raises(KeyError):
+            config.bind('unknown')
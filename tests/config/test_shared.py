@@ -0,0 +1,175 @@
+"""
+Test configuration shared by the worker processes
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import multiprocessing
+import os
+import sys
+import pytest
+from config import Config
+from config.frozen import freeze
+from config.reloader import Reloader
+from config.shared import SharedDict, SharedSegment
+
+tree = {
+    'db': {'name': 'example', 'port': 5432, 'hosts': ['a', 'b']},
+    'tenants': {f'tenant-{i}': {'users': i} for i in range(100)},
+    'numbers': {1: 'one', 2: 'two'},
+    'empty': {}
+}
+
+def get_parent(path: str) -> Config:
+    """ Get a configuration that shares the tree """
+    parent = Config()
+    parent.set(None, tree)
+    parent.share(path)
+    return parent
+
+def read_in_worker(path: str, connection):
+    """ Attach in the worker process and send the values back """
+    worker = Config()
+    worker.attach(path)
+    connection.send((worker.get('db.port'), worker.get('tenants.tenant-42.users')))
+    connection.close()
+
+class TestShared():
+    """ Test configuration shared by the worker processes """
+    @staticmethod
+    def test_published_tree_equals_the_tree(tmp_path):
+        """ Test that the attached tree equals the published tree """
+        segment = SharedSegment(str(tmp_path / 'config'))
+        assert segment.publish(freeze(tree)) == 1
+
+        root = SharedSegment(segment.path).attach()
+
+        assert isinstance(root, SharedDict)
+        assert isinstance(root['tenants'], SharedDict)
+        assert root == tree
+        assert list(root) == list(tree)
+        assert root['numbers'][2] == 'two'
+        assert 'db' in root and 'missing' not in root and [] not in root
+        assert root.get('missing') is None
+
+    @staticmethod
+    def test_worker_attaches_to_the_published_configuration(tmp_path):
+        """ Test that a worker reads the published values """
+        path = str(tmp_path / 'config')
+        get_parent(path)
+
+        worker = Config()
+        worker.attach(path)
+
+        assert worker.get('db.hosts') == ['a', 'b']
+        assert worker.get('tenants.tenant-7.users') == 7
+        assert worker.keys('db') == ['db.hosts', 'db.name', 'db.port']
+
+    @staticmethod
+    def test_worker_attaches_to_a_new_generation(tmp_path):
+        """ Test that the worker attaches to the new version when the generation changes """
+        path = str(tmp_path / 'config')
+        parent = get_parent(path)
+        worker = Config()
+        worker.attach(path)
+        snapshot = worker.snapshot()
+
+        worker.sync_shared()
+        assert worker.snapshot() is snapshot
+
+        parent.set('db.port', 5433)
+        parent.sync_shared()
+
+        worker.sync_shared()
+        assert worker.get('db.port') == 5433
+        assert snapshot.get('db.port') == 5432
+
+    @staticmethod
+    def test_unchanged_configuration_is_not_published(tmp_path):
+        """ Test that the parent publishes a new generation only when the configuration changes """
+        path = str(tmp_path / 'config')
+        parent = get_parent(path)
+        segment = SharedSegment(path)
+        assert segment.current_generation() == 1
+
+        parent.sync_shared()
+        Reloader(parent, secrets=False).reload()
+        assert segment.current_generation() == 1
+
+        parent.set('db.port', 5433)
+        parent.sync_shared()
+        parent.sync_shared()
+        assert segment.current_generation() == 2
+
+    @staticmethod
+    def test_attached_worker_does_not_reload(tmp_path, monkeypatch):
+        """ Test that the reloader of an attached worker only attaches to the new version """
+        path = str(tmp_path / 'config')
+        parent = get_parent(path)
+        worker = Config(layered=True)
+        worker.attach(path)
+        refreshed = []
+        monkeypatch.setattr(worker, 'refresh_secrets', lambda: refreshed.append('secrets'))
+        monkeypatch.setattr(worker, 'changed_files', lambda: refreshed.append('files') or [])
+
+        assert worker.attached and not parent.attached
+
+        parent.set('db.port', 5433)
+        parent.sync_shared()
+        Reloader(worker).reload()
+
+        assert worker.get('db.port') == 5433
+        assert not refreshed
+        assert SharedSegment(path).current_generation() == 2
+
+    @staticmethod
+    def test_attached_configuration_can_be_written(tmp_path):
+        """ Test that writing copies only the modified path """
+        path = str(tmp_path / 'config')
+        get_parent(path)
+
+        worker = Config(in_place_merge=True)
+        worker.attach(path)
+        worker.set('db.port', 5433)
+        worker.set(None, {'db': {'hosts': ['c']}})
+
+        assert worker.get('db') == {'name': 'example', 'port': 5433, 'hosts': ['a', 'b', 'c']}
+        assert isinstance(worker.get('tenants'), SharedDict)
+
+    @staticmethod
+    def test_layered_worker(tmp_path):
+        """ Test that the attached configuration is a layer """
+        path = str(tmp_path / 'config')
+        get_parent(path)
+
+        worker = Config(layered=True)
+        worker.attach(path)
+
+        with worker.layer('local'):
+            worker.set('db.port', 5433)
+
+        assert worker.get('db.port') == 5433
+        assert worker.get('db.name') == 'example'
+        assert worker.source('db.name') == path
+
+    @staticmethod
+    def test_missing_file_raises(tmp_path):
+        """ Test that attaching to a missing file raises """
+        with pytest.raises(FileNotFoundError):
+            Config().attach(str(tmp_path / 'missing'))
+
+    @staticmethod
+    @pytest.mark.skipif(sys.platform == 'win32', reason='Requires fork')
+    def test_forked_worker(tmp_path):
+        """ Test that a forked worker process attaches to the configuration """
+        path = str(tmp_path / 'config')
+        get_parent(path)
+
+        context = multiprocessing.get_context('fork')
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=read_in_worker, args=(path, sender))
+        process.start()
+
+        assert receiver.recv() == (5432, 42)
+        process.join()
+        assert process.exitcode == 0
+        assert os.path.exists(f'{path}.generation')
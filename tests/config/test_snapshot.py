@@ -0,0 +1,111 @@
+"""
+Test immutable configuration snapshots
+
+@author Arttu Manninen <arttu@kaktus.cc>
+"""
+import threading
+from config import Config
+from config.snapshot import CACHE_SIZE, Snapshot, compile_key_path, resolve
+from config.layers import MISSING, Layers
+
+class TestSnapshot():
+    """ Test snapshots """
+    @staticmethod
+    def test_resolve_walks_the_tree():
+        """ Test that resolve returns the value or MISSING """
+        tree = {'foo': {'bar': 'value'}, 'scalar': 'value'}
+        assert resolve(('foo', 'bar'), tree) == 'value'
+        assert resolve(('foo', 'imaginary'), tree) is MISSING
+        assert resolve(('scalar', 'imaginary'), tree) is MISSING
+
+    @staticmethod
+    def test_snapshot_get():
+        """ Test that snapshot returns the values of its tree """
+        snapshot = Snapshot(tree={'foo': {'bar': 'value'}})
+        keys, _env_var = compile_key_path('foo.bar')
+        assert snapshot.get('foo.bar') == 'value'
+        assert snapshot.get('foo.imaginary', default='default') == 'default'
+        assert snapshot.resolve(keys) == 'value'
+
+    @staticmethod
+    def test_resolved_values_are_memoized_up_to_the_limit():
+        """ Test that dynamic keys do not grow the memoized values without a limit """
+        tenants = {str(i): {'name': f'tenant-{i}'} for i in range(CACHE_SIZE + 10)}
+        layers = Layers().set_layer('default', {'tenants': tenants})
+
+        for snapshot in (Snapshot({'tenants': tenants}), Snapshot(layers=layers)):
+            for i in range(CACHE_SIZE * 2):
+                expected = f'tenant-{i}' if i < CACHE_SIZE + 10 else None
+                assert snapshot.get(f'tenants.{i}.name') == expected
+
+            assert len(snapshot._cache) == CACHE_SIZE
+            assert snapshot.get('tenants.1.name') == 'tenant-1'
+
+        assert len(layers._sources) <= CACHE_SIZE
+        assert layers.source(('tenants', str(CACHE_SIZE * 2 - 1))) is None
+        assert layers.source(('tenants', str(CACHE_SIZE + 5), 'name')) == 'default'
+
+    @staticmethod
+    def test_snapshot_does_not_change():
+        """ Test that the snapshot keeps its values after the configuration changes """
+        config = Config()
+        config.set('snapshot.value', 'original')
+        snapshot = config.snapshot()
+
+        config.set('snapshot.value', 'changed')
+        config.set(value={'snapshot': {'merged': True}})
+
+        assert snapshot.get('snapshot.value') == 'original'
+        assert snapshot.get('snapshot.merged') is None
+        assert config.get('snapshot.value') == 'changed'
+        assert config.snapshot() is not snapshot
+
+    @staticmethod
+    def test_layered_snapshot_does_not_change():
+        """ Test that the snapshot of the layered configuration keeps its layers """
+        config = Config(layered=True)
+
+        with config.layer('secrets'):
+            config.set('snapshot.value', 'original')
+
+        snapshot = config.snapshot()
+
+        with config.layer('secrets', replace=True):
+            config.set('snapshot.value', 'changed')
+
+        assert snapshot.get('snapshot.value') == 'original'
+        assert snapshot.source('snapshot.value') == 'secrets'
+        assert config.get('snapshot.value') == 'changed'
+
+    @staticmethod
+    def test_readers_see_consistent_snapshots():
+        """ Test that concurrent readers never see partially applied changes """
+        config = Config()
+        config.set(value={'pair': {'first': 0, 'second': 0}})
+        stopped = threading.Event()
+        errors = []
+
+        def read():
+            """ Read the pair until stopped """
+            while not stopped.is_set():
+                snapshot = config.snapshot()
+
+                if snapshot.get('pair.first') != snapshot.get('pair.second'):
+                    errors.append(snapshot.get('pair'))
+
+        readers = [threading.Thread(target=read) for _i in range(4)]
+
+        for reader in readers:
+            reader.start()
+
+        try:
+            for i in range(1, 2000):
+                config.set('pair', {'first': i, 'second': i})
+        finally:
+            stopped.set()
+
+            for reader in readers:
+                reader.join()
+
+        assert errors == []
+        assert config.get('pair.first') == 1999